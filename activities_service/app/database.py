@@ -62,6 +62,43 @@ def create_tables():
         raise
 
 
+# Revisión que equivale al esquema previo a las migraciones (create_all / activities_db.sql)
+BASELINE_REVISION = "0001_baseline"
+MIGRATIONS_LOCK = "activities_service_migrations"
+
+
+def run_migrations():
+    """Apply pending schema migrations (Alembic) instead of create_all()"""
+    from alembic import command
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from sqlalchemy import inspect, text
+
+    config = Config()
+    config.set_main_option("script_location", "app:migrations")
+
+    try:
+        with engine.begin() as connection:
+            # Varias réplicas arrancando a la vez: solo una migra, el resto espera
+            if connection.dialect.name == "mysql":
+                connection.execute(text("SELECT GET_LOCK(:name, 300)"), {"name": MIGRATIONS_LOCK})
+            try:
+                config.attributes["connection"] = connection
+                current_revision = MigrationContext.configure(connection).get_current_revision()
+                if current_revision is None and inspect(connection).has_table("activities"):
+                    # Esquema creado antes de las migraciones: se adopta como baseline
+                    logger.info("Existing schema without alembic_version, stamping baseline")
+                    command.stamp(config, BASELINE_REVISION)
+                command.upgrade(config, "head")
+            finally:
+                if connection.dialect.name == "mysql":
+                    connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATIONS_LOCK})
+        logger.info("Database migrations applied successfully")
+    except Exception as e:
+        logger.error(f"Error applying migrations: {e}")
+        raise
+
+
 def drop_tables():
     """Drop all tables (use with caution)"""
     try:
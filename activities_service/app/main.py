@@ -5,9 +5,11 @@ from fastapi.responses import JSONResponse
 import logging
 import os
 
-from app.database import engine, create_tables
-from app.routers import activities, submissions, files, optimized_activities
+from app.database import engine, run_migrations
+from app.routers import activities, submissions, files, optimized_activities, gradebook
 from app.middleware.auth import AuthMiddleware
+from app.middleware.query_counter import QueryCounterMiddleware
+from app.services.change_events import change_event_bus
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -40,22 +42,32 @@ app.add_middleware(
 # Custom auth middleware
 #app.add_middleware(AuthMiddleware)
 
+# SQL statement counter (X-SQL-Statements header, warning over budget)
+app.add_middleware(QueryCounterMiddleware)
+
 # Include routers
 app.include_router(activities.router, prefix="/api/activities", tags=["Activities"])
 app.include_router(optimized_activities.router, prefix="/api/v2/activities", tags=["Optimized Activities"])
 app.include_router(submissions.router, prefix="/api/submissions", tags=["Submissions"])
 app.include_router(files.router, prefix="/api/files", tags=["Files"])
+app.include_router(gradebook.router, prefix="/api/v2/courses", tags=["Gradebook"])
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup"""
+    """Apply pending database migrations on startup"""
     try:
-        create_tables()
-        logger.info("Database tables created successfully")
+        run_migrations()
     except Exception as e:
         logger.warning(f"Could not connect to database during startup: {e}")
         logger.warning("Service will start but database operations will fail until DB is available")
 
+    # Eventos de cambio (activities.topic): se conecta en segundo plano y reintenta
+    await change_event_bus.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await change_event_bus.stop()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
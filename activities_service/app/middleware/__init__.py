@@ -1,3 +1,4 @@
 from .auth import AuthMiddleware
+from .query_counter import QueryCounterMiddleware
 
-__all__ = ["AuthMiddleware"] 
\ No newline at end of file
+__all__ = ["AuthMiddleware", "QueryCounterMiddleware"] 
\ No newline at end of file
@@ -0,0 +1,58 @@
+from contextvars import ContextVar
+from typing import Optional, List
+import logging
+import os
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Contador mutable por petición: los hilos del threadpool reciben una copia del
+# contexto, así que se comparte la lista y no el entero
+_statement_count: ContextVar[Optional[List[int]]] = ContextVar("sql_statement_count", default=None)
+
+# Número de sentencias SQL por petición a partir del cual se registra un warning
+SQL_STATEMENT_BUDGET = int(os.getenv("SQL_STATEMENT_BUDGET", "10"))
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    """Contar cada sentencia ejecutada por cualquier engine (master, réplica o legacy)"""
+    counter = _statement_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def get_statement_count() -> int:
+    """Sentencias SQL ejecutadas hasta ahora en la petición actual"""
+    counter = _statement_count.get()
+    return counter[0] if counter is not None else 0
+
+
+class QueryCounterMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware que cuenta las sentencias SQL ejecutadas por petición
+
+    Expone el total en la cabecera ``X-SQL-Statements`` y registra un warning
+    cuando se supera ``SQL_STATEMENT_BUDGET``. Permite detectar N+1 en los
+    listados (ver performance_testing/query_budget_check.py).
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        counter = [0]
+        token = _statement_count.set(counter)
+        try:
+            response = await call_next(request)
+        finally:
+            _statement_count.reset(token)
+
+        response.headers["X-SQL-Statements"] = str(counter[0])
+        if counter[0] > SQL_STATEMENT_BUDGET:
+            logger.warning(
+                f"⚠️ {request.method} {request.url.path} ejecutó {counter[0]} sentencias SQL "
+                f"(presupuesto: {SQL_STATEMENT_BUDGET})"
+            )
+        return response
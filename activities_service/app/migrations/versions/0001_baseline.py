@@ -0,0 +1,79 @@
+"""Esquema inicial: activities, submissions, grades y comments
+
+Es el esquema anterior a las migraciones (create_tables() original). Las
+bases de datos creadas con él se marcan con esta revisión sin ejecutarla
+(ver ``run_migrations()``), así que solo puede contener esas tablas: las
+posteriores van en sus propias revisiones.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "activities",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("course_id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(100), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("activity_type", sa.String(20), nullable=False),
+        sa.Column("due_date", sa.DateTime(), nullable=True),
+        sa.Column("file_url", sa.String(255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("created_by", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_activities_id", "activities", ["id"])
+    op.create_index("ix_activities_course_id", "activities", ["course_id"])
+
+    op.create_table(
+        "submissions",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("activity_id", sa.Integer(), sa.ForeignKey("activities.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text()),
+        sa.Column("file_url", sa.String(255)),
+        sa.Column("additional_files", sa.JSON()),
+        sa.Column("submitted_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_submissions_id", "submissions", ["id"])
+    op.create_index("ix_submissions_activity_id", "submissions", ["activity_id"])
+    op.create_index("ix_submissions_user_id", "submissions", ["user_id"])
+
+    op.create_table(
+        "grades",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("submission_id", sa.Integer(), sa.ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("graded_by", sa.Integer(), nullable=False),
+        sa.Column("score", sa.DECIMAL(5, 2), nullable=False),
+        sa.Column("feedback", sa.Text()),
+        sa.Column("graded_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_grades_id", "grades", ["id"])
+    op.create_index("ix_grades_submission_id", "grades", ["submission_id"])
+
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("activity_id", sa.Integer(), sa.ForeignKey("activities.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_comments_id", "comments", ["id"])
+    op.create_index("ix_comments_activity_id", "comments", ["activity_id"])
+    op.create_index("ix_comments_user_id", "comments", ["user_id"])
+
+
+def downgrade():
+    for table in ("comments", "grades", "submissions", "activities"):
+        op.drop_table(table)
@@ -0,0 +1,71 @@
+"""Tablas de almacenamiento de archivos y estadísticas por actividad
+
+- file_blobs y stored_files: archivos direccionados por contenido con
+  contadores de referencias
+- activity_stats: agregados materializados de entregas y calificaciones
+
+Las bases de datos marcadas como ``0001_baseline`` no las tienen; las
+inicializadas con mysql_activities/activities_db.sql sí, así que la
+migración omite las tablas que ya existen. activity_stats se crea vacía:
+poblarla con ``python -m app.tools.activity_stats reconcile``.
+
+Revision ID: 0001_files_and_stats
+Revises: 0001_baseline
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_files_and_stats"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+TABLES = ("file_blobs", "stored_files", "activity_stats")
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "file_blobs" not in existing:
+        op.create_table(
+            "file_blobs",
+            sa.Column("sha256", sa.String(64), primary_key=True),
+            sa.Column("size", sa.BigInteger(), nullable=False),
+            sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+    if "stored_files" not in existing:
+        op.create_table(
+            "stored_files",
+            sa.Column("filename", sa.String(64), primary_key=True),
+            sa.Column("sha256", sa.String(64), sa.ForeignKey("file_blobs.sha256"), nullable=False),
+            sa.Column("original_name", sa.String(255)),
+            sa.Column("content_type", sa.String(100)),
+            sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("uploaded_by", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index("ix_stored_files_sha256", "stored_files", ["sha256"])
+
+    if "activity_stats" not in existing:
+        op.create_table(
+            "activity_stats",
+            sa.Column("activity_id", sa.Integer(), sa.ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("submissions_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("graded_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("score_sum", sa.DECIMAL(12, 2), nullable=False, server_default="0"),
+            *[
+                sa.Column(f"score_bucket_{bucket}", sa.Integer(), nullable=False, server_default="0")
+                for bucket in range(10)
+            ],
+            sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_table(table)
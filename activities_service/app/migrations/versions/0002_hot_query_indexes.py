@@ -0,0 +1,84 @@
+"""Índices compuestos para las consultas frecuentes
+
+- submissions (activity_id, user_id) único: la entrega duplicada la detecta la
+  restricción en lugar de una consulta previa
+- submissions (activity_id, submitted_at) y (user_id, submitted_at): listados
+  por actividad/estudiante ordenados por fecha sin filesort
+- activities (course_id, due_date) y (created_by, created_at)
+- grades (submission_id, graded_at) y (graded_by, graded_at)
+
+Los índices de una sola columna que quedan cubiertos por el prefijo de uno
+compuesto se eliminan (incluidos los que MySQL creó para las claves foráneas
+en bases de datos inicializadas con activities_db.sql). La migración es
+idempotente: omite los índices que ya existen.
+
+Revision ID: 0002_hot_query_indexes
+Revises: 0001_files_and_stats
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_hot_query_indexes"
+down_revision = "0001_files_and_stats"
+branch_labels = None
+depends_on = None
+
+# (tabla, nombre, columnas, único)
+COMPOSITE_INDEXES = [
+    ("submissions", "uq_submissions_activity_user", ["activity_id", "user_id"], True),
+    ("submissions", "ix_submissions_activity_submitted", ["activity_id", "submitted_at"], False),
+    ("submissions", "ix_submissions_user_submitted", ["user_id", "submitted_at"], False),
+    ("activities", "ix_activities_course_due", ["course_id", "due_date"], False),
+    ("activities", "ix_activities_creator_created", ["created_by", "created_at"], False),
+    ("grades", "ix_grades_submission_graded", ["submission_id", "graded_at"], False),
+    ("grades", "ix_grades_grader_graded", ["graded_by", "graded_at"], False),
+]
+
+# (tabla, columna, nombre en el esquema inicial): cubiertos por un compuesto
+REDUNDANT_INDEXES = [
+    ("submissions", "activity_id", "ix_submissions_activity_id"),
+    ("submissions", "user_id", "ix_submissions_user_id"),
+    ("activities", "course_id", "ix_activities_course_id"),
+    ("grades", "submission_id", "ix_grades_submission_id"),
+]
+
+
+def _indexes(table):
+    return sa.inspect(op.get_bind()).get_indexes(table)
+
+
+def _check_duplicate_submissions():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT COUNT(*) FROM ("
+        "  SELECT activity_id, user_id FROM submissions"
+        "  GROUP BY activity_id, user_id HAVING COUNT(*) > 1"
+        ") AS duplicated"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"Hay {duplicates} pares (activity_id, user_id) con más de una entrega; "
+            "resuélvalos antes de crear uq_submissions_activity_user"
+        )
+
+
+def upgrade():
+    _check_duplicate_submissions()
+
+    for table, name, columns, unique in COMPOSITE_INDEXES:
+        if name not in {index["name"] for index in _indexes(table)}:
+            op.create_index(name, table, columns, unique=unique)
+
+    # Después de crear los compuestos: MySQL exige un índice para cada clave foránea
+    for table, column, _ in REDUNDANT_INDEXES:
+        for index in _indexes(table):
+            if index["column_names"] == [column] and not index["unique"]:
+                op.drop_index(index["name"], table_name=table)
+
+
+def downgrade():
+    for table, column, name in REDUNDANT_INDEXES:
+        op.create_index(name, table, [column])
+    for table, name, _, _ in reversed(COMPOSITE_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -2,5 +2,7 @@ from .activity import Activity
 from .submission import Submission
 from .grade import Grade
 from .comment import Comment
+from .stored_file import FileBlob, StoredFile
+from .activity_stats import ActivityStats
 
-__all__ = ["Activity", "Submission", "Grade", "Comment"] 
\ No newline at end of file
+__all__ = ["Activity", "Submission", "Grade", "Comment", "FileBlob", "StoredFile", "ActivityStats"] 
\ No newline at end of file
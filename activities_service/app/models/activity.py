@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Enum, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Enum, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -13,9 +13,14 @@ class ActivityType(str, enum.Enum):
 
 class Activity(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        # Listado por curso ordenado por fecha límite
+        Index("ix_activities_course_due", "course_id", "due_date"),
+        Index("ix_activities_creator_created", "created_by", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    course_id = Column(Integer, nullable=False, index=True)
+    course_id = Column(Integer, nullable=False)
     title = Column(String(100), nullable=False)
     description = Column(Text)
     activity_type = Column(String(20), nullable=False)
@@ -27,6 +32,8 @@ class Activity(Base):
     # Relationships
     submissions = relationship("Submission", back_populates="activity", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="activity", cascade="all, delete-orphan")
+    # La fila se borra en cascada desde la base de datos (ON DELETE CASCADE)
+    stats = relationship("ActivityStats", uselist=False, viewonly=True)
     
     def __repr__(self):
         return f"<Activity(id={self.id}, title='{self.title}', type='{self.activity_type}')>"
@@ -40,8 +47,8 @@ class Activity(Base):
         
     @property
     def submissions_count(self):
-        """Get the count of submissions for this activity"""
-        return len(self.submissions)
+        """Get the count of submissions for this activity (materialized, no collection load)"""
+        return self.stats.submissions_count if self.stats else 0
         
     def to_dict(self):
         """Convert model to dictionary"""
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, DECIMAL
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+# Tramos de 10 puntos de la distribución: 0-9.99, 10-19.99, ..., 90-100
+SCORE_BUCKETS = 10
+
+class ActivityStats(Base):
+    """
+    Estadísticas materializadas de entregas y calificaciones de una actividad
+
+    Se actualizan de forma incremental en la misma transacción que la entrega
+    o calificación (ActivityStatsService) y las corrige periódicamente
+    ``python -m app.tools.activity_stats reconcile``. Cuentan la última
+    calificación de cada entrega.
+    """
+    __tablename__ = "activity_stats"
+
+    activity_id = Column(Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True)
+    submissions_count = Column(Integer, nullable=False, default=0)
+    graded_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(DECIMAL(12, 2), nullable=False, default=0)
+    score_bucket_0 = Column(Integer, nullable=False, default=0)
+    score_bucket_1 = Column(Integer, nullable=False, default=0)
+    score_bucket_2 = Column(Integer, nullable=False, default=0)
+    score_bucket_3 = Column(Integer, nullable=False, default=0)
+    score_bucket_4 = Column(Integer, nullable=False, default=0)
+    score_bucket_5 = Column(Integer, nullable=False, default=0)
+    score_bucket_6 = Column(Integer, nullable=False, default=0)
+    score_bucket_7 = Column(Integer, nullable=False, default=0)
+    score_bucket_8 = Column(Integer, nullable=False, default=0)
+    score_bucket_9 = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ActivityStats(activity_id={self.activity_id}, submissions={self.submissions_count}, graded={self.graded_count})>"
+
+    @property
+    def average_score(self):
+        """Promedio de la última calificación de cada entrega calificada"""
+        if not self.graded_count:
+            return None
+        return round(float(self.score_sum) / self.graded_count, 2)
+
+    @property
+    def distribution(self):
+        """Número de calificaciones en cada tramo de 10 puntos"""
+        return [getattr(self, f"score_bucket_{bucket}") or 0 for bucket in range(SCORE_BUCKETS)]
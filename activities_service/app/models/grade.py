@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, DECIMAL, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -6,9 +6,14 @@ from app.database import Base
 
 class Grade(Base):
     __tablename__ = "grades"
+    __table_args__ = (
+        # Calificaciones de una entrega por fecha (última calificación)
+        Index("ix_grades_submission_graded", "submission_id", "graded_at"),
+        Index("ix_grades_grader_graded", "graded_by", "graded_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False)
     graded_by = Column(Integer, nullable=False)  # User ID of the grader (teacher)
     score = Column(DECIMAL(5, 2), nullable=False)  # Score out of 100 or custom scale
     feedback = Column(Text)
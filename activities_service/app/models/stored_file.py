@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+class FileBlob(Base):
+    """
+    Contenido único de un archivo, direccionado por su SHA-256
+
+    ``ref_count`` es el número de StoredFile que apuntan al blob. Un blob con
+    ref_count 0 lo elimina el recolector (``python -m app.tools.file_storage gc``).
+    """
+    __tablename__ = "file_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+    
+    # Relationships
+    files = relationship("StoredFile", back_populates="blob")
+    
+    def __repr__(self):
+        return f"<FileBlob(sha256='{self.sha256}', size={self.size}, ref_count={self.ref_count})>"
+
+class StoredFile(Base):
+    """
+    Nombre público de un archivo subido (el que aparece en ``file_url``)
+
+    ``ref_count`` cuenta las entregas/actividades que lo referencian. Varias
+    subidas con el mismo contenido comparten un único FileBlob.
+    """
+    __tablename__ = "stored_files"
+    
+    filename = Column(String(64), primary_key=True)
+    sha256 = Column(String(64), ForeignKey("file_blobs.sha256"), nullable=False, index=True)
+    original_name = Column(String(255))
+    content_type = Column(String(100))
+    ref_count = Column(Integer, nullable=False, default=0)
+    uploaded_by = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    
+    # Relationships
+    blob = relationship("FileBlob", back_populates="files")
+    
+    def __repr__(self):
+        return f"<StoredFile(filename='{self.filename}', sha256='{self.sha256}', ref_count={self.ref_count})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -7,10 +7,17 @@ from app.database import Base
 
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # Una entrega por estudiante y actividad (la restricción detecta duplicados)
+        Index("uq_submissions_activity_user", "activity_id", "user_id", unique=True),
+        # Listado por actividad ordenado por fecha de entrega (keyset)
+        Index("ix_submissions_activity_submitted", "activity_id", "submitted_at"),
+        Index("ix_submissions_user_submitted", "user_id", "submitted_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    activity_id = Column(Integer, ForeignKey("activities.id", ondelete="CASCADE"), nullable=False, index=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    activity_id = Column(Integer, ForeignKey("activities.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, nullable=False)
     content = Column(Text)
     file_url = Column(String(255))
     additional_files = Column(JSON)  # Store as JSON array
@@ -33,7 +40,7 @@ class Submission(Base):
         """Get the most recent grade for this submission"""
         if not self.grades:
             return None
-        return sorted(self.grades, key=lambda x: x.graded_at, reverse=True)[0]
+        return max(self.grades, key=lambda x: x.graded_at)
         
     @property
     def can_edit(self):
@@ -1,21 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File
-from fastapi.responses import FileResponse
-from typing import List
-import os
-import uuid
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.types import Send
+from email.utils import parsedate_to_datetime
+from secrets import token_hex
+from typing import List, Optional, Union
 import logging
-from pathlib import Path
-import aiofiles
+import mimetypes
+import os
+import anyio
 
-from app.schemas.file import FileResponse as FileResponseSchema, FileUploadError
+from app.database import get_db
+from app.schemas.file import (
+    FileResponse as FileResponseSchema,
+    FileUploadError,
+    DirectUploadRequest,
+    DirectUploadCompleteRequest,
+    DirectUploadTicket,
+    MultipartUploadRequest,
+    MultipartUploadTicket,
+    MultipartCompleteRequest,
+)
 from app.middleware.auth import get_current_user
+from app.services.file_storage_service import (
+    FileStorageService,
+    ResolvedFile,
+    FileTooLargeError,
+    DirectUploadNotSupportedError,
+    MAX_FILE_SIZE,
+    PUBLIC_URL_PREFIX,
+)
+from app.services.storage_backends import PRESIGNED_URL_TTL
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
-
-# Configuración de archivos
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+# Configuración de archivos (tamaño máximo y almacenamiento en file_storage_service)
+MAX_FILES_PER_REQUEST = 10
 ALLOWED_EXTENSIONS = {
     'pdf', 'doc', 'docx', 'txt', 'rtf',  # Documentos
     'jpg', 'jpeg', 'png', 'gif', 'bmp',  # Imágenes
@@ -23,18 +45,141 @@ ALLOWED_EXTENSIONS = {
     'zip', 'rar', '7z',  # Archivos comprimidos
     'xls', 'xlsx', 'ppt', 'pptx'  # Office
 }
-UPLOAD_DIRECTORY = "uploads"
 
-# Crear directorio de uploads si no existe
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+# Margen para las cabeceras multipart al comparar con Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+REQUEST_SIZE_LIMITS = {
+    "/upload": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+    "/upload-multiple": MAX_FILES_PER_REQUEST * MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+}
+
+# Descargas: un nombre público nunca cambia de contenido, así que se cachea sin revalidar
+DOWNLOAD_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Tipos que el navegador puede mostrar (visor de PDF, reproductor con seek)
+INLINE_MEDIA_TYPES = ("video/", "audio/", "image/", "application/pdf", "text/plain")
+
+
+class UploadSizeLimitRoute(APIRoute):
+    """
+    Ruta que rechaza por Content-Length antes de que se procese el cuerpo
+    multipart, en lugar de esperar a que Starlette lo haya recibido entero
+    """
+
+    def get_route_handler(self):
+        original_handler = super().get_route_handler()
+        max_body_size = REQUEST_SIZE_LIMITS.get(self.path)
+
+        async def handler(request: Request):
+            content_length = request.headers.get("content-length")
+            if max_body_size and content_length and content_length.isdigit() and int(content_length) > max_body_size:
+                return JSONResponse(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    content={"detail": f"Petición demasiado grande. Máximo permitido: {MAX_FILE_SIZE // (1024*1024)}MB por archivo"}
+                )
+            return await original_handler(request)
+
+        return handler
+
+
+class SendfileFileResponse(FileResponse):
+    """
+    FileResponse que delega el envío del cuerpo al servidor ASGI cuando este
+    anuncia ``http.response.pathsend`` o ``http.response.zerocopysend``
+    (sendfile del sistema operativo, sin copiar bloques por Python).
+    Con servidores que no lo soportan (uvicorn) se envía por bloques como siempre.
+    El parseo de ``Range`` e ``If-Range`` (y el 416) lo hace FileResponse.
+    """
+    chunk_size = 256 * 1024
+
+    async def __call__(self, scope, receive, send):
+        self.server_extensions = scope.get("extensions") or {}
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if send_header_only or not self._can_sendfile():
+            return await super()._handle_simple(send, send_header_only)
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if "http.response.pathsend" in self.server_extensions:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        else:
+            await self._zerocopy_send(send, 0, int(self.headers["content-length"]))
+
+    async def _handle_single_range(self, send: Send, start: int, end: int, file_size: int, send_header_only: bool) -> None:
+        if send_header_only or "http.response.zerocopysend" not in self.server_extensions:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._zerocopy_send(send, start, end - start)
+
+    async def _handle_multiple_ranges(self, send: Send, ranges, file_size: int, send_header_only: bool) -> None:
+        # FileResponse (Starlette 0.46) anuncia el tipo multipart en Content-Range y calcula mal
+        # Content-Length; se genera aquí el multipart/byteranges de RFC 9110 §14.6
+        boundary = token_hex(13)
+        part_headers = [
+            (
+                f"--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+                f"Content-Range: bytes {start}-{end - 1}/{file_size}\r\n\r\n"
+            ).encode("latin-1")
+            for start, end in ranges
+        ]
+        closing = f"--{boundary}--\r\n".encode("latin-1")
+        content_length = sum(
+            len(part_header) + (end - start) + 2
+            for part_header, (start, end) in zip(part_headers, ranges)
+        ) + len(closing)
+
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(content_length)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for part_header, (start, end) in zip(part_headers, ranges):
+                await send({"type": "http.response.body", "body": part_header, "more_body": True})
+                await file.seek(start)
+                while start < end:
+                    chunk = await file.read(min(self.chunk_size, end - start))
+                    start += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+        await send({"type": "http.response.body", "body": closing, "more_body": False})
+
+    def _can_sendfile(self) -> bool:
+        return any(ext in self.server_extensions for ext in ("http.response.pathsend", "http.response.zerocopysend"))
+
+    async def _zerocopy_send(self, send: Send, offset: int, count: int) -> None:
+        with open(self.path, "rb") as file:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": file,
+                "offset": offset,
+                "count": count,
+                "more_body": False,
+            })
+
+
+router = APIRouter(route_class=UploadSizeLimitRoute)
+
 
 def validate_file(file: UploadFile) -> dict:
     """
     Valida un archivo según el tamaño y extensión permitida
     """
+    return validate_file_metadata(file.filename, file.content_type)
+
+def validate_file_metadata(filename: Optional[str], content_type: Optional[str]) -> dict:
+    """
+    Valida nombre y tipo de contenido (también para subidas directas, donde
+    el servicio no recibe el archivo)
+    """
     # Validar extensión
-    if file.filename:
-        extension = file.filename.split('.')[-1].lower()
+    if filename:
+        extension = filename.split('.')[-1].lower()
         if extension not in ALLOWED_EXTENSIONS:
             return {
                 "valid": False,
@@ -43,7 +188,7 @@ def validate_file(file: UploadFile) -> dict:
             }
     
     # Validar tipo de contenido
-    if not file.content_type:
+    if not content_type:
         return {
             "valid": False,
             "error": "Tipo de contenido no especificado"
@@ -51,19 +196,98 @@ def validate_file(file: UploadFile) -> dict:
     
     return {"valid": True}
 
-def get_file_size(file: UploadFile) -> int:
+def download_media_type(filename: str) -> str:
+    """
+    Tipo MIME a partir de la extensión del nombre público (validada en la subida);
+    no se usa el content_type declarado por el cliente
+    """
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+def is_not_modified(request_headers: Headers, response_headers) -> bool:
+    """
+    Evaluar If-None-Match / If-Modified-Since (RFC 9110 §13.2.2)
+    If-Modified-Since solo se considera si no hay If-None-Match
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = response_headers.get("etag")
+        if not etag:
+            return False
+        # Comparación débil: W/"x" equivale a "x"
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def not_modified_response(response_headers) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={
+            name: response_headers[name]
+            for name in ("etag", "last-modified", "cache-control")
+            if name in response_headers
+        }
+    )
+
+def build_download_response(resolved: ResolvedFile, filename: str, request: Request, storage: FileStorageService) -> Response:
     """
-    Obtiene el tamaño del archivo
+    Respuesta de descarga con validadores y soporte de rangos
+
+    - ETag fuerte con el SHA-256 del contenido (los archivos sin migrar usan
+      el ETag de Starlette basado en mtime y tamaño)
+    - 304 para If-None-Match / If-Modified-Since
+    - 206 para Range (uno o varios rangos) e If-Range
+    - Con almacenamiento remoto, redirección 307 a una URL prefirmada: los
+      bytes (y los rangos) los sirve directamente el almacenamiento
     """
-    file.file.seek(0, 2)  # Moverse al final del archivo
-    size = file.file.tell()  # Obtener la posición (tamaño)
-    file.file.seek(0)  # Volver al inicio
-    return size
+    media_type = download_media_type(filename)
+    disposition_type = "inline" if media_type.startswith(INLINE_MEDIA_TYPES) else "attachment"
+    download_name = resolved.original_name or filename
+    headers = {"cache-control": DOWNLOAD_CACHE_CONTROL, "x-content-type-options": "nosniff"}
+    if resolved.sha256:
+        headers["etag"] = f'"{resolved.sha256}"'
+
+    if not resolved.path:
+        if is_not_modified(request.headers, headers):
+            return not_modified_response(headers)
+        url = storage.backend.presigned_download_url(resolved.key, download_name, media_type, disposition_type)
+        # La URL caduca: la redirección no se cachea más allá de la mitad de su vigencia
+        return RedirectResponse(
+            url,
+            status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+            headers={"cache-control": f"private, max-age={PRESIGNED_URL_TTL // 2}"}
+        )
+
+    response = SendfileFileResponse(
+        path=resolved.path,
+        headers=headers,
+        media_type=media_type,
+        filename=download_name,
+        stat_result=os.stat(resolved.path),
+        content_disposition_type=disposition_type,
+    )
+
+    if is_not_modified(request.headers, response.headers):
+        return not_modified_response(response.headers)
+    return response
+
+def uploader_id(current_user: dict) -> Optional[int]:
+    """Id numérico del usuario que sube el archivo (None si no se conoce)"""
+    user_id = current_user.get("user_id")
+    return int(user_id) if user_id is not None and str(user_id).isdigit() else None
 
 @router.post("/upload", response_model=FileResponseSchema)
 async def upload_file(
     request: Request,
-    file: UploadFile = File(..., description="Archivo a subir")
+    file: UploadFile = File(..., description="Archivo a subir"),
+    db: Session = Depends(get_db)
 ):
     """
     Subir un archivo al servidor
@@ -80,34 +304,26 @@ async def upload_file(
                 detail=validation["error"]
             )
         
-        # Validar tamaño
-        file_size = get_file_size(file)
-        if file_size > MAX_FILE_SIZE:
+        # Guardar archivo por bloques (valida el tamaño y deduplica por contenido)
+        try:
+            stored = await FileStorageService(db).store_upload(file, uploader_id(current_user))
+        except FileTooLargeError as e:
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"Archivo demasiado grande. Máximo permitido: {MAX_FILE_SIZE // (1024*1024)}MB"
+                detail=str(e)
             )
         
-        # Generar nombre único para el archivo
-        file_extension = file.filename.split('.')[-1].lower() if file.filename else 'bin'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(UPLOAD_DIRECTORY, unique_filename)
-        
-        # Guardar archivo
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        
         # Generar URL del archivo
-        file_url = f"/api/v1/files/download/{unique_filename}"
+        file_url = f"{PUBLIC_URL_PREFIX}{stored.filename}"
         
-        logger.info(f"Archivo subido: {unique_filename} por usuario {current_user['user_id']}")
+        logger.info(f"Archivo subido: {stored.filename} por usuario {current_user['user_id']}")
         
         return FileResponseSchema(
-            filename=file.filename or unique_filename,
+            filename=file.filename or stored.filename,
             file_url=file_url,
-            file_size=file_size,
+            file_size=stored.size,
             content_type=file.content_type,
+            sha256=stored.sha256,
             upload_success=True,
             message="Archivo subido exitosamente"
         )
@@ -121,21 +337,23 @@ async def upload_file(
             detail="Error interno del servidor al subir archivo"
         )
 
-@router.post("/upload-multiple", response_model=List[FileResponseSchema])
+@router.post("/upload-multiple", response_model=List[Union[FileResponseSchema, FileUploadError]])
 async def upload_multiple_files(
     request: Request,
-    files: List[UploadFile] = File(..., description="Archivos a subir")
+    files: List[UploadFile] = File(..., description="Archivos a subir"),
+    db: Session = Depends(get_db)
 ):
     """
     Subir múltiples archivos al servidor
     """
     try:
         current_user = get_current_user(request)
+        storage = FileStorageService(db)
         
-        if len(files) > 10:  # Límite de archivos por petición
+        if len(files) > MAX_FILES_PER_REQUEST:  # Límite de archivos por petición
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Máximo 10 archivos por petición"
+                detail=f"Máximo {MAX_FILES_PER_REQUEST} archivos por petición"
             )
         
         results = []
@@ -151,32 +369,24 @@ async def upload_multiple_files(
                     ))
                     continue
                 
-                # Validar tamaño
-                file_size = get_file_size(file)
-                if file_size > MAX_FILE_SIZE:
+                # Guardar archivo por bloques (valida el tamaño y deduplica por contenido)
+                try:
+                    stored = await storage.store_upload(file, uploader_id(current_user))
+                except FileTooLargeError:
                     results.append(FileUploadError(
                         error=f"Archivo {file.filename} demasiado grande",
                         details=f"Máximo permitido: {MAX_FILE_SIZE // (1024*1024)}MB"
                     ))
                     continue
                 
-                # Generar nombre único
-                file_extension = file.filename.split('.')[-1].lower() if file.filename else 'bin'
-                unique_filename = f"{uuid.uuid4()}.{file_extension}"
-                file_path = os.path.join(UPLOAD_DIRECTORY, unique_filename)
-                
-                # Guardar archivo
-                async with aiofiles.open(file_path, 'wb') as f:
-                    content = await file.read()
-                    await f.write(content)
-                
-                file_url = f"/api/v1/files/download/{unique_filename}"
+                file_url = f"{PUBLIC_URL_PREFIX}{stored.filename}"
                 
                 results.append(FileResponseSchema(
-                    filename=file.filename or unique_filename,
+                    filename=file.filename or stored.filename,
                     file_url=file_url,
-                    file_size=file_size,
+                    file_size=stored.size,
                     content_type=file.content_type,
+                    sha256=stored.sha256,
                     upload_success=True,
                     message="Archivo subido exitosamente"
                 ))
@@ -201,37 +411,209 @@ async def upload_multiple_files(
             detail="Error interno del servidor"
         )
 
-@router.get("/download/{filename}")
+def _direct_upload_error(e: Exception) -> HTTPException:
+    """Traducir errores de subida directa a respuestas HTTP"""
+    if isinstance(e, FileTooLargeError):
+        return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    if isinstance(e, DirectUploadNotSupportedError):
+        return HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _validate_direct_upload(filename: str, content_type: str):
+    validation = validate_file_metadata(filename, content_type)
+    if not validation["valid"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=validation["error"]
+        )
+
+@router.post("/direct-upload", response_model=DirectUploadTicket)
+async def prepare_direct_upload(
+    upload: DirectUploadRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Preparar una subida directa al almacenamiento (los bytes no pasan por el servicio)
+    El cliente calcula el SHA-256, hace el PUT prefirmado y después llama a /direct-upload/complete con la clave
+    """
+    try:
+        get_current_user(request)
+        _validate_direct_upload(upload.filename, upload.content_type)
+        
+        return FileStorageService(db).prepare_direct_upload(upload.sha256, upload.size, upload.content_type)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise _direct_upload_error(e)
+    except Exception as e:
+        logger.error(f"Error preparando subida directa: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+@router.post("/direct-upload/complete", response_model=FileResponseSchema)
+async def complete_direct_upload(
+    upload: DirectUploadCompleteRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Registrar un archivo subido directamente y obtener su file_url
+    """
+    try:
+        current_user = get_current_user(request)
+        _validate_direct_upload(upload.filename, upload.content_type)
+        
+        stored = await FileStorageService(db).complete_direct_upload(
+            upload.key, upload.size, upload.filename, upload.content_type, uploader_id(current_user)
+        )
+        
+        logger.info(f"Archivo subido directamente: {stored.filename} por usuario {current_user['user_id']}")
+        
+        return FileResponseSchema(
+            filename=upload.filename,
+            file_url=f"{PUBLIC_URL_PREFIX}{stored.filename}",
+            file_size=stored.size,
+            content_type=upload.content_type,
+            sha256=stored.sha256,
+            upload_success=True,
+            message="Archivo subido exitosamente"
+        )
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise _direct_upload_error(e)
+    except Exception as e:
+        logger.error(f"Error completando subida directa: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+@router.post("/multipart-upload", response_model=MultipartUploadTicket)
+async def start_multipart_upload(
+    upload: MultipartUploadRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Iniciar una subida multipart directa: una URL prefirmada (PUT) por parte
+    """
+    try:
+        get_current_user(request)
+        _validate_direct_upload(upload.filename, upload.content_type)
+        
+        return FileStorageService(db).start_multipart_upload(upload.size, upload.content_type)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise _direct_upload_error(e)
+    except Exception as e:
+        logger.error(f"Error iniciando subida multipart: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+@router.post("/multipart-upload/{upload_id}/complete", response_model=FileResponseSchema)
+async def complete_multipart_upload(
+    upload_id: str,
+    upload: MultipartCompleteRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Completar una subida multipart con los ETag de cada parte y obtener su file_url
+    """
+    try:
+        current_user = get_current_user(request)
+        _validate_direct_upload(upload.filename, upload.content_type)
+        
+        stored = await FileStorageService(db).complete_multipart_upload(
+            upload.key,
+            upload_id,
+            [part.model_dump() for part in upload.parts],
+            upload.size,
+            upload.filename,
+            upload.content_type,
+            uploader_id(current_user)
+        )
+        
+        logger.info(f"Subida multipart completada: {stored.filename} por usuario {current_user['user_id']}")
+        
+        return FileResponseSchema(
+            filename=upload.filename,
+            file_url=f"{PUBLIC_URL_PREFIX}{stored.filename}",
+            file_size=stored.size,
+            content_type=upload.content_type,
+            sha256=stored.sha256,
+            upload_success=True,
+            message="Archivo subido exitosamente"
+        )
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise _direct_upload_error(e)
+    except Exception as e:
+        logger.error(f"Error completando subida multipart {upload_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+@router.delete("/multipart-upload/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_multipart_upload(
+    upload_id: str,
+    key: str,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Cancelar una subida multipart y liberar las partes ya subidas
+    """
+    try:
+        get_current_user(request)
+        FileStorageService(db).abort_multipart_upload(key, upload_id)
+        
+    except ValueError as e:
+        raise _direct_upload_error(e)
+    except Exception as e:
+        logger.error(f"Error cancelando subida multipart {upload_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+@router.api_route("/download/{filename}", methods=["GET", "HEAD"])
 async def download_file(
     filename: str,
-    request: Request
+    request: Request,
+    db: Session = Depends(get_db)
 ):
     """
     Descargar un archivo del servidor
+    Soporta Range (reproducción con seek), ETag/If-None-Match e If-Modified-Since
     """
     try:
         current_user = get_current_user(request)
         
-        file_path = os.path.join(UPLOAD_DIRECTORY, filename)
+        # Resuelve el blob por contenido (o el archivo plano si aún no se migró)
+        storage = FileStorageService(db)
+        resolved = storage.resolve(filename)
         
-        if not os.path.exists(file_path):
+        if not resolved:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Archivo no encontrado"
             )
         
-        # Verificar que el archivo esté dentro del directorio permitido
-        if not os.path.abspath(file_path).startswith(os.path.abspath(UPLOAD_DIRECTORY)):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Acceso al archivo denegado"
-            )
-        
-        return FileResponse(
-            path=file_path,
-            filename=filename,
-            media_type='application/octet-stream'
-        )
+        return build_download_response(resolved, filename, request, storage)
         
     except HTTPException:
         raise
@@ -245,7 +627,8 @@ async def download_file(
 @router.delete("/delete/{filename}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_file(
     filename: str,
-    request: Request
+    request: Request,
+    db: Session = Depends(get_db)
 ):
     """
     Eliminar un archivo del servidor
@@ -253,10 +636,9 @@ async def delete_file(
     """
     try:
         current_user = get_current_user(request)
+        storage = FileStorageService(db)
         
-        file_path = os.path.join(UPLOAD_DIRECTORY, filename)
-        
-        if not os.path.exists(file_path):
+        if not storage.resolve(filename):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Archivo no encontrado"
@@ -271,8 +653,8 @@ async def delete_file(
                 detail="Sin permisos para eliminar archivos"
             )
         
-        # Eliminar archivo
-        os.remove(file_path)
+        # Eliminar el nombre público; el contenido se recolecta si nadie más lo usa
+        storage.delete_file(filename)
         
         logger.info(f"Archivo eliminado: {filename} por usuario {current_user['user_id']}")
         
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Iterator
+import logging
+
+from app.db_config.config import ReadSessionLocal
+from app.middleware.auth import require_teacher_or_admin
+from app.services.gradebook_service import GradebookService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# ============================================================================
+# LIBRO DE CALIFICACIONES (STREAMING DESDE LA RÉPLICA DE LECTURA)
+# ============================================================================
+
+def _stream_gradebook(course_id: int, export_format: str, media_type: str, filename: str) -> StreamingResponse:
+    # La sesión no es una dependencia: debe seguir abierta mientras se envía
+    # el cuerpo y cerrarse al terminar (o si el cliente se desconecta)
+    session = ReadSessionLocal()
+    try:
+        service = GradebookService(session)
+        columns = service.get_columns(course_id)
+    except Exception as e:
+        session.close()
+        logger.error(f"❌ Error preparando libro de calificaciones del curso {course_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+    chunks = service.iter_csv(course_id, columns) if export_format == "csv" else service.iter_ndjson(course_id, columns)
+
+    def body() -> Iterator[str]:
+        try:
+            yield from chunks
+            logger.info(f"✅ Libro de calificaciones del curso {course_id} exportado ({export_format})")
+        except Exception as e:
+            # Las cabeceras ya se enviaron: solo queda cortar la respuesta
+            logger.error(f"❌ Error exportando libro de calificaciones del curso {course_id}: {e}")
+            raise
+        finally:
+            session.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+@router.get("/{course_id}/gradebook.csv")
+def export_gradebook_csv(course_id: int, request: Request):
+    """Libro de calificaciones del curso en CSV (una fila por estudiante)"""
+    require_teacher_or_admin(request)
+    return _stream_gradebook(course_id, "csv", "text/csv; charset=utf-8", f"gradebook-{course_id}.csv")
+
+@router.get("/{course_id}/gradebook.ndjson")
+def export_gradebook_ndjson(course_id: int, request: Request):
+    """Libro de calificaciones del curso en NDJSON (cabecera + una línea por estudiante)"""
+    require_teacher_or_admin(request)
+    return _stream_gradebook(course_id, "ndjson", "application/x-ndjson", f"gradebook-{course_id}.ndjson")
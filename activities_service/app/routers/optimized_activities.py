@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status, Query, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query, Header
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
@@ -13,6 +13,10 @@ from app.middleware.auth import get_current_user, require_teacher_or_admin
 from app.services.optimized_activity_service import OptimizedActivityService
 from app.services.comment_service import CommentService
 from app.services.cache_service import CacheService
+from app.services.pagination import MAX_PAGE_SIZE
+from app.services.activity_stats_service import ActivityStatsService
+from app.schemas.activity_stats import ActivityStatsResponse, CourseActivityStats
+from app.db_config.config import get_db_read
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,36 @@ router = APIRouter()
 # Global optimized service instance
 optimized_service = OptimizedActivityService()
 
+# Los clientes pueden guardar la respuesta pero deben revalidarla (If-None-Match)
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """If-None-Match con comparación débil: W/"x" y "x" son equivalentes"""
+    header = request.headers.get("if-none-match")
+    if not etag or not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def _not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """304 sin cuerpo si el cliente ya tiene la versión actual (None en otro caso)"""
+    if not _etag_matches(request, etag):
+        return None
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+    )
+
+
+def _set_etag(response: Response, etag: Optional[str]):
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CONDITIONAL_CACHE_CONTROL
+
 # ============================================================================
 # ENDPOINTS OPTIMIZADOS CON CACHE Y READ REPLICAS
 # ============================================================================
@@ -58,28 +92,57 @@ async def create_activity_optimized(
 @router.get("/list/{course_id}", response_model=ActivityList)
 async def get_activities_optimized(
     course_id: int,
-    preload_cache: bool = Query(False, description="Precargar cache para curso")
+    request: Request,
+    response: Response,
+    preload_cache: bool = Query(False, description="Precargar cache para curso"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página (activa la paginación keyset)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor por la página anterior"),
+    fields: Optional[str] = Query(None, description="Campos opcionales a incluir, separados por comas (description, file_url)")
 ):
     """
     Obtener lista de actividades - OPTIMIZADO
     
     Características:
-    - Cache L2 inteligente con TTL de 5 minutos
+    - Cache L2 versionado (invalidado por eventos de cambio)
     - Fallback automático a master si read replica falla
     - Opción de precarga de cache
+    - Paginación keyset sobre (due_date, id) y proyección de campos con
+      ``limit``/``cursor``/``fields``; sin ``limit`` se devuelve la lista completa
+    - ETag débil por versión del curso: con If-None-Match vigente responde
+      304 sin consultar cache ni base de datos
     """
     try:
+        # La versión se lee antes que los datos: el ETag nunca es más nuevo que el cuerpo
+        etag = optimized_service.get_course_activities_etag(course_id, variant=request.url.query)
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
         # Opción de precarga de cache
         if preload_cache:
             optimized_service.preload_course_activities_cache(course_id)
         
-        # Obtener actividades usando cache y read replica
-        result = optimized_service.get_activities(course_id)
+        if limit is not None or cursor is not None or fields is not None:
+            result = optimized_service.get_activities_page(
+                course_id,
+                limit=limit or MAX_PAGE_SIZE,
+                cursor=cursor,
+                fields=fields
+            )
+        else:
+            # Obtener actividades usando cache y read replica
+            result = optimized_service.get_activities(course_id)
         
         logger.info(f"📊 Actividades obtenidas para curso {course_id}: {len(result.activities)} items")
         
+        _set_etag(response, etag)
         return result
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"❌ Error obteniendo actividades optimizadas: {e}")
         raise HTTPException(
@@ -93,12 +156,12 @@ async def get_multiple_activities_concurrent(
     user_id: Optional[int] = Header(None, alias="User_id")
 ):
     """
-    Obtener múltiples actividades concurrentemente - AVANZADO
+    Obtener múltiples actividades en lote - AVANZADO
     
     Características:
-    - Ejecución concurrente con ThreadPoolExecutor
-    - Optimización para múltiples consultas
-    - Cache aprovechado al máximo
+    - MGET de cache para todos los ids
+    - Una sola consulta IN (...) para los misses
+    - Escritura pipelined en cache y resultados en el orden de entrada
     """
     try:
         if len(activity_ids) > 50:
@@ -110,14 +173,14 @@ async def get_multiple_activities_concurrent(
         # Obtener actividades concurrentemente
         activities = await optimized_service.get_multiple_activities_concurrent(activity_ids)
         
-        logger.info(f"📊 Obtenidas {len(activities)} actividades concurrentemente")
+        logger.info(f"📊 Obtenidas {len(activities)} actividades en lote")
         
         return activities
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error obteniendo actividades concurrentemente: {e}")
+        logger.error(f"❌ Error obteniendo actividades en lote: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
@@ -283,20 +346,83 @@ async def invalidate_cache(
             detail="Error interno del servidor"
         ) 
 
+@router.get("/course/{course_id}/stats", response_model=CourseActivityStats)
+async def get_course_activity_stats(
+    course_id: int,
+    request: Request,
+    db: Session = Depends(get_db_read)
+):
+    """
+    Estadísticas de todas las actividades de un curso
+    
+    Características:
+    - Una sola consulta sobre la tabla materializada (sin recorrer entregas)
+    - Read replica
+    """
+    require_teacher_or_admin(request)
+    try:
+        return ActivityStatsService(db).get_course_stats(course_id)
+    except Exception as e:
+        logger.error(f"❌ Error obteniendo estadísticas del curso {course_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+@router.get("/{activity_id}/stats", response_model=ActivityStatsResponse)
+async def get_activity_stats(
+    activity_id: int,
+    request: Request,
+    db: Session = Depends(get_db_read)
+):
+    """
+    Estadísticas de entregas y calificaciones de una actividad
+    
+    Características:
+    - Lectura por clave primaria de la tabla materializada
+    - Conteos, promedio y distribución por tramos de 10 puntos
+    """
+    require_teacher_or_admin(request)
+    try:
+        stats = ActivityStatsService(db).get_activity_stats(activity_id)
+        if not stats:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Actividad no encontrada"
+            )
+        return stats
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error obteniendo estadísticas de la actividad {activity_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
 @router.get("/{activity_id}", response_model=ActivitySchema)
 async def get_activity_optimized(
     activity_id: int,
+    request: Request,
+    response: Response,
     user_id: Optional[int] = Header(None, alias="User_id")
 ):
     """
     Obtener una actividad específica - OPTIMIZADO
     
     Características:
-    - Cache L2 con TTL de 10 minutos
+    - Cache L2 versionado (invalidado por eventos de cambio)
     - Eager loading de comentarios
     - Fallback automático a master
+    - ETag débil por versión de la actividad y 304 con If-None-Match
     """
     try:
+        etag = optimized_service.get_activity_etag(activity_id)
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
         # Obtener actividad usando cache y read replica
         activity = optimized_service.get_activity_by_id(activity_id, user_id)
 
@@ -308,6 +434,7 @@ async def get_activity_optimized(
         
         logger.info(f"📊 Actividad obtenida: {activity_id}")
         
+        _set_etag(response, etag)
         return activity
         
     except HTTPException:
@@ -1,19 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status, Query, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query, Header, UploadFile, File
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
+import csv
+import io
 import logging
 
 from app.database import get_db
 from app.schemas.submission import SubmissionCreate, SubmissionUpdate, SubmissionResponse, SubmissionList, SubmissionDetail
-from app.schemas.grade import GradeCreate, GradeResponse
+from app.schemas.grade import GradeCreate, GradeResponse, BulkGradeItem, BulkGradeRequest, BulkGradeResult, BulkGradeResponse
 from app.middleware.auth import get_current_user, require_teacher_or_admin
 from app.services.submission_service import SubmissionService
-from app.services.grade_service import GradeService
+from app.services.grade_service import GradeService, MAX_BULK_GRADES
+from app.services.pagination import MAX_PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Tamaño máximo del CSV de calificaciones masivas
+MAX_GRADES_CSV_SIZE = 2 * 1024 * 1024  # 2MB
+
 #Ya
 @router.post("/", response_model=SubmissionResponse, status_code=status.HTTP_201_CREATED)
 async def create_submission(
@@ -52,24 +59,39 @@ async def get_submissions(
     activity_id: int = Query(..., description="Identificador de la actividad"),
     user_id: int = Query(..., description="Identificador del usuario"),
     user_role: str = Query(..., description="Rol del usuario (student, teacher o admin)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página (activa la paginación keyset)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor por la página anterior"),
+    fields: Optional[str] = Query(None, description="Campos opcionales a incluir, separados por comas (content, file_url, additional_files)"),
     db: Session = Depends(get_db)
 ):
     """
     Obtener lista de entregas con filtros opcionales
     Los estudiantes solo ven sus propias entregas
     Los profesores pueden ver todas las entregas de sus actividades
+    Con limit/cursor se pagina por (submitted_at, id); sin limit se devuelven todas
     """
     try:
-        
+        # Un cursor sin limit sigue paginando con el tamaño máximo
+        if cursor is not None and limit is None:
+            limit = MAX_PAGE_SIZE
+
         service = SubmissionService(db)
         result = service.get_submissions(
             activity_id=activity_id,
             user_id=user_id,
-            user_role=user_role.lower()
+            user_role=user_role.lower(),
+            limit=limit,
+            cursor=cursor,
+            fields=fields
         )
         
         return result
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error obteniendo entregas: {e}")
         raise HTTPException(
@@ -191,6 +213,140 @@ async def delete_submission(
         )
 
 # Endpoints para calificaciones
+def _require_grader(user_role: str):
+    if user_role.lower() not in ["teacher", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acceso denegado: solo profesores y administradores pueden calificar"
+        )
+
+def _bulk_grade_response(results: List[BulkGradeResult]) -> BulkGradeResponse:
+    results = sorted(results, key=lambda result: result.row)
+    return BulkGradeResponse(
+        created=sum(result.status == "created" for result in results),
+        updated=sum(result.status == "updated" for result in results),
+        failed=sum(result.status == "error" for result in results),
+        results=results
+    )
+
+# Clave de DictReader para las celdas sobrantes de una fila más larga que la cabecera
+CSV_EXTRA_CELLS = "__extra__"
+
+def _parse_grades_csv(content: bytes) -> Tuple[List[BulkGradeItem], List[int], List[BulkGradeResult]]:
+    """
+    Leer un CSV con columnas submission_id, score y feedback (opcional)
+    Devuelve las filas válidas, su número de línea y los errores de formato
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("El CSV debe estar codificado en UTF-8")
+
+    reader = csv.DictReader(io.StringIO(text), restkey=CSV_EXTRA_CELLS)
+    columns = {(name or "").strip().lower() for name in reader.fieldnames or []}
+    if not {"submission_id", "score"} <= columns:
+        raise ValueError("El CSV debe tener las columnas submission_id y score (feedback es opcional)")
+
+    items, rows, errors = [], [], []
+    for record in reader:
+        line = reader.line_num
+        extra_cells = [cell for cell in record.pop(CSV_EXTRA_CELLS, None) or [] if cell.strip()]
+        record = {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+        if extra_cells:
+            errors.append(BulkGradeResult(
+                row=line,
+                submission_id=int(record["submission_id"]) if record["submission_id"].isdigit() else None,
+                status="error",
+                error=f"La fila tiene {len(extra_cells)} celda(s) más que la cabecera"
+            ))
+            continue
+        try:
+            items.append(BulkGradeItem(
+                submission_id=record["submission_id"],
+                score=record["score"],
+                feedback=record.get("feedback") or None
+            ))
+            rows.append(line)
+        except ValidationError as e:
+            errors.append(BulkGradeResult(
+                row=line,
+                submission_id=int(record["submission_id"]) if record["submission_id"].isdigit() else None,
+                status="error",
+                error="; ".join(error["msg"] for error in e.errors())
+            ))
+    return items, rows, errors
+
+@router.post("/grades/bulk", response_model=BulkGradeResponse)
+async def bulk_grade_submissions(
+    grade_data: BulkGradeRequest,
+    User_id: int = Header(..., alias = "User_id"), #indentificador del profesor o admin
+    user_role: str = Query(..., description="Rol del usuario (teacher o admin)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Calificar muchas entregas en una sola petición (una transacción)
+    Devuelve el resultado de cada fila; las filas inválidas no impiden registrar las demás
+    """
+    try:
+        _require_grader(user_role)
+
+        service = GradeService(db)
+        results = service.bulk_grade(grade_data.grades, graded_by=User_id, upsert=grade_data.upsert)
+
+        return _bulk_grade_response(results)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error en calificación masiva: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+@router.post("/grades/bulk/csv", response_model=BulkGradeResponse)
+async def bulk_grade_submissions_csv(
+    file: UploadFile = File(..., description="CSV con columnas submission_id, score, feedback"),
+    upsert: bool = Query(False, description="Actualizar la calificación si la entrega ya estaba calificada"),
+    User_id: int = Header(..., alias = "User_id"), #indentificador del profesor o admin
+    user_role: str = Query(..., description="Rol del usuario (teacher o admin)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Calificación masiva a partir de un CSV (una fila por entrega)
+    El número de fila de cada resultado es la línea del CSV
+    """
+    try:
+        _require_grader(user_role)
+
+        content = await file.read(MAX_GRADES_CSV_SIZE + 1)
+        if len(content) > MAX_GRADES_CSV_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"CSV demasiado grande. Máximo permitido: {MAX_GRADES_CSV_SIZE // (1024*1024)}MB"
+            )
+
+        items, rows, errors = _parse_grades_csv(content)
+        if len(items) + len(errors) > MAX_BULK_GRADES:
+            raise ValueError(f"Máximo {MAX_BULK_GRADES} calificaciones por petición")
+
+        results = GradeService(db).bulk_grade(items, graded_by=User_id, upsert=upsert, rows=rows) if items else []
+
+        return _bulk_grade_response(results + errors)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error en calificación masiva por CSV: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
 @router.post("/{submission_id}/grade", response_model=GradeResponse, status_code=status.HTTP_201_CREATED)
 async def grade_submission(
     submission_id: int,
@@ -81,6 +81,8 @@ class ActivityResponse(BaseModel):
 class ActivityList(BaseModel):
     """Schema for paginated activity list"""
     activities: List[ActivityResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor para la siguiente página (keyset)")
+    has_more: bool = Field(False, description="Indica si quedan más páginas")
 
 
 # Esquemas de volver una actividad
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+class ScoreBucket(BaseModel):
+    """Tramo de la distribución de calificaciones"""
+    min_score: float
+    max_score: float
+    count: int
+
+class ActivityStatsResponse(BaseModel):
+    """Estadísticas materializadas de una actividad"""
+    activity_id: int
+    submissions_count: int = 0
+    graded_count: int = 0
+    pending_count: int = Field(0, description="Entregas sin calificar")
+    average_score: Optional[float] = None
+    distribution: List[ScoreBucket]
+
+class CourseActivityStats(BaseModel):
+    """Estadísticas de todas las actividades de un curso"""
+    course_id: int
+    activities: List[ActivityStatsResponse]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Dict
 
 class FileResponse(BaseModel):
     """Schema for file upload response"""
@@ -7,6 +7,7 @@ class FileResponse(BaseModel):
     file_url: str = Field(..., description="URL del archivo subido")
     file_size: int = Field(..., description="Tamaño del archivo en bytes")
     content_type: str = Field(..., description="Tipo de contenido del archivo")
+    sha256: Optional[str] = Field(None, description="Hash SHA-256 del contenido (si se calculó)")
     upload_success: bool = Field(..., description="Éxito en la subida")
     message: str = Field(..., description="Mensaje de confirmación")
 
@@ -14,4 +15,50 @@ class FileUploadError(BaseModel):
     """Schema for file upload error response"""
     error: str = Field(..., description="Descripción del error")
     details: Optional[str] = Field(None, description="Detalles adicionales del error")
-    upload_success: bool = Field(default=False, description="Éxito en la subida") 
\ No newline at end of file
+    upload_success: bool = Field(default=False, description="Éxito en la subida") 
+
+class DirectUploadRequest(BaseModel):
+    """Schema para subir un archivo directamente al almacenamiento (URL prefirmada)"""
+    filename: str = Field(..., description="Nombre original del archivo")
+    content_type: str = Field(..., description="Tipo de contenido del archivo")
+    size: int = Field(..., gt=0, description="Tamaño del archivo en bytes")
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$", description="Hash SHA-256 del contenido calculado por el cliente")
+
+class DirectUploadCompleteRequest(BaseModel):
+    """Schema para completar una subida directa"""
+    key: str = Field(..., description="Clave de staging devuelta al preparar la subida")
+    filename: str = Field(..., description="Nombre original del archivo")
+    content_type: str = Field(..., description="Tipo de contenido del archivo")
+    size: int = Field(..., gt=0, description="Tamaño del archivo en bytes")
+
+class DirectUploadTicket(BaseModel):
+    """Schema con la petición que debe hacer el cliente contra el almacenamiento"""
+    key: str = Field(..., description="Clave de staging que se envía al completar")
+    method: str = Field(..., description="Método HTTP de la subida")
+    url: str = Field(..., description="URL prefirmada")
+    headers: Dict[str, str] = Field(default_factory=dict, description="Cabeceras que deben enviarse tal cual")
+
+class MultipartUploadRequest(BaseModel):
+    """Schema para iniciar una subida multipart directa"""
+    filename: str = Field(..., description="Nombre original del archivo")
+    content_type: str = Field(..., description="Tipo de contenido del archivo")
+    size: int = Field(..., gt=0, description="Tamaño del archivo en bytes")
+
+class MultipartUploadTicket(BaseModel):
+    """Schema con las URLs prefirmadas de cada parte"""
+    upload_id: str
+    key: str
+    part_size: int = Field(..., description="Tamaño de cada parte en bytes (la última puede ser menor)")
+    part_urls: List[str] = Field(..., description="URL prefirmada para la parte i+1 (PUT)")
+
+class MultipartPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str = Field(..., description="ETag devuelto por el almacenamiento al subir la parte")
+
+class MultipartCompleteRequest(BaseModel):
+    """Schema para completar una subida multipart directa"""
+    key: str
+    filename: str = Field(..., description="Nombre original del archivo")
+    content_type: str = Field(..., description="Tipo de contenido del archivo")
+    size: int = Field(..., gt=0, description="Tamaño del archivo en bytes (el mismo que al iniciar la subida)")
+    parts: List[MultipartPart] = Field(..., min_length=1)
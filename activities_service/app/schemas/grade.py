@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Optional, List, Literal
 from datetime import datetime
 from decimal import Decimal
 
@@ -38,4 +38,28 @@ class GradeResponse(GradeBase):
     score_percentage: float
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class BulkGradeItem(GradeBase):
+    """Fila de una calificación masiva"""
+    submission_id: int = Field(..., gt=0, description="ID de la entrega")
+
+class BulkGradeRequest(BaseModel):
+    """Schema for grading many submissions in one request"""
+    grades: List[BulkGradeItem] = Field(..., min_length=1, description="Calificaciones a registrar")
+    upsert: bool = Field(False, description="Actualizar la calificación si la entrega ya estaba calificada")
+
+class BulkGradeResult(BaseModel):
+    """Resultado por fila de una calificación masiva"""
+    row: int = Field(..., description="Posición de la fila en la petición (1 = primera)")
+    submission_id: Optional[int] = None
+    status: Literal["created", "updated", "error"]
+    grade_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkGradeResponse(BaseModel):
+    """Schema for bulk grading response"""
+    created: int
+    updated: int
+    failed: int
+    results: List[BulkGradeResult]
@@ -56,6 +56,8 @@ class SubmissionResponse(SubmissionBase):
 class SubmissionList(BaseModel):
     """Schema for paginated submission list"""
     submissions: List[SubmissionResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor para la siguiente página (keyset)")
+    has_more: bool = Field(False, description="Indica si quedan más páginas")
 
 
 class SubmissionDetail(BaseModel):
@@ -6,6 +6,7 @@ import logging
 
 from app.models.activity import Activity, ActivityType
 from app.schemas.activity import ActivityCreate, ActivityUpdate, ActivityList, ActivityResponse, ActivitySchema, CommentSchema
+from app.services.file_storage_service import FileStorageService, file_urls_of
 import math
 
 logger = logging.getLogger(__name__)
@@ -35,6 +36,7 @@ class ActivityService:
             )
             
             self.db.add(db_activity)
+            FileStorageService(self.db).retain(file_urls_of(db_activity))
             self.db.commit()
             self.db.refresh(db_activity)
             
@@ -144,11 +146,13 @@ class ActivityService:
             
             # Actualizar campos proporcionados
             update_data = activity_data.dict(exclude_unset=True)
+            old_file_urls = file_urls_of(activity)
             
             for field, value in update_data.items():
                 if hasattr(activity, field):
                     setattr(activity, field, value)
             
+            FileStorageService(self.db).sync_references(old_file_urls, file_urls_of(activity))
             self.db.commit()
             self.db.refresh(activity)
             
@@ -186,6 +190,7 @@ class ActivityService:
                 # Por seguridad, no permitir eliminación si hay entregas
                 raise ValueError("No se puede eliminar una actividad con entregas existentes")
             
+            FileStorageService(self.db).release(file_urls_of(activity))
             self.db.delete(activity)
             self.db.commit()
             
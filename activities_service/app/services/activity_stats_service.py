@@ -0,0 +1,216 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, List, Dict, Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+import logging
+
+from app.models.activity import Activity
+from app.models.activity_stats import ActivityStats, SCORE_BUCKETS
+from app.models.grade import Grade
+from app.models.submission import Submission
+from app.schemas.activity_stats import ActivityStatsResponse, CourseActivityStats, ScoreBucket
+
+logger = logging.getLogger(__name__)
+
+BUCKET_WIDTH = 10
+
+
+def score_bucket(score) -> int:
+    """Tramo de una calificación (100 cae en el último)"""
+    bucket = int(Decimal(str(score)) // BUCKET_WIDTH)
+    return min(max(bucket, 0), SCORE_BUCKETS - 1)
+
+
+@dataclass
+class StatsDelta:
+    """Cambio incremental sobre la fila de estadísticas de una actividad"""
+    submissions: int = 0
+    graded: int = 0
+    score_sum: Decimal = Decimal("0")
+    buckets: List[int] = field(default_factory=lambda: [0] * SCORE_BUCKETS)
+
+    def add_score(self, score):
+        self.graded += 1
+        self.score_sum += Decimal(str(score))
+        self.buckets[score_bucket(score)] += 1
+
+    def remove_score(self, score):
+        self.graded -= 1
+        self.score_sum -= Decimal(str(score))
+        self.buckets[score_bucket(score)] -= 1
+
+    def is_empty(self) -> bool:
+        return not (self.submissions or self.graded or self.score_sum or any(self.buckets))
+
+
+def empty_stats_values() -> Dict:
+    values = {"submissions_count": 0, "graded_count": 0, "score_sum": Decimal("0")}
+    values.update({f"score_bucket_{bucket}": 0 for bucket in range(SCORE_BUCKETS)})
+    return values
+
+
+class ActivityStatsService:
+    """
+    Estadísticas por actividad mantenidas de forma incremental
+
+    Cada escritura aplica un ``UPDATE ... SET col = col + delta`` sobre la
+    fila de la actividad dentro de su propia transacción, así las lecturas son
+    una consulta por clave primaria en lugar de recorrer entregas y notas. Si
+    la fila aún no existe se crea calculándola desde las tablas (con el cambio
+    en curso ya incluido).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ========================================================================
+    # ACTUALIZACIÓN INCREMENTAL
+    # ========================================================================
+
+    def record(self, activity_id: int, delta: StatsDelta):
+        self.record_many({activity_id: delta})
+
+    def record_many(self, deltas: Dict[int, StatsDelta]):
+        """Aplicar los deltas por actividad (llamar después de añadir el cambio a la sesión)"""
+        for activity_id, delta in deltas.items():
+            if delta.is_empty():
+                continue
+            if self._apply(activity_id, delta):
+                continue
+
+            self.db.flush()
+            try:
+                # Savepoint: si otra transacción crea la fila a la vez, se le aplica el delta
+                with self.db.begin_nested():
+                    values = self.compute([activity_id]).get(activity_id, empty_stats_values())
+                    self.db.execute(insert(ActivityStats).values(activity_id=activity_id, **values))
+            except IntegrityError:
+                self._apply(activity_id, delta)
+
+    def _apply(self, activity_id: int, delta: StatsDelta) -> bool:
+        values = {
+            "submissions_count": ActivityStats.submissions_count + delta.submissions,
+            "graded_count": ActivityStats.graded_count + delta.graded,
+            "score_sum": ActivityStats.score_sum + delta.score_sum,
+        }
+        for bucket, change in enumerate(delta.buckets):
+            if change:
+                column = getattr(ActivityStats, f"score_bucket_{bucket}")
+                values[column.key] = column + change
+
+        result = self.db.execute(
+            update(ActivityStats)
+            .where(ActivityStats.activity_id == activity_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    # ========================================================================
+    # CÁLCULO DESDE LAS TABLAS (creación de filas y reconciliación)
+    # ========================================================================
+
+    def compute(self, activity_ids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Estadísticas reales de las actividades con dos consultas agregadas
+
+        Solo se devuelven actividades con alguna entrega.
+        """
+        activity_ids = list(activity_ids)
+        computed: Dict[int, Dict] = {}
+
+        submission_counts = self.db.execute(
+            select(Submission.activity_id, func.count(Submission.id))
+            .where(Submission.activity_id.in_(activity_ids))
+            .group_by(Submission.activity_id)
+        )
+        for activity_id, count in submission_counts:
+            computed[activity_id] = empty_stats_values()
+            computed[activity_id]["submissions_count"] = count
+
+        newer_grade = aliased(Grade)
+        latest_grade_id = (
+            select(func.max(newer_grade.id))
+            .where(newer_grade.submission_id == Submission.id)
+            .correlate(Submission)
+            .scalar_subquery()
+        )
+        bucket = case(
+            *[(Grade.score < BUCKET_WIDTH * (b + 1), b) for b in range(SCORE_BUCKETS - 1)],
+            else_=SCORE_BUCKETS - 1
+        ).label("bucket")
+        grade_buckets = self.db.execute(
+            select(Submission.activity_id, bucket, func.count(Grade.id), func.sum(Grade.score))
+            .join(Grade, Grade.id == latest_grade_id)
+            .where(Submission.activity_id.in_(activity_ids))
+            .group_by(Submission.activity_id, bucket)
+        )
+        for activity_id, bucket_index, count, total in grade_buckets:
+            values = computed.setdefault(activity_id, empty_stats_values())
+            values["graded_count"] += count
+            values["score_sum"] += Decimal(str(total or 0))
+            values[f"score_bucket_{bucket_index}"] += count
+
+        return computed
+
+    # ========================================================================
+    # LECTURAS
+    # ========================================================================
+
+    def get_activity_stats(self, activity_id: int) -> Optional[ActivityStatsResponse]:
+        """Estadísticas de una actividad (None si la actividad no existe)"""
+        try:
+            row = self.db.execute(
+                select(Activity.id, ActivityStats)
+                .outerjoin(ActivityStats, ActivityStats.activity_id == Activity.id)
+                .where(Activity.id == activity_id)
+            ).first()
+            if not row:
+                return None
+            return self._to_response(row[0], row[1])
+
+        except Exception as e:
+            logger.error(f"Error obteniendo estadísticas de la actividad {activity_id}: {e}")
+            raise
+
+    def get_course_stats(self, course_id: int) -> CourseActivityStats:
+        """Estadísticas de todas las actividades de un curso en una consulta"""
+        try:
+            rows = self.db.execute(
+                select(Activity.id, ActivityStats)
+                .outerjoin(ActivityStats, ActivityStats.activity_id == Activity.id)
+                .where(Activity.course_id == course_id)
+                .order_by(Activity.id)
+            )
+            return CourseActivityStats(
+                course_id=course_id,
+                activities=[self._to_response(activity_id, stats) for activity_id, stats in rows]
+            )
+
+        except Exception as e:
+            logger.error(f"Error obteniendo estadísticas del curso {course_id}: {e}")
+            raise
+
+    @staticmethod
+    def _to_response(activity_id: int, stats: Optional[ActivityStats]) -> ActivityStatsResponse:
+        # Sin fila: la actividad no ha recibido entregas
+        distribution = stats.distribution if stats else [0] * SCORE_BUCKETS
+        submissions_count = stats.submissions_count if stats else 0
+        graded_count = stats.graded_count if stats else 0
+        return ActivityStatsResponse(
+            activity_id=activity_id,
+            submissions_count=submissions_count,
+            graded_count=graded_count,
+            pending_count=max(submissions_count - graded_count, 0),
+            average_score=stats.average_score if stats else None,
+            distribution=[
+                ScoreBucket(
+                    min_score=bucket * BUCKET_WIDTH,
+                    max_score=(bucket + 1) * BUCKET_WIDTH if bucket < SCORE_BUCKETS - 1 else 100,
+                    count=count,
+                )
+                for bucket, count in enumerate(distribution)
+            ],
+        )
@@ -3,13 +3,93 @@ import json
 import hashlib
 import logging
 import pickle
-from typing import Optional, Any, Union, List, Dict
+import uuid
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Any, Union, List, Dict, Iterable
 from datetime import datetime, timedelta
 from functools import wraps
 import os
 
 logger = logging.getLogger(__name__)
 
+# Tamaño de lote para SCAN/SSCAN y UNLINK: evita bloquear Redis con comandos O(N)
+SCAN_BATCH_SIZE = 1000
+
+# Los contadores de versión viven mucho más que cualquier clave de datos. Si uno
+# expira (o Redis se reinicia o se vacía) no vuelve a 0: se reinicia desde el
+# instante actual en microsegundos (ver ``_version_seed``), así ni una clave de
+# datos ni un ETag emitidos antes pueden coincidir con los nuevos
+VERSION_TTL = 7 * 24 * 3600
+
+# Las claves llevan versión y toda escritura la incrementa (eventos de
+# activities.topic), así que el TTL solo limita memoria, no datos obsoletos
+ACTIVITY_TTL = 3600
+COURSE_ACTIVITIES_TTL = 1800
+SUBMISSIONS_PAGE_TTL = 600
+
+# L1: versiones en memoria de cada proceso. Los eventos de activities.topic
+# las descartan en todas las réplicas; el TTL acota el desfase si se pierde uno
+L1_VERSION_TTL = float(os.getenv("CACHE_L1_VERSION_TTL", "30"))
+L1_MAX_ENTRIES = 10000
+
+
+class LocalCache:
+    """
+    Cache L1 en memoria del proceso (LRU con TTL, segura entre hilos)
+
+    ``generation`` aumenta con cada invalidación: quien lee de Redis toma la
+    generación antes y la pasa a ``set``; si hubo una invalidación mientras
+    tanto, el valor (quizá ya viejo) no se guarda.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, generation: Optional[int] = None):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str]):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+# Compartida por todas las instancias de CacheService del proceso
+local_cache = LocalCache(L1_VERSION_TTL, L1_MAX_ENTRIES)
+
+
 class CacheService:
     """
     Servicio de cache multinivel inteligente para CourseClash
@@ -17,6 +97,8 @@ class CacheService:
     Proporciona cache L2 (Redis distribuido) con:
     - Invalidación automática por eventos
     - Claves jerárquicas para gestión eficiente
+    - Versiones por curso/actividad embebidas en las claves (invalidación = INCR)
+    - Tags (sets de Redis) para invalidar por usuario sin KEYS
     - Fallback graceful en caso de errores
     - Métricas de cache hit/miss
     """
@@ -83,20 +165,75 @@ class CacheService:
             self._misses += 1
             return None
 
-    def set(self, key: str, value: Any, ttl: int = 300) -> bool:
-        """Set value in cache with TTL (seconds)"""
+    def set(self, key: str, value: Any, ttl: int = 300, tags: Optional[List[str]] = None) -> bool:
+        """
+        Set value in cache with TTL (seconds)
+
+        Si se indican tags, la clave se registra en el set ``tag:<tag>`` de cada
+        uno para poder invalidarla luego con ``invalidate_tags`` sin recorrer
+        todo el keyspace.
+        """
         if not self.redis_client:
             return False
             
         try:
             serialized_value = pickle.dumps(value)
-            result = self.redis_client.setex(key, ttl, serialized_value)
+            if not tags:
+                result = self.redis_client.setex(key, ttl, serialized_value)
+            else:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, ttl, serialized_value)
+                for tag in tags:
+                    tag_key = self._tag_key(tag)
+                    pipe.sadd(tag_key, key)
+                    # El set vive al menos tanto como la clave más longeva que contiene
+                    pipe.expire(tag_key, ttl, nx=True)
+                    pipe.expire(tag_key, ttl, gt=True)
+                result = pipe.execute()[0]
             logger.debug(f"💾 Cache SET for key: {key} (TTL: {ttl}s)")
             return result
         except Exception as e:
             logger.warning(f"Cache SET error for key {key}: {e}")
             return False
 
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values with a single MGET (None for misses)"""
+        if not self.redis_client or not keys:
+            return [None] * len(keys)
+
+        try:
+            values = self.redis_client.mget(keys)
+        except Exception as e:
+            logger.warning(f"Cache MGET error for {len(keys)} keys: {e}")
+            self._misses += len(keys)
+            return [None] * len(keys)
+
+        results = []
+        for value in values:
+            if value:
+                self._hits += 1
+                results.append(pickle.loads(value))
+            else:
+                self._misses += 1
+                results.append(None)
+        return results
+
+    def set_many(self, items: Dict[str, Any], ttl: int = 300) -> bool:
+        """Set several values with TTL in one pipelined round trip"""
+        if not self.redis_client or not items:
+            return False
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, ttl, pickle.dumps(value))
+            pipe.execute()
+            logger.debug(f"💾 Cache SET MANY: {len(items)} keys (TTL: {ttl}s)")
+            return True
+        except Exception as e:
+            logger.warning(f"Cache SET MANY error for {len(items)} keys: {e}")
+            return False
+
     def delete(self, key: str) -> bool:
         """Delete key from cache"""
         if not self.redis_client:
@@ -112,63 +249,342 @@ class CacheService:
             return False
 
     def delete_pattern(self, pattern: str) -> int:
-        """Delete all keys matching pattern"""
+        """
+        Delete all keys matching pattern
+
+        Usa SCAN incremental en lugar de KEYS para no bloquear la instancia de
+        Redis compartida (también la usa el websocket manager). Es O(N) sobre el
+        keyspace pero repartido en lotes; para invalidaciones frecuentes usar
+        ``invalidate_tags``.
+        """
         if not self.redis_client:
             return 0
             
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                deleted = self.redis_client.delete(*keys)
+            deleted = 0
+            batch = []
+            for key in self.redis_client.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    deleted += self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.redis_client.unlink(*batch)
+            if deleted:
                 logger.debug(f"🗑️ Cache DELETE PATTERN {pattern}: {deleted} keys deleted")
-                return deleted
-            return 0
+            return deleted
         except Exception as e:
             logger.warning(f"Cache DELETE PATTERN error for {pattern}: {e}")
             return 0
 
+    # ========================================================================
+    # TAGS DE INVALIDACIÓN
+    # ========================================================================
+
+    @staticmethod
+    def course_tag(course_id: int) -> str:
+        return f"course:{course_id}"
+
+    @staticmethod
+    def activity_tag(activity_id: int) -> str:
+        return f"activity:{activity_id}"
+
+    @staticmethod
+    def user_tag(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    def _tag_key(self, tag: str) -> str:
+        """Key of the Redis set holding the cache keys registered under a tag"""
+        return f"tag:{tag}"
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        Delete every key registered under the given tags
+
+        El set de cada tag se renombra atómicamente antes de recorrerlo, de modo
+        que las claves escritas durante la invalidación quedan en un set nuevo y
+        no se pierden. Todos los tags se procesan juntos con pipelines (RENAME,
+        SSCAN y UNLINK por lotes): el número de round trips no crece con el
+        número de tags y el coste es O(claves de los tags), no O(keyspace).
+        """
+        tags = list(dict.fromkeys(tags))
+        if not self.redis_client or not tags:
+            return 0
+
+        deleted = 0
+        try:
+            purge_keys = {
+                self._tag_key(tag): f"{self._tag_key(tag)}:purge:{uuid.uuid4().hex}"
+                for tag in tags
+            }
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag_key, purge_key in purge_keys.items():
+                pipe.rename(tag_key, purge_key)
+            renamed = pipe.execute(raise_on_error=False)
+            # RENAME falla si el tag no existe: no hay nada que invalidar
+            pending = {
+                purge_key: 0
+                for purge_key, result in zip(purge_keys.values(), renamed)
+                if not isinstance(result, Exception)
+            }
+            purged = list(pending)
+
+            batch = []
+            while pending:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for purge_key, cursor in pending.items():
+                    pipe.sscan(purge_key, cursor, count=SCAN_BATCH_SIZE)
+                pages = pipe.execute()
+                pending = {
+                    purge_key: cursor
+                    for purge_key, (cursor, _) in zip(pending, pages)
+                    if int(cursor)
+                }
+                for _, keys in pages:
+                    batch.extend(keys)
+                while len(batch) >= SCAN_BATCH_SIZE:
+                    deleted += self.redis_client.unlink(*batch[:SCAN_BATCH_SIZE])
+                    batch = batch[SCAN_BATCH_SIZE:]
+            if batch:
+                deleted += self.redis_client.unlink(*batch)
+            if purged:
+                self.redis_client.unlink(*purged)
+        except Exception as e:
+            logger.warning(f"Cache INVALIDATE TAGS error for {tags}: {e}")
+
+        logger.debug(f"🗑️ Cache INVALIDATE TAGS {tags}: {deleted} keys deleted")
+        return deleted
+
+    # ========================================================================
+    # VERSIONES (GENERATION COUNTERS)
+    # ========================================================================
+
+    def _version_key(self, scope: str, entity_id: int) -> str:
+        return f"version:{scope}:{entity_id}"
+
+    @staticmethod
+    def _version_seed() -> int:
+        """
+        Valor inicial de un contador que no existe en Redis
+
+        Un contador solo crece de uno en uno, así que el reloj en microsegundos
+        siempre queda por encima de cualquier valor que tuviera antes de
+        perderse: las versiones nunca se repiten tras un reinicio.
+        """
+        return time.time_ns() // 1000
+
+    def _seed_versions(self, version_keys: List[str]) -> List[int]:
+        """Crea con SET NX los contadores que faltan y devuelve su valor actual"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for version_key in version_keys:
+            pipe.set(version_key, self._version_seed(), nx=True, ex=VERSION_TTL)
+            pipe.get(version_key)
+        results = pipe.execute()
+        return [int(value) for value in results[1::2]]
+
+    def get_version(self, scope: str, entity_id: int) -> int:
+        """
+        Get the current cache generation of a course/activity
+
+        Las claves de datos incluyen la versión (``...:v<n>``). Invalidar es
+        incrementar el contador: las lecturas pasan a una clave nueva y las
+        versiones viejas expiran por TTL. Quien lee debe obtener la versión
+        ANTES de consultar la base de datos, así un lector lento nunca puede
+        repoblar datos viejos bajo la versión vigente.
+        """
+        version = self.peek_version(scope, entity_id)
+        return 0 if version is None else version
+
+    def peek_version(self, scope: str, entity_id: int) -> Optional[int]:
+        """
+        Como ``get_version`` pero devuelve None si Redis no está disponible
+
+        Para ETags: el 0 de respaldo no identifica los datos y un 304 con él
+        podría ocultar cambios.
+        """
+        if not self.redis_client:
+            return None
+
+        version_key = self._version_key(scope, entity_id)
+        cached = local_cache.get(version_key)
+        if cached is not None:
+            return cached
+
+        generation = local_cache.generation
+        try:
+            version = self.redis_client.get(version_key)
+            version = int(version) if version else self._seed_versions([version_key])[0]
+        except Exception as e:
+            logger.warning(f"Cache VERSION GET error for {scope}:{entity_id}: {e}")
+            return None
+        local_cache.set(version_key, version, generation)
+        return version
+
+    def get_course_version(self, course_id: int) -> int:
+        return self.get_version("course", course_id)
+
+    def get_activity_version(self, activity_id: int) -> int:
+        return self.get_version("activity", activity_id)
+
+    def get_versions(self, scope: str, entity_ids: List[int]) -> Dict[int, int]:
+        """Get the generation of several courses/activities with a single MGET"""
+        if not self.redis_client or not entity_ids:
+            return {entity_id: 0 for entity_id in entity_ids}
+
+        versions = {}
+        missing = []
+        for entity_id in entity_ids:
+            cached = local_cache.get(self._version_key(scope, entity_id))
+            if cached is None:
+                missing.append(entity_id)
+            else:
+                versions[entity_id] = cached
+        if not missing:
+            return versions
+
+        generation = local_cache.generation
+        try:
+            values = self.redis_client.mget([self._version_key(scope, entity_id) for entity_id in missing])
+            unseeded = [entity_id for entity_id, value in zip(missing, values) if not value]
+            if unseeded:
+                seeded = dict(
+                    zip(unseeded, self._seed_versions([self._version_key(scope, entity_id) for entity_id in unseeded]))
+                )
+                values = [seeded.get(entity_id, value) for entity_id, value in zip(missing, values)]
+        except Exception as e:
+            logger.warning(f"Cache VERSION MGET error for {scope}: {e}")
+            return {entity_id: 0 for entity_id in entity_ids}
+
+        for entity_id, value in zip(missing, values):
+            versions[entity_id] = int(value)
+            local_cache.set(self._version_key(scope, entity_id), versions[entity_id], generation)
+        return versions
+
+    def bump_versions(self, activity_id: int = None, course_id: int = None) -> bool:
+        """Atomically increment the generation of an activity and/or its course"""
+        return self.bump_many(
+            activity_ids=[] if activity_id is None else [activity_id],
+            course_ids=[] if course_id is None else [course_id],
+        )
+
+    def bump_many(self, activity_ids: Iterable[int] = (), course_ids: Iterable[int] = ()) -> bool:
+        """Increment the generation of several activities/courses in one MULTI"""
+        version_keys = [self._version_key("activity", activity_id) for activity_id in activity_ids]
+        version_keys += [self._version_key("course", course_id) for course_id in course_ids]
+        if not version_keys:
+            return True
+        if not self.redis_client:
+            return False
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            for version_key in version_keys:
+                pipe.set(version_key, self._version_seed(), nx=True, ex=VERSION_TTL)
+                pipe.incr(version_key)
+                pipe.expire(version_key, VERSION_TTL)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Cache VERSION BUMP error for {version_keys}: {e}")
+            return False
+        finally:
+            local_cache.invalidate(version_keys)
+
+    def invalidate_local_versions(self, activity_ids: Iterable[int] = (), course_ids: Iterable[int] = ()):
+        """Drop L1 versions only (Redis was already bumped by the writer replica)"""
+        local_cache.invalidate(
+            [self._version_key("activity", activity_id) for activity_id in activity_ids]
+            + [self._version_key("course", course_id) for course_id in course_ids]
+        )
+
     # ========================================================================
     # CACHE METHODS ESPECÍFICOS PARA ACTIVITIES
     # ========================================================================
 
-    def cache_activity(self, activity_id: int, activity_data: Any, ttl: int = 600) -> bool:
-        """Cache activity data for 10 minutes"""
-        key = self._generate_key("activity", activity_id)
+    def cache_activity(self, activity_id: int, activity_data: Any, ttl: int = ACTIVITY_TTL, version: int = None) -> bool:
+        """Cache activity data (versioned key)"""
+        if version is None:
+            version = self.get_activity_version(activity_id)
+        key = self._generate_key("activity", activity_id, f"v{version}")
         return self.set(key, activity_data, ttl)
 
-    def get_cached_activity(self, activity_id: int) -> Optional[Any]:
+    def get_cached_activity(self, activity_id: int, version: int = None) -> Optional[Any]:
         """Get cached activity data"""
-        key = self._generate_key("activity", activity_id)
+        if version is None:
+            version = self.get_activity_version(activity_id)
+        key = self._generate_key("activity", activity_id, f"v{version}")
         return self.get(key)
 
-    def cache_course_activities(self, course_id: int, activities_data: List[Any], ttl: int = 300) -> bool:
-        """Cache course activities list for 5 minutes"""
-        key = self._generate_key("course_activities", course_id)
+    def get_cached_activities(self, activity_ids: List[int], versions: Dict[int, int]) -> Dict[int, Any]:
+        """Get several cached activities in one MGET; only hits are returned"""
+        keys = [self._generate_key("activity", activity_id, f"v{versions[activity_id]}") for activity_id in activity_ids]
+        values = self.get_many(keys)
+        return {activity_id: value for activity_id, value in zip(activity_ids, values) if value is not None}
+
+    def cache_activities(self, activities_data: Dict[int, Any], versions: Dict[int, int], ttl: int = ACTIVITY_TTL) -> bool:
+        """Cache several activities in one pipelined round trip"""
+        items = {
+            self._generate_key("activity", activity_id, f"v{versions[activity_id]}"): data
+            for activity_id, data in activities_data.items()
+        }
+        return self.set_many(items, ttl)
+
+    def cache_course_activities(self, course_id: int, activities_data: List[Any], ttl: int = COURSE_ACTIVITIES_TTL, version: int = None) -> bool:
+        """Cache course activities list (versioned key)"""
+        if version is None:
+            version = self.get_course_version(course_id)
+        key = self._generate_key("course_activities", course_id, f"v{version}")
         return self.set(key, activities_data, ttl)
 
-    def get_cached_course_activities(self, course_id: int) -> Optional[List[Any]]:
+    def get_cached_course_activities(self, course_id: int, version: int = None) -> Optional[List[Any]]:
         """Get cached course activities"""
-        key = self._generate_key("course_activities", course_id)
+        if version is None:
+            version = self.get_course_version(course_id)
+        key = self._generate_key("course_activities", course_id, f"v{version}")
+        return self.get(key)
+
+    def cache_course_activities_page(self, course_id: int, version: int, page_key: str, page_data: Any, ttl: int = COURSE_ACTIVITIES_TTL) -> bool:
+        """Cache one keyset page of a course activities list (keyed by cursor, size and projection)"""
+        key = self._generate_key("course_activities", course_id, f"v{version}", "page", page_key)
+        return self.set(key, page_data, ttl)
+
+    def get_cached_course_activities_page(self, course_id: int, version: int, page_key: str) -> Optional[Any]:
+        """Get a cached keyset page of a course activities list"""
+        key = self._generate_key("course_activities", course_id, f"v{version}", "page", page_key)
+        return self.get(key)
+
+    def cache_submissions_page(self, activity_id: int, version: int, page_key: str, page_data: Any, ttl: int = SUBMISSIONS_PAGE_TTL) -> bool:
+        """Cache one keyset page of an activity submissions list (versioned by the activity)"""
+        key = self._generate_key("activity_submissions", activity_id, f"v{version}", "page", page_key)
+        return self.set(key, page_data, ttl)
+
+    def get_cached_submissions_page(self, activity_id: int, version: int, page_key: str) -> Optional[Any]:
+        """Get a cached keyset page of an activity submissions list"""
+        key = self._generate_key("activity_submissions", activity_id, f"v{version}", "page", page_key)
         return self.get(key)
 
     def cache_user_submissions(self, user_id: int, submissions_data: List[Any], ttl: int = 180) -> bool:
         """Cache user submissions for 3 minutes"""
         key = self._generate_key("user_submissions", user_id)
-        return self.set(key, submissions_data, ttl)
+        return self.set(key, submissions_data, ttl, tags=[self.user_tag(user_id)])
 
     def get_cached_user_submissions(self, user_id: int) -> Optional[List[Any]]:
         """Get cached user submissions"""
         key = self._generate_key("user_submissions", user_id)
         return self.get(key)
 
-    def cache_activity_grades(self, activity_id: int, grades_data: List[Any], ttl: int = 300) -> bool:
-        """Cache activity grades for 5 minutes"""
-        key = self._generate_key("activity_grades", activity_id)
+    def cache_activity_grades(self, activity_id: int, grades_data: List[Any], ttl: int = COURSE_ACTIVITIES_TTL, version: int = None) -> bool:
+        """Cache activity grades (versioned key)"""
+        if version is None:
+            version = self.get_activity_version(activity_id)
+        key = self._generate_key("activity_grades", activity_id, f"v{version}")
         return self.set(key, grades_data, ttl)
 
-    def get_cached_activity_grades(self, activity_id: int) -> Optional[List[Any]]:
+    def get_cached_activity_grades(self, activity_id: int, version: int = None) -> Optional[List[Any]]:
         """Get cached activity grades"""
-        key = self._generate_key("activity_grades", activity_id)
+        if version is None:
+            version = self.get_activity_version(activity_id)
+        key = self._generate_key("activity_grades", activity_id, f"v{version}")
         return self.get(key)
 
     # ========================================================================
@@ -176,33 +592,30 @@ class CacheService:
     # ========================================================================
 
     def invalidate_activity_cache(self, activity_id: int, course_id: int = None):
-        """Invalidate all caches related to an activity"""
-        # Delete specific activity cache
-        activity_key = self._generate_key("activity", activity_id)
-        self.delete(activity_key)
-        
-        # Delete activity grades cache
-        grades_key = self._generate_key("activity_grades", activity_id)
-        self.delete(grades_key)
-        
-        # Delete course activities cache if course_id provided
-        if course_id:
-            course_key = self._generate_key("course_activities", course_id)
-            self.delete(course_key)
+        """Invalidate all caches related to an activity (and its course list)"""
+        self.bump_versions(activity_id=activity_id, course_id=course_id)
         
         logger.info(f"🗑️ Invalidated cache for activity {activity_id}")
 
     def invalidate_user_cache(self, user_id: int):
         """Invalidate all caches related to a user"""
-        submissions_key = self._generate_key("user_submissions", user_id)
-        self.delete(submissions_key)
-        
-        logger.info(f"🗑️ Invalidated cache for user {user_id}")
+        self.invalidate_user_caches([user_id])
+
+    def invalidate_user_caches(self, user_ids: Iterable[int]):
+        """Invalidate the caches of several users in one pass (pipelined)"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        self.invalidate_tags(*[self.user_tag(user_id) for user_id in user_ids])
+
+        if len(user_ids) == 1:
+            logger.info(f"🗑️ Invalidated cache for user {user_ids[0]}")
+        else:
+            logger.info(f"🗑️ Invalidated cache for {len(user_ids)} users")
 
     def invalidate_course_cache(self, course_id: int):
         """Invalidate all caches related to a course"""
-        course_key = self._generate_key("course_activities", course_id)
-        self.delete(course_key)
+        self.bump_versions(course_id=course_id)
         
         logger.info(f"🗑️ Invalidated cache for course {course_id}")
 
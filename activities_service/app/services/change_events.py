@@ -0,0 +1,273 @@
+"""
+Eventos de cambio de actividades, entregas, calificaciones y comentarios
+
+Cada commit que modifica estas entidades (por cualquier ruta: /api/activities,
+/api/v2/activities, entregas, calificaciones, herramientas) genera eventos
+compactos. Tras el commit:
+
+1. Se invalida el cache L2 (Redis) una sola vez, en la réplica que escribió
+2. Se publican en el exchange ``activities.topic`` (routing key
+   ``<entidad>.<acción>``, p. ej. ``grade.updated``)
+3. Cada réplica consume el exchange con una cola exclusiva y descarta su L1
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from typing import Optional, List, Iterable
+from dataclasses import dataclass, asdict
+import asyncio
+import json
+import logging
+import os
+import socket
+
+import aio_pika
+
+from app.models import Activity, Submission, Grade, Comment
+from app.services.cache_service import CacheService, cache_service
+
+logger = logging.getLogger(__name__)
+
+RABBITMQ_URL = os.getenv("RABBITMQ_URL", "amqp://courseclash:courseclash123@cc_broker:5672/%2Fcourseclash")
+ACTIVITIES_EXCHANGE = "activities.topic"
+
+# Identifica los mensajes propios (su L1 ya se invalidó al hacer commit)
+REPLICA_ID = f"{socket.gethostname()}:{os.getpid()}"
+# Eventos pendientes de publicar si RabbitMQ está caído; después se descartan
+EVENT_QUEUE_SIZE = 10000
+RECONNECT_DELAY = 5
+
+PENDING_EVENTS_KEY = "pending_change_events"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    entity: str  # activity | submission | grade | comment
+    action: str  # created | updated | deleted
+    id: Optional[int] = None
+    activity_id: Optional[int] = None
+    course_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+    @property
+    def routing_key(self) -> str:
+        return f"{self.entity}.{self.action}"
+
+    def to_message(self) -> bytes:
+        return json.dumps({k: v for k, v in asdict(self).items() if v is not None}, separators=(",", ":")).encode()
+
+    @classmethod
+    def from_message(cls, body: bytes) -> "ChangeEvent":
+        data = json.loads(body)
+        return cls(**{field: data.get(field) for field in cls.__dataclass_fields__})
+
+
+# ============================================================================
+# RECOLECCIÓN EN LA SESIÓN (ORM)
+# ============================================================================
+
+def record_changes(session: Session, events: Iterable[ChangeEvent]):
+    """Registrar eventos de escrituras que no pasan por el flush del ORM (INSERT/UPDATE en lote)"""
+    session.info.setdefault(PENDING_EVENTS_KEY, []).extend(events)
+
+
+def _submission_of(session: Session, grade: Grade) -> Optional[Submission]:
+    if "submission" not in inspect(grade).unloaded:
+        return grade.submission
+    return session.get(Submission, grade.submission_id)
+
+
+def _events_for(session: Session, obj, action: str) -> List[ChangeEvent]:
+    if isinstance(obj, Activity):
+        events = [ChangeEvent("activity", action, obj.id, activity_id=obj.id, course_id=obj.course_id)]
+        # Si cambió de curso también hay que invalidar el listado del curso anterior
+        for old_course_id in inspect(obj).attrs.course_id.history.deleted or ():
+            if old_course_id is not None and old_course_id != obj.course_id:
+                events.append(ChangeEvent("activity", action, obj.id, activity_id=obj.id, course_id=old_course_id))
+        return events
+    if isinstance(obj, Submission):
+        return [ChangeEvent("submission", action, obj.id, activity_id=obj.activity_id, user_id=obj.user_id)]
+    if isinstance(obj, Grade):
+        submission = _submission_of(session, obj)
+        if submission is None:
+            return [ChangeEvent("grade", action, obj.id)]
+        return [ChangeEvent("grade", action, obj.id, activity_id=submission.activity_id, user_id=submission.user_id)]
+    if isinstance(obj, Comment):
+        return [ChangeEvent("comment", action, obj.id, activity_id=obj.activity_id, user_id=obj.user_id)]
+    return []
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    """Eventos de lo que acaba de escribirse (los ids ya están asignados)"""
+    events = []
+    for obj in session.new:
+        events.extend(_events_for(session, obj, "created"))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            events.extend(_events_for(session, obj, "updated"))
+    for obj in session.deleted:
+        events.extend(_events_for(session, obj, "deleted"))
+    if events:
+        record_changes(session, events)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session):
+    events = session.info.pop(PENDING_EVENTS_KEY, None)
+    if events:
+        dispatch(list(dict.fromkeys(events)))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_after_rollback(session, transaction):
+    # Tras un rollback de la transacción raíz los cambios no existen
+    if transaction.parent is None:
+        session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+# ============================================================================
+# INVALIDACIÓN
+# ============================================================================
+
+def invalidate(cache: CacheService, events: List[ChangeEvent], local_only: bool = False):
+    """
+    Invalidar lo afectado por los eventos
+
+    Toda escritura cambia la versión de su actividad (detalle, comentarios,
+    calificaciones); las de actividades también la del listado del curso y
+    las de entregas/calificaciones el cache por estudiante.
+    """
+    activity_ids = {e.activity_id for e in events if e.activity_id is not None}
+    course_ids = {e.course_id for e in events if e.course_id is not None}
+    user_ids = {e.user_id for e in events if e.user_id is not None and e.entity in ("submission", "grade")}
+
+    if local_only:
+        cache.invalidate_local_versions(activity_ids, course_ids)
+        return
+
+    cache.bump_many(activity_ids, course_ids)
+    cache.invalidate_user_caches(user_ids)
+
+
+def dispatch(events: List[ChangeEvent]):
+    """Invalidar L1/L2 de esta réplica y publicar para las demás (nunca lanza: el commit ya ocurrió)"""
+    try:
+        invalidate(cache_service, events)
+    except Exception as e:
+        logger.warning(f"⚠️ Error invalidando cache tras commit: {e}")
+    change_event_bus.publish(events)
+
+
+# ============================================================================
+# RABBITMQ (activities.topic)
+# ============================================================================
+
+class ChangeEventBus:
+    """
+    Publicador y consumidor de ``activities.topic`` para una réplica
+
+    ``publish`` es seguro desde cualquier hilo (los servicios son síncronos y
+    corren en el threadpool): encola en el event loop y una tarea publica. Si
+    el bus no se arrancó (scripts, herramientas) solo se invalida localmente.
+    """
+
+    def __init__(self, url: str = RABBITMQ_URL):
+        self.url = url
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self.exchange: Optional[aio_pika.abc.AbstractExchange] = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self.connection:
+            await self.connection.close()
+        self.loop = None
+
+    def publish(self, events: List[ChangeEvent]):
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._enqueue, events)
+
+    def _enqueue(self, events: List[ChangeEvent]):
+        for change in events:
+            try:
+                self.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                self.dropped += 1
+        if self.dropped and self.dropped % 1000 == 1:
+            logger.warning(f"⚠️ Cola de eventos llena: {self.dropped} eventos descartados")
+
+    async def _connect(self):
+        # connect_robust restaura canal, cola exclusiva y consumidor al reconectar
+        self.connection = await aio_pika.connect_robust(self.url)
+        channel = await self.connection.channel()
+        self.exchange = await channel.declare_exchange(ACTIVITIES_EXCHANGE, aio_pika.ExchangeType.TOPIC, durable=True)
+        # Cola exclusiva por réplica: cada proceso recibe todos los eventos
+        queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(self.exchange, "#")
+        await queue.consume(self._handle_message, no_ack=True)
+
+    async def _run(self):
+        while self.connection is None:
+            try:
+                await self._connect()
+                logger.info(f"✅ Eventos de cambio conectados a {ACTIVITIES_EXCHANGE} ({REPLICA_ID})")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connection = None
+                logger.warning(f"⚠️ RabbitMQ no disponible para eventos de cambio ({e}); reintento en {RECONNECT_DELAY}s")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+        while True:
+            change = await self.queue.get()
+            try:
+                await self.exchange.publish(
+                    aio_pika.Message(
+                        change.to_message(),
+                        content_type="application/json",
+                        app_id=REPLICA_ID,
+                        delivery_mode=aio_pika.DeliveryMode.NOT_PERSISTENT,
+                    ),
+                    routing_key=change.routing_key,
+                )
+                self.published += 1
+            except Exception as e:
+                # Perdido: el TTL de L1 acota el desfase en las otras réplicas
+                self.dropped += 1
+                logger.warning(f"⚠️ Error publicando evento {change.routing_key}: {e}")
+
+    async def _handle_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        if message.app_id == REPLICA_ID:
+            return
+        try:
+            change = ChangeEvent.from_message(message.body)
+        except Exception as e:
+            logger.warning(f"⚠️ Evento de cambio inválido ({message.routing_key}): {e}")
+            return
+        self.received += 1
+        invalidate(cache_service, [change], local_only=True)
+
+    def get_stats(self) -> dict:
+        return {
+            "connected": self.connection is not None and not self.connection.is_closed,
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "pending": self.queue.qsize() if self.queue else 0,
+        }
+
+
+change_event_bus = ChangeEventBus()
@@ -0,0 +1,427 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from fastapi import UploadFile
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, List, Iterable
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import uuid
+
+import aiofiles
+
+from app.models.stored_file import FileBlob, StoredFile
+from app.services.storage_backends import DirectUploadBackend, StorageBackend, STAGING_PREFIX, get_storage_backend, object_key
+
+logger = logging.getLogger(__name__)
+
+# Configuración de almacenamiento
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_DIRECTORY = "uploads"
+TEMP_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, ".tmp")
+PUBLIC_URL_PREFIX = "/api/v1/files/download/"
+
+# Streaming de subidas: tamaño de bloque y subidas simultáneas por worker
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", "8"))
+
+# Subidas directas multipart (backends remotos): tamaño de parte (S3 exige >= 5MB salvo la última)
+MULTIPART_PART_SIZE = int(os.getenv("MULTIPART_PART_SIZE", str(8 * 1024 * 1024)))
+
+# Clave de staging de una subida directa (PUT): el hash firmado va en la clave
+STAGED_UPLOAD_KEY = re.compile(
+    re.escape(STAGING_PREFIX) + r"[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}/(?P<sha256>[0-9a-f]{64})"
+)
+
+upload_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+os.makedirs(TEMP_DIRECTORY, exist_ok=True)
+
+
+class FileTooLargeError(ValueError):
+    """El archivo supera MAX_FILE_SIZE mientras se recibe"""
+
+
+class DirectUploadNotSupportedError(ValueError):
+    """El backend configurado no admite subidas directas con URLs prefirmadas"""
+
+
+@dataclass
+class UploadResult:
+    """Resultado de guardar un archivo subido"""
+    filename: str
+    size: int
+    sha256: str
+    deduplicated: bool = False
+
+
+@dataclass
+class ResolvedFile:
+    """
+    Archivo público resuelto a su blob: ``path`` si está en disco local,
+    ``key`` si solo existe en un backend remoto
+    """
+    path: Optional[str] = None
+    key: Optional[str] = None
+    sha256: Optional[str] = None
+    original_name: Optional[str] = None
+
+
+def filename_from_url(file_url: Optional[str]) -> Optional[str]:
+    """Extraer el nombre público de una URL de descarga propia (None para URLs externas)"""
+    if not file_url or PUBLIC_URL_PREFIX not in file_url:
+        return None
+    filename = file_url.rsplit(PUBLIC_URL_PREFIX, 1)[1].split("?", 1)[0]
+    return filename or None
+
+
+def file_urls_of(entity) -> List[str]:
+    """URLs de archivo referenciadas por una entrega o actividad"""
+    urls = [getattr(entity, "file_url", None)]
+    urls.extend(getattr(entity, "additional_files", None) or [])
+    return [url for url in urls if url]
+
+
+class FileStorageService:
+    """
+    Almacenamiento de archivos direccionado por contenido
+
+    - El contenido se guarda una sola vez bajo ``objects/ab/cd/<sha256>`` en el
+      backend configurado (disco local o S3, ver storage_backends)
+    - Cada subida recibe un nombre público estable (``file_url`` no cambia)
+    - ``StoredFile.ref_count`` cuenta las entregas/actividades que lo usan y
+      ``FileBlob.ref_count`` los nombres públicos que apuntan al contenido
+    - Los blobs sin referencias los elimina ``python -m app.tools.file_storage gc``
+    """
+
+    def __init__(self, db: Session, backend: Optional[StorageBackend] = None):
+        self.db = db
+        self.backend = backend or get_storage_backend()
+
+    # ========================================================================
+    # SUBIDAS
+    # ========================================================================
+
+    async def store_upload(self, file: UploadFile, uploaded_by: Optional[int] = None) -> UploadResult:
+        """
+        Guardar un archivo subido leyéndolo por bloques
+
+        Escribe en un temporal con un contador de bytes que aborta al superar
+        MAX_FILE_SIZE y calcula el SHA-256 al vuelo. Si el contenido ya existe
+        el temporal se descarta; si no, se renombra atómicamente a su shard.
+        """
+        # Rechazo temprano si Starlette ya conoce el tamaño
+        if file.size is not None and file.size > MAX_FILE_SIZE:
+            raise FileTooLargeError(f"Archivo demasiado grande. Máximo permitido: {MAX_FILE_SIZE // (1024*1024)}MB")
+
+        unique_filename = self._public_filename(file.filename)
+        temp_path = os.path.join(TEMP_DIRECTORY, f"{unique_filename}.part")
+        digest = hashlib.sha256()
+        size = 0
+
+        async with upload_semaphore:
+            try:
+                async with aiofiles.open(temp_path, 'wb') as f:
+                    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_FILE_SIZE:
+                            raise FileTooLargeError(f"Archivo demasiado grande. Máximo permitido: {MAX_FILE_SIZE // (1024*1024)}MB")
+                        digest.update(chunk)
+                        await f.write(chunk)
+
+                sha256 = digest.hexdigest()
+                deduplicated = await asyncio.to_thread(
+                    self.commit_blob, sha256, size,
+                    self._new_stored_file(unique_filename, sha256, file.filename, file.content_type, uploaded_by),
+                    temp_path
+                )
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        logger.info(f"Archivo {unique_filename} almacenado como {sha256[:12]} (deduplicado={deduplicated})")
+        return UploadResult(filename=unique_filename, size=size, sha256=sha256, deduplicated=deduplicated)
+
+    def commit_blob(self, sha256: str, size: int, stored_file: StoredFile, source_path: Optional[str] = None) -> bool:
+        """
+        Registrar un nombre público para un contenido y colocar el blob
+
+        El incremento de ``FileBlob.ref_count`` bloquea la fila hasta el commit,
+        así el recolector no puede borrar el blob mientras se coloca el archivo.
+        Sin ``source_path`` el objeto ya debe estar en el backend (subida directa).
+        Devuelve True si el contenido ya existía (deduplicado).
+        """
+        key = object_key(sha256)
+        for attempt in range(2):
+            try:
+                updated = self.db.query(FileBlob).filter(FileBlob.sha256 == sha256).update(
+                    {FileBlob.ref_count: FileBlob.ref_count + 1},
+                    synchronize_session=False
+                )
+                if not updated:
+                    self.db.add(FileBlob(sha256=sha256, size=size, ref_count=1))
+                    self.db.flush()
+
+                deduplicated = self.backend.exists(key)
+                if source_path is None:
+                    if not deduplicated:
+                        raise ValueError("El contenido subido no se encuentra en el almacenamiento")
+                elif deduplicated:
+                    os.remove(source_path)
+                else:
+                    self.backend.put_file(source_path, key, stored_file.content_type)
+
+                self.db.add(stored_file)
+                self.db.commit()
+                return deduplicated
+            except IntegrityError:
+                # Otra subida insertó el mismo blob a la vez: reintentar como incremento
+                self.db.rollback()
+                if attempt:
+                    raise
+            except Exception:
+                self.db.rollback()
+                raise
+
+    @staticmethod
+    def _new_stored_file(filename: str, sha256: str, original_name: Optional[str], content_type: Optional[str], uploaded_by: Optional[int]) -> StoredFile:
+        return StoredFile(
+            filename=filename,
+            sha256=sha256,
+            original_name=(original_name or filename)[:255],
+            content_type=content_type,
+            ref_count=0,
+            uploaded_by=uploaded_by
+        )
+
+    @staticmethod
+    def _public_filename(original_name: Optional[str]) -> str:
+        file_extension = original_name.split('.')[-1].lower() if original_name else 'bin'
+        return f"{uuid.uuid4()}.{file_extension}"
+
+    # ========================================================================
+    # SUBIDAS DIRECTAS (URLs prefirmadas, los bytes no pasan por el servicio)
+    # ========================================================================
+
+    def prepare_direct_upload(self, sha256: str, size: int, content_type: str) -> dict:
+        """
+        Preparar una subida directa de un archivo cuyo SHA-256 calcula el cliente
+
+        Devuelve un PUT prefirmado, con hash y tamaño firmados, a una clave propia
+        de la subida en ``staging/``. El contenido se sube aunque ya esté
+        almacenado: así completar demuestra que el cliente lo tiene y la
+        respuesta no revela qué hashes existen.
+        """
+        backend = self._check_direct_upload(size)
+        key = f"{STAGING_PREFIX}{uuid.uuid4()}/{sha256}"
+        return {"key": key, **backend.presigned_upload(key, content_type, sha256, size)}
+
+    async def complete_direct_upload(self, key: str, size: int, original_name: Optional[str], content_type: str, uploaded_by: Optional[int] = None) -> UploadResult:
+        """
+        Completar una subida directa y registrar su nombre público
+
+        El hash sale de la clave de staging, no de la petición: solo un cuerpo con
+        ese hash pudo escribirse en ella con la URL prefirmada. El objeto se copia
+        dentro del almacén a su clave por contenido (si no existía) y se borra.
+        """
+        backend = self._check_direct_upload(size)
+        sha256 = self._staged_sha256(key)
+        try:
+            stored_size = await asyncio.to_thread(backend.object_size, key)
+            if stored_size is None:
+                raise ValueError("El contenido subido no se encuentra en el almacenamiento")
+            if stored_size != size:
+                raise ValueError(f"El archivo subido ocupa {stored_size} bytes, se declararon {size}")
+            await asyncio.to_thread(self._promote_staged, backend, key, sha256)
+        finally:
+            await asyncio.to_thread(backend.delete, key)
+
+        return await asyncio.to_thread(self._register_direct_upload, sha256, size, original_name, content_type, uploaded_by)
+
+    @staticmethod
+    def _staged_sha256(key: str) -> str:
+        """Hash de una clave ``staging/<uuid>/<sha256>`` de subida directa"""
+        match = STAGED_UPLOAD_KEY.fullmatch(key)
+        if not match:
+            raise ValueError("Clave de subida directa inválida")
+        return match.group("sha256")
+
+    @staticmethod
+    def _promote_staged(backend: DirectUploadBackend, key: str, sha256: str):
+        """Copiar un objeto verificado de staging a su clave por contenido"""
+        if not backend.exists(object_key(sha256)):
+            backend.copy(key, object_key(sha256))
+
+    def _register_direct_upload(self, sha256: str, size: int, original_name: Optional[str], content_type: str, uploaded_by: Optional[int]) -> UploadResult:
+        """Registrar el nombre público de un contenido ya colocado en su clave"""
+        filename = self._public_filename(original_name)
+        deduplicated = self.commit_blob(
+            sha256, size, self._new_stored_file(filename, sha256, original_name, content_type, uploaded_by)
+        )
+        logger.info(f"Subida directa {filename} registrada como {sha256[:12]}")
+        return UploadResult(filename=filename, size=size, sha256=sha256, deduplicated=deduplicated)
+
+    def start_multipart_upload(self, size: int, content_type: str) -> dict:
+        """Iniciar una subida multipart con una URL prefirmada por parte"""
+        backend = self._check_direct_upload(size)
+        part_count = max(1, -(-size // MULTIPART_PART_SIZE))
+        upload = backend.create_multipart_upload(content_type, part_count)
+        return {**upload, "part_size": MULTIPART_PART_SIZE}
+
+    async def complete_multipart_upload(
+        self,
+        key: str,
+        upload_id: str,
+        parts: List[dict],
+        size: int,
+        original_name: Optional[str],
+        content_type: str,
+        uploaded_by: Optional[int] = None
+    ) -> UploadResult:
+        """
+        Completar una subida multipart
+
+        Las URLs de las partes no firman su tamaño: antes de leer un solo byte
+        se comprueba con HEAD que el objeto tiene el tamaño declarado (y no
+        supera MAX_FILE_SIZE); si no, se descarta. El hash de una subida
+        multipart no lo verifica S3, así que se calcula leyendo el objeto una
+        vez (fuera del event loop) antes de copiarlo, dentro de S3, a su clave
+        por contenido.
+        """
+        backend = self._check_direct_upload(size)
+        if not key.startswith(STAGING_PREFIX):
+            raise ValueError("Clave de subida multipart inválida")
+
+        await asyncio.to_thread(backend.complete_multipart_upload, key, upload_id, parts)
+        try:
+            stored_size = await asyncio.to_thread(backend.object_size, key)
+            if stored_size is None:
+                raise ValueError("El contenido subido no se encuentra en el almacenamiento")
+            if stored_size > MAX_FILE_SIZE:
+                raise FileTooLargeError(f"Archivo demasiado grande. Máximo permitido: {MAX_FILE_SIZE // (1024*1024)}MB")
+            if stored_size != size:
+                raise ValueError(f"El archivo subido ocupa {stored_size} bytes, se declararon {size}")
+
+            sha256, size = await asyncio.to_thread(backend.hash_object, key)
+            await asyncio.to_thread(self._promote_staged, backend, key, sha256)
+        finally:
+            await asyncio.to_thread(backend.delete, key)
+
+        return await asyncio.to_thread(self._register_direct_upload, sha256, size, original_name, content_type, uploaded_by)
+
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        backend = self._direct_backend()
+        if not key.startswith(STAGING_PREFIX):
+            raise ValueError("Clave de subida multipart inválida")
+        backend.abort_multipart_upload(key, upload_id)
+
+    def _direct_backend(self) -> DirectUploadBackend:
+        if not isinstance(self.backend, DirectUploadBackend):
+            raise DirectUploadNotSupportedError("El almacenamiento configurado no admite subidas directas")
+        return self.backend
+
+    def _check_direct_upload(self, size: int) -> DirectUploadBackend:
+        backend = self._direct_backend()
+        if size > MAX_FILE_SIZE:
+            raise FileTooLargeError(f"Archivo demasiado grande. Máximo permitido: {MAX_FILE_SIZE // (1024*1024)}MB")
+        return backend
+
+    # ========================================================================
+    # LECTURA Y BORRADO
+    # ========================================================================
+
+    def resolve(self, filename: str) -> Optional[ResolvedFile]:
+        """
+        Resolver el archivo público ``filename`` a su blob
+
+        Los archivos anteriores al almacén por contenido (sin migrar) se sirven
+        desde el directorio plano ``uploads/`` y no tienen hash conocido.
+        """
+        stored_file = self.get_stored_file(filename)
+        if stored_file:
+            key = object_key(stored_file.sha256)
+            path = self.backend.local_path(key)
+            if path and not os.path.exists(path):
+                return None
+            return ResolvedFile(path=path, key=key, sha256=stored_file.sha256, original_name=stored_file.original_name)
+
+        legacy_path = os.path.join(UPLOAD_DIRECTORY, filename)
+        if not os.path.abspath(legacy_path).startswith(os.path.abspath(UPLOAD_DIRECTORY) + os.sep):
+            return None
+        return ResolvedFile(path=legacy_path) if os.path.isfile(legacy_path) else None
+
+    def get_stored_file(self, filename: str) -> Optional[StoredFile]:
+        return self.db.query(StoredFile).filter(StoredFile.filename == filename).first()
+
+    def delete_file(self, filename: str) -> bool:
+        """Eliminar un nombre público; el blob se recolecta cuando nadie más lo usa"""
+        try:
+            stored_file = self.get_stored_file(filename)
+            if stored_file:
+                self.drop_stored_files([stored_file])
+                self.db.commit()
+                return True
+
+            resolved = self.resolve(filename)
+            if resolved and resolved.path:
+                os.remove(resolved.path)
+                return True
+            return False
+        except Exception:
+            self.db.rollback()
+            raise
+
+    # ========================================================================
+    # CONTEO DE REFERENCIAS (dentro de la transacción del llamador)
+    # ========================================================================
+
+    def retain(self, file_urls: Iterable[str]):
+        """Sumar una referencia por cada URL propia (no hace commit)"""
+        for filename, count in Counter(self._filenames(file_urls)).items():
+            self.db.query(StoredFile).filter(StoredFile.filename == filename).update(
+                {StoredFile.ref_count: StoredFile.ref_count + count},
+                synchronize_session=False
+            )
+
+    def release(self, file_urls: Iterable[str]):
+        """
+        Restar una referencia por cada URL propia (no hace commit)
+        Los nombres que quedan sin referencias se eliminan y liberan su blob
+        """
+        filenames = Counter(self._filenames(file_urls))
+        if not filenames:
+            return
+
+        for filename, count in filenames.items():
+            self.db.query(StoredFile).filter(StoredFile.filename == filename).update(
+                {StoredFile.ref_count: StoredFile.ref_count - count},
+                synchronize_session=False
+            )
+
+        unreferenced = self.db.query(StoredFile).filter(
+            StoredFile.filename.in_(list(filenames)),
+            StoredFile.ref_count <= 0
+        ).all()
+        self.drop_stored_files(unreferenced)
+
+    def sync_references(self, old_urls: Iterable[str], new_urls: Iterable[str]):
+        """Ajustar referencias al cambiar los archivos de una entrega/actividad"""
+        old_counts, new_counts = Counter(old_urls), Counter(new_urls)
+        self.retain((new_counts - old_counts).elements())
+        self.release((old_counts - new_counts).elements())
+
+    def _filenames(self, file_urls: Iterable[str]) -> List[str]:
+        return [name for name in (filename_from_url(url) for url in file_urls) if name]
+
+    def drop_stored_files(self, stored_files: List[StoredFile]):
+        """Eliminar nombres públicos y restar su referencia al blob (no hace commit)"""
+        for blob_sha, count in Counter(stored_file.sha256 for stored_file in stored_files).items():
+            self.db.query(FileBlob).filter(FileBlob.sha256 == blob_sha).update(
+                {FileBlob.ref_count: FileBlob.ref_count - count},
+                synchronize_session=False
+            )
+        for stored_file in stored_files:
+            self.db.delete(stored_file)
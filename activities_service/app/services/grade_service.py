@@ -1,16 +1,21 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Optional
+from sqlalchemy import and_, func, insert, select, update
+from typing import Optional, List, Dict
 from datetime import datetime
 import logging
 
 from app.models.grade import Grade
 from app.models.submission import Submission
 from app.models.activity import Activity
-from app.schemas.grade import GradeCreate, GradeUpdate, GradeResponse
+from app.schemas.grade import GradeCreate, GradeUpdate, GradeResponse, BulkGradeItem, BulkGradeResult
+from app.services.activity_stats_service import ActivityStatsService, StatsDelta
+from app.services.change_events import ChangeEvent, record_changes
 
 logger = logging.getLogger(__name__)
 
+# Máximo de filas por calificación masiva
+MAX_BULK_GRADES = 1000
+
 class GradeService:
     def __init__(self, db: Session):
         self.db = db
@@ -57,6 +62,9 @@ class GradeService:
             )
             
             self.db.add(db_grade)
+            stats_delta = StatsDelta()
+            stats_delta.add_score(grade_data.score)
+            ActivityStatsService(self.db).record(submission.activity_id, stats_delta)
             self.db.commit()
             self.db.refresh(db_grade)
             
@@ -68,6 +76,124 @@ class GradeService:
             logger.error(f"Error creando calificación: {e}")
             raise
     
+    def bulk_grade(
+        self,
+        items: List[BulkGradeItem],
+        graded_by: int,
+        upsert: bool = False,
+        rows: Optional[List[int]] = None
+    ) -> List[BulkGradeResult]:
+        """
+        Calificar muchas entregas en una sola transacción
+
+        - Validación con dos consultas por conjuntos: entregas existentes y
+          calificaciones existentes (en lugar de dos consultas por fila)
+        - INSERT y UPDATE con executemany y un único commit
+        - Las filas inválidas se devuelven como error sin abortar el resto;
+          un fallo de base de datos revierte todo el lote
+        ``rows`` permite indicar el número de fila original (p. ej. línea del CSV).
+        """
+        if len(items) > MAX_BULK_GRADES:
+            raise ValueError(f"Máximo {MAX_BULK_GRADES} calificaciones por petición")
+
+        rows = rows or list(range(1, len(items) + 1))
+        submission_ids = {item.submission_id for item in items}
+
+        try:
+            # Entrega -> (actividad, estudiante): estadísticas materializadas y eventos de cambio
+            existing_submissions = {
+                submission_id: (activity_id, user_id)
+                for submission_id, activity_id, user_id in self.db.execute(
+                    select(Submission.id, Submission.activity_id, Submission.user_id).where(Submission.id.in_(submission_ids))
+                )
+            }
+            # Última calificación de cada entrega (la que se actualiza con upsert) y su nota
+            latest_grade_ids = (
+                select(func.max(Grade.id))
+                .where(Grade.submission_id.in_(submission_ids))
+                .group_by(Grade.submission_id)
+            )
+            existing_grades = {
+                submission_id: (grade_id, score)
+                for submission_id, grade_id, score in self.db.execute(
+                    select(Grade.submission_id, Grade.id, Grade.score).where(Grade.id.in_(latest_grade_ids))
+                )
+            }
+
+            results: List[BulkGradeResult] = []
+            to_insert, to_update = [], []
+            stats_deltas: Dict[int, StatsDelta] = {}
+            seen = set()
+            now = datetime.now()
+
+            for row, item in zip(rows, items):
+                error = None
+                if item.submission_id in seen:
+                    error = "Entrega repetida en la petición"
+                elif item.submission_id not in existing_submissions:
+                    error = "La entrega no existe"
+                elif item.submission_id in existing_grades and not upsert:
+                    error = "Esta entrega ya ha sido calificada. Use upsert para actualizarla."
+                seen.add(item.submission_id)
+
+                if error:
+                    results.append(BulkGradeResult(row=row, submission_id=item.submission_id, status="error", error=error))
+                    continue
+
+                activity_id, user_id = existing_submissions[item.submission_id]
+                stats_delta = stats_deltas.setdefault(activity_id, StatsDelta())
+                grade_id, old_score = existing_grades.get(item.submission_id, (None, None))
+                if grade_id:
+                    stats_delta.remove_score(old_score)
+                    stats_delta.add_score(item.score)
+                    to_update.append({"id": grade_id, "graded_by": graded_by, "score": item.score, "feedback": item.feedback, "graded_at": now})
+                    results.append(BulkGradeResult(row=row, submission_id=item.submission_id, status="updated", grade_id=grade_id))
+                else:
+                    stats_delta.add_score(item.score)
+                    to_insert.append({"submission_id": item.submission_id, "graded_by": graded_by, "score": item.score, "feedback": item.feedback, "graded_at": now})
+                    results.append(BulkGradeResult(row=row, submission_id=item.submission_id, status="created"))
+
+            if to_insert:
+                self.db.execute(insert(Grade), to_insert)
+            if to_update:
+                # UPDATE por clave primaria en lote (executemany)
+                self.db.execute(update(Grade), to_update)
+
+            if to_insert:
+                # MySQL no tiene RETURNING: los ids creados se leen en una sola consulta
+                created_ids = dict(self.db.execute(
+                    select(Grade.submission_id, func.max(Grade.id))
+                    .where(Grade.submission_id.in_([values["submission_id"] for values in to_insert]))
+                    .group_by(Grade.submission_id)
+                ).all())
+                for result in results:
+                    if result.status == "created":
+                        result.grade_id = created_ids.get(result.submission_id)
+
+            # Un UPDATE incremental por actividad afectada
+            ActivityStatsService(self.db).record_many(stats_deltas)
+            # Las escrituras en lote no pasan por el flush del ORM
+            record_changes(self.db, [
+                ChangeEvent(
+                    "grade", "updated" if result.status == "updated" else "created", result.grade_id,
+                    activity_id=existing_submissions[result.submission_id][0],
+                    user_id=existing_submissions[result.submission_id][1],
+                )
+                for result in results if result.status != "error"
+            ])
+            self.db.commit()
+
+            logger.info(
+                f"Calificación masiva por usuario {graded_by}: {len(to_insert)} creadas, "
+                f"{len(to_update)} actualizadas, {len(items) - len(to_insert) - len(to_update)} con error"
+            )
+            return results
+
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error en calificación masiva: {e}")
+            raise
+    
     def get_grade_by_submission(
         self,
         submission_id: int,
@@ -112,10 +238,15 @@ class GradeService:
             if not grade:
                 return None
             
+            stats_delta = StatsDelta()
+            stats_delta.remove_score(grade.score)
+            stats_delta.add_score(grade_data.score)
+            
             # Actualizar campos
             grade.score = grade_data.score
             grade.feedback = grade_data.feedback
             grade.graded_at = datetime.now()
+            ActivityStatsService(self.db).record(grade.submission.activity_id, stats_delta)
             
             self.db.commit()
             self.db.refresh(grade)
@@ -155,7 +286,12 @@ class GradeService:
             if not grade:
                 return False
             
+            activity_id = grade.submission.activity_id
+            stats_delta = StatsDelta()
+            stats_delta.remove_score(grade.score)
+            
             self.db.delete(grade)
+            ActivityStatsService(self.db).record(activity_id, stats_delta)
             self.db.commit()
             
             logger.info(f"Calificación {grade_id} eliminada")
@@ -0,0 +1,131 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select, func
+from typing import Optional, List, Dict, Iterator, Tuple
+from dataclasses import dataclass
+from decimal import Decimal
+import csv
+import io
+import json
+import logging
+
+from app.models import Activity, Submission, Grade
+
+logger = logging.getLogger(__name__)
+
+# Filas que el driver trae del cursor del servidor en cada viaje
+GRADEBOOK_FETCH_SIZE = 1000
+# Estudiantes por fragmento enviado al cliente
+GRADEBOOK_FLUSH_ROWS = 200
+
+# Celdas que Excel/LibreOffice interpretarían como fórmula
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+@dataclass
+class GradebookColumn:
+    activity_id: int
+    title: str
+
+
+def _csv_safe(value: str) -> str:
+    return f"'{value}" if value.startswith(CSV_FORMULA_PREFIXES) else value
+
+
+class GradebookService:
+    """
+    Libro de calificaciones de un curso (estudiantes x actividades)
+
+    Pensado para la réplica de lectura: las filas se leen con un cursor del
+    servidor y se emiten por estudiante a medida que llegan, así la memoria no
+    depende del tamaño del curso. Solo aparecen estudiantes con alguna entrega
+    (la matrícula vive en el servicio de cursos).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_columns(self, course_id: int) -> List[GradebookColumn]:
+        """Actividades del curso en orden de entrega (columnas del pivot)"""
+        rows = self.db.execute(
+            select(Activity.id, Activity.title)
+            .where(Activity.course_id == course_id)
+            .order_by(Activity.due_date.is_(None), Activity.due_date, Activity.id)
+        )
+        return [GradebookColumn(activity_id=row.id, title=row.title) for row in rows]
+
+    def iter_students(self, course_id: int) -> Iterator[Tuple[int, Dict[int, Optional[Decimal]]]]:
+        """
+        (user_id, {activity_id: nota}) por estudiante con una única consulta
+
+        Entregas JOIN actividades del curso LEFT JOIN su última calificación,
+        ordenadas por estudiante para agrupar filas consecutivas. Una entrega
+        sin calificar aparece con nota None; sin entrega, la actividad no está.
+        """
+        newer_grade = aliased(Grade)
+        latest_grade_id = (
+            select(func.max(newer_grade.id))
+            .where(newer_grade.submission_id == Submission.id)
+            .correlate(Submission)
+            .scalar_subquery()
+        )
+        statement = (
+            select(Submission.user_id, Submission.activity_id, Grade.score)
+            .join(Activity, Activity.id == Submission.activity_id)
+            .outerjoin(Grade, Grade.id == latest_grade_id)
+            .where(Activity.course_id == course_id)
+            .order_by(Submission.user_id, Submission.activity_id, Submission.id)
+            .execution_options(stream_results=True, yield_per=GRADEBOOK_FETCH_SIZE)
+        )
+
+        current_user_id = None
+        scores: Dict[int, Optional[Decimal]] = {}
+        for user_id, activity_id, score in self.db.execute(statement):
+            if user_id != current_user_id:
+                if current_user_id is not None:
+                    yield current_user_id, scores
+                current_user_id, scores = user_id, {}
+            scores[activity_id] = score
+        if current_user_id is not None:
+            yield current_user_id, scores
+
+    def iter_csv(self, course_id: int, columns: List[GradebookColumn]) -> Iterator[str]:
+        """CSV: ``user_id`` y una columna por actividad (vacía si no hay nota)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["user_id"] + [_csv_safe(f"{c.title} [{c.activity_id}]") for c in columns])
+
+        pending = 0
+        for user_id, scores in self.iter_students(course_id):
+            writer.writerow([user_id] + [
+                "" if scores.get(c.activity_id) is None else scores[c.activity_id]
+                for c in columns
+            ])
+            pending += 1
+            if pending >= GRADEBOOK_FLUSH_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        yield buffer.getvalue()
+
+    def iter_ndjson(self, course_id: int, columns: List[GradebookColumn]) -> Iterator[str]:
+        """
+        NDJSON: una línea de cabecera con las actividades y una por estudiante
+
+        En ``grades`` la clave es el id de actividad: nota numérica, ``null`` si
+        la entrega está sin calificar y ausente si no hay entrega.
+        """
+        lines = [json.dumps({
+            "course_id": course_id,
+            "activities": [{"id": c.activity_id, "title": c.title} for c in columns],
+        }, ensure_ascii=False)]
+        for user_id, scores in self.iter_students(course_id):
+            lines.append(json.dumps({
+                "user_id": user_id,
+                "grades": {str(a): (None if s is None else float(s)) for a, s in scores.items()},
+            }))
+            if len(lines) >= GRADEBOOK_FLUSH_ROWS:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
@@ -1,14 +1,21 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only
 from sqlalchemy import and_, or_
 from typing import Optional, List
 from datetime import datetime
 import logging
 import asyncio
+import hashlib
+import contextvars
 from concurrent.futures import ThreadPoolExecutor
 
 from app.models.activity import Activity, ActivityType
 from app.schemas.activity import ActivityCreate, ActivityUpdate, ActivityList, ActivityResponse, ActivitySchema, CommentSchema
 from app.services.cache_service import CacheService
+from app.services.file_storage_service import FileStorageService, file_urls_of
+from app.services.pagination import (
+    ACTIVITY_LIST_REQUIRED_FIELDS, ACTIVITY_LIST_OPTIONAL_FIELDS,
+    encode_cursor, decode_cursor, parse_fields, project
+)
 from app.database import SessionLocal
 import math
 
@@ -56,11 +63,11 @@ class OptimizedActivityService:
                 )
                 
                 session.add(db_activity)
+                FileStorageService(session).retain(file_urls_of(db_activity))
                 session.commit()
                 session.refresh(db_activity)
                 
-                # Invalidar cache relacionado
-                self.cache.invalidate_course_cache(activity_data.course_id)
+                # El cache lo invalida el evento de cambio (app/services/change_events.py)
                 
                 logger.info(f"✅ Actividad creada: {db_activity.id}")
                 return db_activity
@@ -97,16 +104,17 @@ class OptimizedActivityService:
                 
                 # Actualizar campos proporcionados
                 update_data = activity_data.dict(exclude_unset=True)
+                old_file_urls = file_urls_of(activity)
                 
                 for field, value in update_data.items():
                     if hasattr(activity, field):
                         setattr(activity, field, value)
                 
+                FileStorageService(session).sync_references(old_file_urls, file_urls_of(activity))
                 session.commit()
                 session.refresh(activity)
                 
-                # Invalidar cache relacionado
-                self.cache.invalidate_activity_cache(activity_id, activity.course_id)
+                # El cache lo invalida el evento de cambio (app/services/change_events.py)
                 
                 logger.info(f"✅ Actividad {activity_id} actualizada")
                 return activity
@@ -143,12 +151,11 @@ class OptimizedActivityService:
                     logger.warning(f"Intentando eliminar actividad {activity_id} con entregas existentes")
                     raise ValueError("No se puede eliminar una actividad con entregas existentes")
                 
-                course_id = activity.course_id
+                FileStorageService(session).release(file_urls_of(activity))
                 session.delete(activity)
                 session.commit()
                 
-                # Invalidar cache relacionado
-                self.cache.invalidate_activity_cache(activity_id, course_id)
+                # El cache lo invalida el evento de cambio (app/services/change_events.py)
                 
                 logger.info(f"✅ Actividad {activity_id} eliminada")
                 return True
@@ -159,6 +166,58 @@ class OptimizedActivityService:
             logger.error(f"❌ Error eliminando actividad {activity_id}: {e}")
             raise
     
+    @staticmethod
+    def _to_activity_schema(activity: Activity) -> ActivitySchema:
+        """Convertir una actividad (con comentarios cargados) al esquema de respuesta"""
+        return ActivitySchema(
+            id=activity.id,
+            course_id=activity.course_id,
+            title=activity.title,
+            description=activity.description,
+            activity_type=activity.activity_type,
+            due_date=activity.due_date,
+            file_url=activity.file_url,
+            created_at=activity.created_at,
+            created_by=activity.created_by,
+            comments=[
+                CommentSchema(
+                    id=c.id,
+                    user_id=c.user_id,
+                    content=c.content,
+                    created_at=c.created_at
+                )
+                for c in activity.comments
+            ]
+        )
+
+    # ========================================================================
+    # ETAGS (CONDITIONAL GET)
+    # ========================================================================
+
+    def get_activity_etag(self, activity_id: int) -> Optional[str]:
+        """
+        ETag débil del detalle de una actividad (incluye sus comentarios)
+
+        Se deriva de la versión de la actividad, que cambia con cada escritura
+        (eventos de cambio), así que no hace falta leer los datos para
+        responder 304. None si Redis no está disponible.
+        """
+        version = self.cache.peek_version("activity", activity_id)
+        return None if version is None else f'W/"activity-{activity_id}-v{version}"'
+
+    def get_course_activities_etag(self, course_id: int, variant: str = "") -> Optional[str]:
+        """
+        ETag débil del listado de actividades de un curso
+
+        ``variant`` (página, campos) distingue representaciones del mismo
+        curso, que comparten versión.
+        """
+        version = self.cache.peek_version("course", course_id)
+        if version is None:
+            return None
+        suffix = f"-{hashlib.sha1(variant.encode()).hexdigest()[:8]}" if variant else ""
+        return f'W/"course-{course_id}-v{version}{suffix}"'
+
     # ========================================================================
     # READ OPERATIONS (Read Replica + Cache)
     # ========================================================================
@@ -168,8 +227,9 @@ class OptimizedActivityService:
         Obtener lista de actividades con cache inteligente - READ operation
         """
         try:
-            # 1. Intentar obtener desde cache
-            cached_activities = self.cache.get_cached_course_activities(course_id)
+            # 1. Intentar obtener desde cache (la versión se lee antes que la BD)
+            version = self.cache.get_course_version(course_id)
+            cached_activities = self.cache.get_cached_course_activities(course_id, version)
             if cached_activities:
                 logger.info(f"🎯 Cache HIT: course_activities:{course_id}")
                 return ActivityList(activities=cached_activities)
@@ -183,7 +243,7 @@ class OptimizedActivityService:
                 activity_responses = [ActivityResponse.from_orm(activity) for activity in activities]
                 
                 # 3. Guardar en cache
-                self.cache.cache_course_activities(course_id, activity_responses, ttl=300)
+                self.cache.cache_course_activities(course_id, activity_responses, version=version)
                 
                 logger.info(f"💾 Cache MISS: course_activities:{course_id} - stored in cache")
                 return ActivityList(activities=activity_responses)
@@ -201,6 +261,70 @@ class OptimizedActivityService:
             finally:
                 session.close()
     
+    def get_activities_page(
+        self,
+        course_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> ActivityList:
+        """
+        Obtener una página de actividades con paginación keyset - READ operation
+
+        Orden: (due_date, id) con las actividades sin fecha límite al final.
+        ``fields`` limita las columnas opcionales cargadas (p. ej. omitir
+        ``description``). Cada página se cachea bajo la versión del curso.
+        """
+        selected = parse_fields(fields, ACTIVITY_LIST_OPTIONAL_FIELDS, ACTIVITY_LIST_REQUIRED_FIELDS)
+        after_due, after_id = decode_cursor(cursor) if cursor else (None, None)
+        columns = ACTIVITY_LIST_REQUIRED_FIELDS | (ACTIVITY_LIST_OPTIONAL_FIELDS if selected is None else selected)
+
+        version = self.cache.get_course_version(course_id)
+        page_key = f"{cursor or 'first'}:{limit}:{','.join(sorted(columns))}"
+        cached_page = self.cache.get_cached_course_activities_page(course_id, version, page_key)
+        if cached_page:
+            logger.info(f"🎯 Cache HIT: course_activities:{course_id} page {page_key}")
+            return cached_page
+
+        session = SessionLocal()
+        try:
+            query = (
+                session.query(Activity)
+                .options(load_only(*[getattr(Activity, column) for column in columns]))
+                .filter(Activity.course_id == course_id)
+            )
+
+            if after_id is not None:
+                if after_due is None:
+                    # El cursor está dentro del bloque de actividades sin fecha límite
+                    query = query.filter(and_(Activity.due_date.is_(None), Activity.id > after_id))
+                else:
+                    query = query.filter(or_(
+                        Activity.due_date.is_(None),
+                        Activity.due_date > after_due,
+                        and_(Activity.due_date == after_due, Activity.id > after_id)
+                    ))
+
+            rows = (
+                query.order_by(Activity.due_date.is_(None), Activity.due_date, Activity.id)
+                .limit(limit + 1)
+                .all()
+            )
+        finally:
+            session.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        page = ActivityList(
+            activities=[ActivityResponse.model_validate(project(row, columns)) for row in rows],
+            next_cursor=encode_cursor(rows[-1].due_date, rows[-1].id) if has_more else None,
+            has_more=has_more
+        )
+
+        self.cache.cache_course_activities_page(course_id, version, page_key, page)
+        logger.info(f"💾 Cache MISS: course_activities:{course_id} page {page_key} - stored in cache")
+        return page
+
     def get_activity_by_id(
         self, 
         activity_id: int, 
@@ -210,8 +334,9 @@ class OptimizedActivityService:
         Obtener una actividad por ID con cache y eager loading - READ operation
         """
         try:
-            # 1. Intentar obtener desde cache
-            cached_activity = self.cache.get_cached_activity(activity_id)
+            # 1. Intentar obtener desde cache (la versión se lee antes que la BD)
+            version = self.cache.get_activity_version(activity_id)
+            cached_activity = self.cache.get_cached_activity(activity_id, version)
             if cached_activity:
                 logger.info(f"🎯 Cache HIT: activity:{activity_id}")
                 return cached_activity
@@ -229,29 +354,10 @@ class OptimizedActivityService:
                 if not activity_query:
                     return None
                 
-                activity = ActivitySchema(
-                    id=activity_query.id,
-                    course_id=activity_query.course_id,
-                    title=activity_query.title,
-                    description=activity_query.description,
-                    activity_type=activity_query.activity_type,
-                    due_date=activity_query.due_date,
-                    file_url=activity_query.file_url,
-                    created_at=activity_query.created_at,
-                    created_by=activity_query.created_by,
-                    comments=[
-                        CommentSchema(
-                            id=c.id,
-                            user_id=c.user_id,
-                            content=c.content,
-                            created_at=c.created_at
-                        )
-                        for c in activity_query.comments
-                    ]
-                )
+                activity = self._to_activity_schema(activity_query)
                 
                 # 3. Guardar en cache
-                self.cache.cache_activity(activity_id, activity, ttl=600)
+                self.cache.cache_activity(activity_id, activity, version=version)
                 
                 logger.info(f"💾 Cache MISS: activity:{activity_id} - stored in cache")
                 return activity
@@ -273,26 +379,7 @@ class OptimizedActivityService:
                 if not activity_query:
                     return None
                 
-                return ActivitySchema(
-                    id=activity_query.id,
-                    course_id=activity_query.course_id,
-                    title=activity_query.title,
-                    description=activity_query.description,
-                    activity_type=activity_query.activity_type,
-                    due_date=activity_query.due_date,
-                    file_url=activity_query.file_url,
-                    created_at=activity_query.created_at,
-                    created_by=activity_query.created_by,
-                    comments=[
-                        CommentSchema(
-                            id=c.id,
-                            user_id=c.user_id,
-                            content=c.content,
-                            created_at=c.created_at
-                        )
-                        for c in activity_query.comments
-                    ]
-                )
+                return self._to_activity_schema(activity_query)
             finally:
                 session.close()
     
@@ -342,27 +429,61 @@ class OptimizedActivityService:
     # OPERACIONES CONCURRENTES AVANZADAS
     # ========================================================================
     
+    def get_multiple_activities(self, activity_ids: List[int]) -> List[Optional[ActivitySchema]]:
+        """
+        Obtener múltiples actividades con un número constante de round trips
+
+        1. MGET de versiones y MGET de actividades en cache
+        2. Una sola consulta ``WHERE id IN (...)`` para los misses, con
+           ``selectinload`` de comentarios (una consulta adicional en total)
+        3. Escritura pipelined de los misses en cache
+
+        El resultado respeta el orden de entrada; ids inexistentes son None.
+        """
+        unique_ids = list(dict.fromkeys(activity_ids))
+
+        versions = self.cache.get_versions("activity", unique_ids)
+        found = self.cache.get_cached_activities(unique_ids, versions)
+
+        missing_ids = [activity_id for activity_id in unique_ids if activity_id not in found]
+        if missing_ids:
+            session = SessionLocal()
+            try:
+                activities = (
+                    session.query(Activity)
+                    .options(selectinload(Activity.comments))
+                    .filter(Activity.id.in_(missing_ids))
+                    .all()
+                )
+                loaded = {activity.id: self._to_activity_schema(activity) for activity in activities}
+            finally:
+                session.close()
+
+            self.cache.cache_activities(loaded, versions)
+            found.update(loaded)
+
+        logger.info(
+            f"📊 Batch de {len(unique_ids)} actividades: "
+            f"{len(unique_ids) - len(missing_ids)} desde cache, {len(missing_ids)} desde BD"
+        )
+        return [found.get(activity_id) for activity_id in activity_ids]
+
     async def get_multiple_activities_concurrent(self, activity_ids: List[int]) -> List[Optional[ActivitySchema]]:
         """
-        Obtener múltiples actividades de forma concurrente
+        Obtener múltiples actividades sin bloquear el event loop
+
+        La lectura por lotes (``get_multiple_activities``) se ejecuta en el
+        executor: una sola sesión y un número constante de consultas.
         """
         loop = asyncio.get_event_loop()
-        
-        # Crear tasks para ejecución concurrente
-        tasks = []
-        for activity_id in activity_ids:
-            task = loop.run_in_executor(
-                self.executor,
-                self.get_activity_by_id,
-                activity_id
-            )
-            tasks.append(task)
-        
-        # Ejecutar todas las tareas concurrentemente
-        results = await asyncio.gather(*tasks)
-        
-        logger.info(f"📊 Obtenidas {len(results)} actividades concurrentemente")
-        return results
+        # Copiar el contexto para que el hilo comparta los contextvars de la petición
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor,
+            context.run,
+            self.get_multiple_activities,
+            activity_ids
+        )
     
     def preload_course_activities_cache(self, course_id: int) -> bool:
         """
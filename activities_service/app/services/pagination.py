@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple, Set, Iterable
+
+# Columnas que siempre se cargan en los listados (identidad + clave de orden)
+ACTIVITY_LIST_REQUIRED_FIELDS = {"id", "course_id", "title", "activity_type", "due_date", "created_at", "created_by"}
+ACTIVITY_LIST_OPTIONAL_FIELDS = {"description", "file_url"}
+
+SUBMISSION_LIST_REQUIRED_FIELDS = {"id", "activity_id", "user_id", "submitted_at"}
+SUBMISSION_LIST_OPTIONAL_FIELDS = {"content", "file_url", "additional_files"}
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_value: Optional[datetime], last_id: int) -> str:
+    """
+    Codificar un cursor opaco para paginación keyset a partir de la última fila
+    de la página: (valor de la columna de orden, id)
+    """
+    payload = [sort_value.isoformat() if sort_value else None, last_id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+    Decodificar un cursor generado por ``encode_cursor``
+    Lanza ValueError si el cursor no es válido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(sort_value) if sort_value else None), int(last_id)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+
+
+def parse_fields(fields: Optional[str], optional_fields: Set[str], required_fields: Set[str]) -> Optional[Set[str]]:
+    """
+    Interpretar el parámetro ``fields=`` (lista separada por comas)
+
+    Devuelve el subconjunto de columnas opcionales a cargar, o None si no se
+    pidió proyección (se cargan todas). Los campos obligatorios del listado se
+    aceptan pero siempre se devuelven. Lanza ValueError con campos que no son
+    del listado.
+    """
+    if fields is None:
+        return None
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - optional_fields - required_fields
+    if unknown:
+        raise ValueError(f"Campos no soportados en fields: {', '.join(sorted(unknown))}")
+    return requested & optional_fields
+
+
+def project(obj, columns: Iterable[str]) -> dict:
+    """Construir un dict solo con las columnas cargadas (evita lazy loads de columnas diferidas)"""
+    return {column: getattr(obj, column) for column in columns}
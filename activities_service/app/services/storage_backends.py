@@ -0,0 +1,306 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Tuple
+from urllib.parse import quote
+import base64
+import hashlib
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Configuración del backend de almacenamiento
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # local | s3
+S3_BUCKET = os.getenv("S3_BUCKET", "courseclash-activities")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # MinIO/moto en desarrollo, vacío para AWS
+S3_PUBLIC_ENDPOINT_URL = os.getenv("S3_PUBLIC_ENDPOINT_URL") or S3_ENDPOINT_URL  # host que ven los clientes
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+PRESIGNED_URL_TTL = int(os.getenv("PRESIGNED_URL_TTL", "900"))  # 15 minutos
+
+# Prefijo de las subidas directas pendientes de verificar (una clave por subida)
+STAGING_PREFIX = "staging/"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def object_key(sha256: str) -> str:
+    """Clave del contenido en el almacén: objects/ab/cd/abcd... (dos niveles de shard)"""
+    return f"objects/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def content_disposition(disposition_type: str, filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition_type}; filename*=utf-8''{quoted}"
+    return f'{disposition_type}; filename="{filename}"'
+
+
+class StorageBackend(ABC):
+    """
+    Almacén de objetos para los blobs de archivos
+
+    Las claves son relativas (``objects/ab/cd/<sha256>``). Los backends remotos
+    permiten URLs prefirmadas para que los bytes no pasen por el servicio.
+    """
+
+    @abstractmethod
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None):
+        """Guardar un archivo local bajo ``key`` (el origen puede moverse o borrarse)"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Ruta en disco si el backend es local (None en backends remotos)"""
+        return None
+
+    def presigned_download_url(self, key: str, filename: str, content_type: str, disposition_type: str) -> Optional[str]:
+        return None
+
+
+class DirectUploadBackend(StorageBackend):
+    """
+    Backend que admite subidas directas con URLs prefirmadas
+
+    Los bytes van del cliente al almacén; el servicio solo firma las URLs y,
+    al completar, verifica el objeto en ``staging/`` antes de copiarlo en el
+    servidor del almacén a su clave por contenido.
+    """
+
+    @abstractmethod
+    def presigned_upload(self, key: str, content_type: str, sha256: str, size: int) -> dict:
+        pass
+
+    @abstractmethod
+    def create_multipart_upload(self, content_type: str, part_count: int) -> dict:
+        pass
+
+    @abstractmethod
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict]) -> str:
+        pass
+
+    @abstractmethod
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        pass
+
+    @abstractmethod
+    def object_size(self, key: str) -> Optional[int]:
+        """Tamaño de un objeto sin leer su contenido (None si no existe)"""
+
+    @abstractmethod
+    def hash_object(self, key: str) -> Tuple[str, int]:
+        pass
+
+    @abstractmethod
+    def copy(self, source_key: str, target_key: str):
+        pass
+
+    @abstractmethod
+    def abort_stale_multipart_uploads(self, older_than: datetime) -> int:
+        pass
+
+    @abstractmethod
+    def delete_stale_staging_objects(self, older_than: datetime) -> int:
+        pass
+
+
+class LocalStorageBackend(StorageBackend):
+    """Blobs en el disco del contenedor (``uploads/``); un solo nodo sirve los bytes"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None):
+        target_path = self.local_path(key)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        os.replace(source_path, target_path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3StorageBackend(DirectUploadBackend):
+    """
+    Blobs en un bucket S3 compatible (AWS S3, MinIO, moto)
+
+    - Descargas: redirección a una URL prefirmada (Range/ETag los resuelve S3)
+    - Subidas directas: PUT prefirmado a ``staging/`` con ``x-amz-checksum-sha256``;
+      S3 rechaza el cuerpo si no coincide con el hash declarado, así la clave
+      por contenido no puede envenenarse
+    - Subidas multipart: partes prefirmadas a ``staging/``; al completar se
+      verifica el hash y se copia en el servidor S3 a su clave por contenido
+    """
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, public_endpoint_url: Optional[str] = None, region: str = "us-east-1"):
+        # Dependencia opcional: solo se necesita con STORAGE_BACKEND=s3
+        import boto3
+        from botocore.config import Config
+
+        config = Config(signature_version="s3v4", s3={"addressing_style": "path"})
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region, config=config)
+        # Las URLs prefirmadas se firman con el host que usará el cliente
+        self.presign_client = (
+            boto3.client("s3", endpoint_url=public_endpoint_url, region_name=region, config=config)
+            if public_endpoint_url and public_endpoint_url != endpoint_url
+            else self.client
+        )
+        logger.info(f"✅ Almacenamiento S3: bucket={bucket}, endpoint={endpoint_url or 'AWS'}")
+
+    def put_file(self, source_path: str, key: str, content_type: Optional[str] = None):
+        # upload_file usa multipart automáticamente a partir de 8MB
+        extra_args = {"ContentType": content_type} if content_type else None
+        self.client.upload_file(source_path, self.bucket, key, ExtraArgs=extra_args)
+        os.remove(source_path)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def presigned_download_url(self, key: str, filename: str, content_type: str, disposition_type: str) -> str:
+        return self.presign_client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ResponseContentType": content_type,
+                "ResponseContentDisposition": content_disposition(disposition_type, filename),
+                "ResponseCacheControl": "private, max-age=31536000, immutable",
+            },
+            ExpiresIn=PRESIGNED_URL_TTL,
+        )
+
+    def presigned_upload(self, key: str, content_type: str, sha256: str, size: int) -> dict:
+        # Hash y tamaño van firmados: S3 rechaza cualquier otro cuerpo
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.presign_client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=PRESIGNED_URL_TTL,
+        )
+        return {
+            "method": "PUT",
+            "url": url,
+            "headers": {
+                "Content-Type": content_type,
+                "x-amz-checksum-sha256": checksum,
+            },
+        }
+
+    def create_multipart_upload(self, content_type: str, part_count: int) -> dict:
+        key = f"{STAGING_PREFIX}{uuid.uuid4()}"
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)
+        part_urls = [
+            self.presign_client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": self.bucket, "Key": key, "UploadId": upload["UploadId"], "PartNumber": part_number},
+                ExpiresIn=PRESIGNED_URL_TTL,
+            )
+            for part_number in range(1, part_count + 1)
+        ]
+        return {"key": key, "upload_id": upload["UploadId"], "part_urls": part_urls}
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict]) -> str:
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": p["part_number"], "ETag": p["etag"]} for p in parts]},
+        )
+        return key
+
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def object_size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def hash_object(self, key: str) -> Tuple[str, int]:
+        """SHA-256 y tamaño de un objeto (lo lee una vez por streaming)"""
+        digest = hashlib.sha256()
+        size = 0
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        for chunk in body.iter_chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+        return digest.hexdigest(), size
+
+    def copy(self, source_key: str, target_key: str):
+        # Copia dentro de S3: los bytes no pasan por el servicio
+        self.client.copy_object(Bucket=self.bucket, Key=target_key, CopySource={"Bucket": self.bucket, "Key": source_key})
+
+    def abort_stale_multipart_uploads(self, older_than: datetime) -> int:
+        """Abortar subidas multipart abandonadas en ``staging/`` (libera sus partes)"""
+        aborted = 0
+        cutoff = older_than.astimezone(timezone.utc) if older_than.tzinfo else older_than.replace(tzinfo=timezone.utc)
+        paginator = self.client.get_paginator("list_multipart_uploads")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=STAGING_PREFIX):
+            for upload in page.get("Uploads", []):
+                if upload["Initiated"] < cutoff:
+                    self.abort_multipart_upload(upload["Key"], upload["UploadId"])
+                    aborted += 1
+        return aborted
+
+    def delete_stale_staging_objects(self, older_than: datetime) -> int:
+        """Borrar de ``staging/`` los PUT directos que nunca se completaron"""
+        deleted = 0
+        cutoff = older_than.astimezone(timezone.utc) if older_than.tzinfo else older_than.replace(tzinfo=timezone.utc)
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=STAGING_PREFIX):
+            for staged in page.get("Contents", []):
+                if staged["LastModified"] < cutoff:
+                    self.delete(staged["Key"])
+                    deleted += 1
+        return deleted
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_storage_backend() -> StorageBackend:
+    """Backend configurado por ``STORAGE_BACKEND`` (instancia única por proceso)"""
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "s3":
+            _backend = S3StorageBackend(S3_BUCKET, S3_ENDPOINT_URL, S3_PUBLIC_ENDPOINT_URL, S3_REGION)
+        elif STORAGE_BACKEND == "local":
+            from app.services.file_storage_service import UPLOAD_DIRECTORY
+            _backend = LocalStorageBackend(UPLOAD_DIRECTORY)
+        else:
+            raise ValueError(f"STORAGE_BACKEND no soportado: {STORAGE_BACKEND}")
+    return _backend
@@ -1,5 +1,6 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only, selectinload
 from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
 from typing import Optional, List
 from datetime import datetime
 import logging
@@ -8,6 +9,13 @@ import math
 from app.models.submission import Submission
 from app.models.activity import Activity
 from app.schemas.submission import SubmissionCreate, SubmissionUpdate, SubmissionList, SubmissionResponse
+from app.services.pagination import (
+    SUBMISSION_LIST_REQUIRED_FIELDS, SUBMISSION_LIST_OPTIONAL_FIELDS,
+    encode_cursor, decode_cursor, parse_fields, project
+)
+from app.services.file_storage_service import FileStorageService, file_urls_of
+from app.services.activity_stats_service import ActivityStatsService, StatsDelta
+from app.services.cache_service import SUBMISSIONS_PAGE_TTL, cache_service
 
 logger = logging.getLogger(__name__)
 
@@ -29,17 +37,6 @@ class SubmissionService:
             if activity.due_date and datetime.now() > activity.due_date:
                 raise ValueError("La fecha límite para esta actividad ha pasado")
             
-            # Verificar si ya existe una entrega del usuario para esta actividad
-            existing_submission = self.db.query(Submission).filter(
-                and_(
-                    Submission.activity_id == submission_data.activity_id,
-                    Submission.user_id == user_id
-                )
-            ).first()
-            
-            if existing_submission:
-                raise ValueError("Ya existe una entrega para esta actividad. Use la función de actualización.")
-            
             # Crear la entrega
             db_submission = Submission(
                 activity_id=submission_data.activity_id,
@@ -50,6 +47,13 @@ class SubmissionService:
             )
             
             self.db.add(db_submission)
+            try:
+                # La entrega duplicada la detecta uq_submissions_activity_user
+                self.db.flush()
+            except IntegrityError:
+                raise ValueError("Ya existe una entrega para esta actividad. Use la función de actualización.")
+            FileStorageService(self.db).retain(file_urls_of(db_submission))
+            ActivityStatsService(self.db).record(submission_data.activity_id, StatsDelta(submissions=1))
             self.db.commit()
             self.db.refresh(db_submission)
             
@@ -65,13 +69,39 @@ class SubmissionService:
         self,
         activity_id: int,
         user_id: int, #Id del usuario logueado
-        user_role: str = "student"
+        user_role: str = "student",
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None
     ) -> SubmissionList:
         """
         Obtener lista paginada de entregas con filtros
+
+        Con ``limit`` se pagina por keyset sobre (submitted_at, id) descendente;
+        ``cursor`` es el ``next_cursor`` de la página anterior y ``fields``
+        limita las columnas opcionales cargadas (content, file_url, additional_files).
+        Cada página se cachea bajo la versión de la actividad, que incrementa
+        toda escritura de sus entregas y calificaciones (eventos de cambio).
         """
         try:
-            query = self.db.query(Submission)
+            selected = parse_fields(fields, SUBMISSION_LIST_OPTIONAL_FIELDS, SUBMISSION_LIST_REQUIRED_FIELDS)
+            columns = SUBMISSION_LIST_REQUIRED_FIELDS | (SUBMISSION_LIST_OPTIONAL_FIELDS if selected is None else selected)
+
+            if limit is not None:
+                # Los estudiantes solo ven sus entregas: su página no se comparte
+                scope = f"user{user_id}" if user_role == "student" else "all"
+                version = cache_service.get_activity_version(activity_id)
+                page_key = f"{scope}:{cursor or 'first'}:{limit}:{','.join(sorted(columns))}"
+                cached_page = cache_service.get_cached_submissions_page(activity_id, version, page_key)
+                if cached_page:
+                    logger.info(f"🎯 Cache HIT: activity_submissions:{activity_id} page {page_key}")
+                    return cached_page
+
+            # Eager loading de calificaciones y actividad: is_graded, latest_grade y
+            # can_edit no disparan consultas por fila al serializar
+            query = self.db.query(Submission).options(*self._listing_options())
+            if selected is not None:
+                query = query.options(load_only(*[getattr(Submission, column) for column in columns]))
 
             # Filtra las submisions por actividad
             query = query.filter(Submission.activity_id == activity_id)
@@ -88,20 +118,76 @@ class SubmissionService:
             elif user_role == "teacher" or user_role == "admin":
                 # Los profesores pueden ver entregas de actividades que crearon
                 pass
-            
-            # Obtener el total de entregas
-            submissions = query.order_by(Submission.submitted_at.desc()).all()
+
+            if cursor:
+                after_submitted, after_id = decode_cursor(cursor)
+                query = query.filter(or_(
+                    Submission.submitted_at < after_submitted,
+                    and_(Submission.submitted_at == after_submitted, Submission.id < after_id)
+                ))
+
+            query = query.order_by(Submission.submitted_at.desc(), Submission.id.desc())
+            if limit is not None:
+                query = query.limit(limit + 1)
+            submissions = query.all()
+
+            has_more = limit is not None and len(submissions) > limit
+            if has_more:
+                submissions = submissions[:limit]
 
             # Convertir a esquemas de respuesta
-            submission_responses = [SubmissionResponse.from_orm(submission) for submission in submissions]
+            submission_responses = [self._to_response(submission, columns) for submission in submissions]
             
-            return SubmissionList(
+            page = SubmissionList(
                 submissions=submission_responses,
+                next_cursor=encode_cursor(submissions[-1].submitted_at, submissions[-1].id) if has_more else None,
+                has_more=has_more
             )
+
+            if limit is not None:
+                ttl = self._page_ttl(submissions)
+                if ttl > 0:
+                    cache_service.cache_submissions_page(activity_id, version, page_key, page, ttl)
+                    logger.info(f"💾 Cache MISS: activity_submissions:{activity_id} page {page_key} - stored in cache")
+            return page
             
         except Exception as e:
             logger.error(f"Error obteniendo entregas: {e}")
             raise
+
+    @staticmethod
+    def _page_ttl(submissions: List[Submission]) -> int:
+        """
+        TTL de una página cacheada
+
+        ``can_edit`` pasa a False al vencer la fecha límite sin que haya
+        escritura que cambie la versión: la página no se cachea más allá.
+        """
+        ttl = SUBMISSIONS_PAGE_TTL
+        for submission in submissions:
+            if submission.can_edit and submission.activity and submission.activity.due_date:
+                remaining = (submission.activity.due_date - datetime.now()).total_seconds()
+                ttl = min(ttl, int(remaining))
+        return ttl
+
+    @staticmethod
+    def _listing_options():
+        """Opciones de carga para listados: 2 consultas IN en total, sin importar el número de filas"""
+        return (
+            selectinload(Submission.grades),
+            selectinload(Submission.activity).load_only(Activity.id, Activity.due_date),
+        )
+
+    @staticmethod
+    def _to_response(submission: Submission, columns) -> SubmissionResponse:
+        """Construir la respuesta solo con las columnas cargadas (sin lazy loads de columnas diferidas)"""
+        data = project(submission, columns)
+        data.update(
+            is_graded=submission.is_graded,
+            can_edit=submission.can_edit,
+            latest_grade=submission.latest_grade
+        )
+        return SubmissionResponse.model_validate(data, from_attributes=True)
     
     def get_submission_by_id(
         self,
@@ -155,11 +241,14 @@ class SubmissionService:
                 
                 # Actualizar campos proporcionados
                 update_data = submission_data.dict(exclude_unset=True)
+                old_file_urls = file_urls_of(submission)
                 
                 for field, value in update_data.items():
                     if hasattr(submission, field):
                         setattr(submission, field, value)
                 
+                FileStorageService(self.db).sync_references(old_file_urls, file_urls_of(submission))
+                
                 # Actualizar timestamp de entrega
                 submission.submitted_at = datetime.now()
                 
@@ -198,7 +287,13 @@ class SubmissionService:
             if not submission.can_edit:
                 raise ValueError("No se puede eliminar esta entrega")
             
+            stats_delta = StatsDelta(submissions=-1)
+            if submission.latest_grade:
+                stats_delta.remove_score(submission.latest_grade.score)
+            
+            FileStorageService(self.db).release(file_urls_of(submission))
             self.db.delete(submission)
+            ActivityStatsService(self.db).record(submission.activity_id, stats_delta)
             self.db.commit()
             
             logger.info(f"Entrega {submission_id} eliminada")
@@ -214,7 +309,7 @@ class SubmissionService:
         Obtener todas las entregas de una actividad específica
         """
         try:
-            return self.db.query(Submission).filter(
+            return self.db.query(Submission).options(*self._listing_options()).filter(
                 Submission.activity_id == activity_id
             ).order_by(Submission.submitted_at.desc()).all()
             
@@ -227,7 +322,7 @@ class SubmissionService:
         Obtener todas las entregas de un usuario específico
         """
         try:
-            return self.db.query(Submission).filter(
+            return self.db.query(Submission).options(*self._listing_options()).filter(
                 Submission.user_id == user_id
             ).order_by(Submission.submitted_at.desc()).all()
             
@@ -0,0 +1 @@
+"""Herramientas de mantenimiento del servicio de actividades (``python -m app.tools.<nombre>``)"""
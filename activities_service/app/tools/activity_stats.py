@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Reconciliación de las estadísticas materializadas por actividad
+
+Las filas de ``activity_stats`` se actualizan de forma incremental en cada
+entrega/calificación. Este job las recalcula desde las tablas por lotes de
+actividades y corrige las que difieran (escrituras fuera del servicio,
+borrados en cascada, datos anteriores a la tabla). Ejecutarlo una vez al
+desplegar para poblar la tabla y después periódicamente (p. ej. cron diario).
+
+Uso (desde activities_service/):
+    python -m app.tools.activity_stats reconcile [--course-id 1] [--batch-size 200] [--dry-run]
+"""
+
+import argparse
+import logging
+import sys
+from typing import Optional
+
+from sqlalchemy import insert, select, update
+
+from app.database import SessionLocal
+from app.models.activity import Activity
+from app.models.activity_stats import ActivityStats
+from app.services.activity_stats_service import ActivityStatsService, empty_stats_values
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def reconcile(course_id: Optional[int] = None, batch_size: int = 200, dry_run: bool = False):
+    """
+    Recalcular y corregir las estadísticas lote a lote
+
+    Las filas del lote se bloquean (FOR UPDATE) antes de recalcular: una
+    escritura concurrente espera y aplica su delta sobre el valor corregido.
+    """
+    session = SessionLocal()
+    try:
+        service = ActivityStatsService(session)
+        checked = fixed = created = 0
+        last_id = 0
+
+        while True:
+            query = select(Activity.id).where(Activity.id > last_id).order_by(Activity.id).limit(batch_size)
+            if course_id is not None:
+                query = query.where(Activity.course_id == course_id)
+            activity_ids = list(session.scalars(query))
+            if not activity_ids:
+                break
+            last_id = activity_ids[-1]
+
+            current = {
+                stats.activity_id: stats
+                for stats in session.scalars(
+                    select(ActivityStats).where(ActivityStats.activity_id.in_(activity_ids)).with_for_update()
+                )
+            }
+            computed = service.compute(activity_ids)
+
+            for activity_id in activity_ids:
+                expected = computed.get(activity_id)
+                stats = current.get(activity_id)
+                if stats is None:
+                    if expected is not None:
+                        logger.info(f"   Actividad {activity_id}: fila creada ({expected['submissions_count']} entregas)")
+                        if not dry_run:
+                            session.execute(insert(ActivityStats).values(activity_id=activity_id, **expected))
+                        created += 1
+                    continue
+
+                expected = expected or empty_stats_values()
+                drift = {
+                    column: (getattr(stats, column), value)
+                    for column, value in expected.items()
+                    if getattr(stats, column) != value
+                }
+                if drift:
+                    logger.warning(f"⚠️ Actividad {activity_id}: desviación {drift}")
+                    if not dry_run:
+                        session.execute(
+                            update(ActivityStats)
+                            .where(ActivityStats.activity_id == activity_id)
+                            .values(**expected)
+                            .execution_options(synchronize_session=False)
+                        )
+                    fixed += 1
+
+            checked += len(activity_ids)
+            # Commit por lote: libera los bloqueos y toma una instantánea nueva
+            if dry_run:
+                session.rollback()
+            else:
+                session.commit()
+
+        logger.info(
+            f"✅ Reconciliación {'(simulada) ' if dry_run else ''}completada: {checked} actividades, "
+            f"{created} filas creadas, {fixed} corregidas"
+        )
+    except Exception as e:
+        session.rollback()
+        logger.error(f"❌ Error reconciliando estadísticas de actividades: {e}")
+        raise
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estadísticas materializadas por actividad")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reconcile_parser = subparsers.add_parser("reconcile", help="Recalcular y corregir activity_stats")
+    reconcile_parser.add_argument("--course-id", type=int, default=None, help="Solo las actividades de un curso")
+    reconcile_parser.add_argument("--batch-size", type=int, default=200)
+    reconcile_parser.add_argument("--dry-run", action="store_true", help="Solo mostrar las desviaciones")
+
+    args = parser.parse_args()
+    if args.command == "reconcile":
+        return reconcile(course_id=args.course_id, batch_size=args.batch_size, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
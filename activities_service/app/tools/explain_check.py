@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Verificación con EXPLAIN de las consultas frecuentes del servicio
+
+Ejecuta EXPLAIN (MySQL) sobre cada consulta caliente y falla si alguna
+recorre la tabla completa, no usa el índice esperado o necesita ordenar en
+memoria (filesort) cuando el índice debería dar el orden. Ejecutarlo tras
+``alembic upgrade head`` contra una base de datos con datos representativos:
+con tablas vacías el optimizador puede resolver la consulta sin índice.
+
+Uso (desde activities_service/):
+    DATABASE_URL=mysql+pymysql://... python -m app.tools.explain_check
+"""
+
+import logging
+import sys
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import mysql
+
+from app.database import engine
+from app.models import Activity, ActivityStats, Comment, Grade, Submission
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# EXPLAIN sin índice porque la fila no existe (tablas vacías): no es un fallo del esquema
+NO_ROWS_EXTRA = ("no matching row in const table", "Impossible WHERE", "No matching min/max row")
+
+
+@dataclass
+class HotQuery:
+    """Consulta frecuente e índices aceptables para su tabla principal"""
+    name: str
+    table: str
+    indexes: Tuple[str, ...]
+    statement: object
+    sorted_by_index: bool = False
+
+
+def build_queries() -> List[HotQuery]:
+    return [
+        HotQuery(
+            "Entrega de un estudiante en una actividad",
+            "submissions", ("uq_submissions_activity_user",),
+            select(Submission.id).where(Submission.activity_id == 1, Submission.user_id == 1),
+        ),
+        HotQuery(
+            "Listado de entregas por actividad (keyset)",
+            "submissions", ("ix_submissions_activity_submitted",),
+            select(Submission.id, Submission.submitted_at)
+            .where(Submission.activity_id == 1)
+            .order_by(Submission.submitted_at.desc(), Submission.id.desc())
+            .limit(51),
+            sorted_by_index=True,
+        ),
+        HotQuery(
+            "Entregas de un estudiante",
+            "submissions", ("ix_submissions_user_submitted",),
+            select(Submission.id).where(Submission.user_id == 1).order_by(Submission.submitted_at.desc()),
+            sorted_by_index=True,
+        ),
+        HotQuery(
+            "Actividades de un curso por fecha límite",
+            "activities", ("ix_activities_course_due",),
+            select(Activity.id)
+            .where(Activity.course_id == 1)
+            .order_by(Activity.due_date.is_(None), Activity.due_date, Activity.id)
+            .limit(51),
+        ),
+        HotQuery(
+            "Actividades creadas por un profesor",
+            "activities", ("ix_activities_creator_created",),
+            select(Activity.id).where(Activity.created_by == 1).order_by(Activity.created_at.desc()),
+            sorted_by_index=True,
+        ),
+        HotQuery(
+            "Última calificación de cada entrega",
+            "grades", ("ix_grades_submission_graded",),
+            select(Grade.submission_id, func.max(Grade.id))
+            .where(Grade.submission_id.in_([1, 2, 3]))
+            .group_by(Grade.submission_id),
+        ),
+        HotQuery(
+            "Calificaciones de un profesor",
+            "grades", ("ix_grades_grader_graded",),
+            select(Grade.id).where(Grade.graded_by == 1).order_by(Grade.graded_at.desc()),
+            sorted_by_index=True,
+        ),
+        HotQuery(
+            "Comentarios de una actividad",
+            "comments", ("ix_comments_activity_id",),
+            select(Comment.id).where(Comment.activity_id == 1),
+        ),
+        HotQuery(
+            "Estadísticas de una actividad",
+            "activity_stats", ("PRIMARY",),
+            select(ActivityStats.activity_id).where(ActivityStats.activity_id == 1),
+        ),
+    ]
+
+
+def explain(connection, query: HotQuery) -> List[str]:
+    """Problemas encontrados en el plan de la consulta (lista vacía si es correcto)"""
+    sql = str(query.statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+    rows = [dict(row._mapping) for row in connection.execute(text(f"EXPLAIN {sql}"))]
+
+    problems = []
+    for row in rows:
+        extra = row.get("Extra") or ""
+        if any(marker in extra for marker in NO_ROWS_EXTRA):
+            logger.warning(f"⚠️ {query.name}: sin filas para evaluar el plan ({extra})")
+            continue
+        if row.get("table") != query.table:
+            continue
+        if row.get("type") == "ALL":
+            problems.append(f"recorrido completo de {query.table}")
+        if row.get("key") not in query.indexes:
+            problems.append(f"usa el índice {row.get('key')} (esperado: {', '.join(query.indexes)})")
+        if query.sorted_by_index and "Using filesort" in extra:
+            problems.append("ordena con filesort en lugar de usar el índice")
+    return problems
+
+
+def main():
+    if engine.dialect.name != "mysql":
+        logger.error(f"❌ EXPLAIN solo está soportado en MySQL (dialecto: {engine.dialect.name})")
+        return 1
+
+    failures = 0
+    with engine.connect() as connection:
+        for query in build_queries():
+            problems = explain(connection, query)
+            if problems:
+                logger.error(f"❌ {query.name}: {'; '.join(problems)}")
+                failures += 1
+            else:
+                logger.info(f"✅ {query.name}")
+
+    if failures:
+        logger.error(f"❌ {failures} consulta(s) frecuentes sin el índice esperado")
+        return 1
+    logger.info("✅ Todas las consultas frecuentes usan su índice")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento del almacén de archivos direccionado por contenido
+
+Comandos:
+    backfill  Migra los archivos planos de ``uploads/`` al almacén por SHA-256.
+              Conserva el nombre público (las ``file_url`` existentes no cambian)
+              y calcula los contadores a partir de entregas y actividades.
+    gc        Elimina nombres sin referencias (subidas nunca adjuntadas), blobs
+              con ref_count 0 más antiguos que el periodo de gracia y subidas
+              directas (PUT y multipart) abandonadas en ``staging/``.
+    push      Sube al backend configurado (STORAGE_BACKEND=s3) los blobs que
+              siguen en el disco local, para cambiar de backend sin cortes.
+
+Uso (desde activities_service/):
+    python -m app.tools.file_storage backfill [--dry-run]
+    python -m app.tools.file_storage gc [--grace-hours 24] [--batch-size 500]
+    STORAGE_BACKEND=s3 python -m app.tools.file_storage push
+"""
+
+import argparse
+import hashlib
+import logging
+import mimetypes
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.models.activity import Activity
+from app.models.submission import Submission
+from app.models.stored_file import FileBlob, StoredFile
+from app.services.storage_backends import DirectUploadBackend, LocalStorageBackend, object_key
+from app.services.file_storage_service import (
+    FileStorageService,
+    UPLOAD_DIRECTORY,
+    UPLOAD_CHUNK_SIZE,
+    file_urls_of,
+    filename_from_url,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def count_references(session) -> Counter:
+    """Referencias actuales a cada nombre público desde entregas y actividades"""
+    references = Counter()
+    for entity in session.query(Submission).yield_per(1000):
+        references.update(filter(None, map(filename_from_url, file_urls_of(entity))))
+    for entity in session.query(Activity).yield_per(1000):
+        references.update(filter(None, map(filename_from_url, file_urls_of(entity))))
+    return references
+
+
+def backfill(dry_run: bool = False):
+    """Mover cada archivo plano a su blob y registrar su nombre público"""
+    session = SessionLocal()
+    try:
+        references = count_references(session)
+        storage = FileStorageService(session)
+        migrated = deduplicated = skipped = 0
+
+        for entry in os.scandir(UPLOAD_DIRECTORY):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            if len(entry.name) > 64 or storage.get_stored_file(entry.name):
+                skipped += 1
+                continue
+
+            sha256 = hash_file(entry.path)
+            if dry_run:
+                logger.info(f"   {entry.name} -> {object_key(sha256)} (referencias={references[entry.name]})")
+                migrated += 1
+                continue
+
+            stored_file = StoredFile(
+                filename=entry.name,
+                sha256=sha256,
+                original_name=entry.name,
+                content_type=mimetypes.guess_type(entry.name)[0],
+                ref_count=references[entry.name],
+            )
+            if storage.commit_blob(sha256, entry.stat().st_size, stored_file, entry.path):
+                deduplicated += 1
+            migrated += 1
+
+        logger.info(
+            f"✅ Backfill {'(simulado) ' if dry_run else ''}completado: {migrated} migrados, "
+            f"{deduplicated} deduplicados, {skipped} omitidos"
+        )
+    finally:
+        session.close()
+
+
+def gc(grace_hours: int = 24, batch_size: int = 500):
+    """
+    Recolectar nombres y blobs sin referencias
+
+    Los blobs se seleccionan con SELECT ... FOR UPDATE: una subida concurrente
+    del mismo contenido espera al commit y, si el blob ya no existe, lo vuelve
+    a crear. El objeto se borra antes del commit para no dejar filas sin blob.
+    """
+    cutoff = datetime.now() - timedelta(hours=grace_hours)
+    session = SessionLocal()
+    try:
+        storage = FileStorageService(session)
+        dropped_files = removed_blobs = 0
+
+        # 1. Subidas nunca adjuntadas a una entrega/actividad
+        while True:
+            unreferenced = session.query(StoredFile).filter(
+                StoredFile.ref_count <= 0,
+                StoredFile.created_at < cutoff
+            ).limit(batch_size).with_for_update().all()
+            if not unreferenced:
+                break
+            storage.drop_stored_files(unreferenced)
+            session.commit()
+            dropped_files += len(unreferenced)
+
+        # 2. Contenido que ya no usa ningún nombre público
+        while True:
+            blobs = session.query(FileBlob).filter(
+                FileBlob.ref_count <= 0,
+                FileBlob.updated_at < cutoff
+            ).limit(batch_size).with_for_update().all()
+            if not blobs:
+                break
+            for blob in blobs:
+                storage.backend.delete(object_key(blob.sha256))
+                session.delete(blob)
+            session.commit()
+            removed_blobs += len(blobs)
+
+        # 3. Subidas directas abandonadas (solo backends con subidas directas)
+        aborted_uploads = staged_objects = 0
+        if isinstance(storage.backend, DirectUploadBackend):
+            aborted_uploads = storage.backend.abort_stale_multipart_uploads(cutoff)
+            staged_objects = storage.backend.delete_stale_staging_objects(cutoff)
+
+        logger.info(
+            f"✅ GC completado: {dropped_files} nombres sin referencias, {removed_blobs} blobs eliminados, "
+            f"{aborted_uploads} subidas multipart abortadas, {staged_objects} subidas directas sin completar"
+        )
+    except Exception as e:
+        session.rollback()
+        logger.error(f"❌ Error en GC del almacén de archivos: {e}")
+        raise
+    finally:
+        session.close()
+
+
+def push(batch_size: int = 500):
+    """Subir los blobs locales al backend remoto y borrarlos del disco"""
+    session = SessionLocal()
+    try:
+        storage = FileStorageService(session)
+        if isinstance(storage.backend, LocalStorageBackend):
+            logger.error("❌ El backend configurado es local; defina STORAGE_BACKEND=s3")
+            return 1
+
+        local = LocalStorageBackend(UPLOAD_DIRECTORY)
+        pushed = 0
+        for blob in session.query(FileBlob).yield_per(batch_size):
+            key = object_key(blob.sha256)
+            if local.exists(key):
+                if storage.backend.exists(key):
+                    local.delete(key)
+                else:
+                    storage.backend.put_file(local.local_path(key), key)
+                pushed += 1
+
+        logger.info(f"✅ {pushed} blobs movidos del disco local al backend remoto")
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del almacén de archivos por contenido")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser("backfill", help="Migrar uploads/ planos al almacén por contenido")
+    backfill_parser.add_argument("--dry-run", action="store_true", help="Solo mostrar qué se migraría")
+
+    gc_parser = subparsers.add_parser("gc", help="Eliminar archivos sin referencias")
+    gc_parser.add_argument("--grace-hours", type=int, default=24, help="Antigüedad mínima para recolectar")
+    gc_parser.add_argument("--batch-size", type=int, default=500)
+
+    subparsers.add_parser("push", help="Subir los blobs locales al backend remoto")
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        return backfill(dry_run=args.dry_run)
+    if args.command == "push":
+        return push()
+    return gc(grace_hours=args.grace_hours, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""Lectura del CSV de calificación masiva (POST /api/submissions/grades/bulk/csv)"""
+
+from app.routers.submissions import _parse_grades_csv
+
+
+def test_valid_rows():
+    items, rows, errors = _parse_grades_csv(b"submission_id,score,feedback\n1,90,Bien\n2,75.5,\n")
+
+    assert [(item.submission_id, item.score, item.feedback) for item in items] == [(1, 90, "Bien"), (2, 75.5, None)]
+    assert rows == [2, 3]
+    assert errors == []
+
+
+def test_row_with_more_cells_than_header_is_a_row_error():
+    items, rows, errors = _parse_grades_csv(b"submission_id,score\n1,90,extra\n2,80\n")
+
+    assert [item.submission_id for item in items] == [2]
+    assert rows == [3]
+    assert len(errors) == 1
+    assert errors[0].row == 2
+    assert errors[0].submission_id == 1
+    assert errors[0].status == "error"
+
+
+def test_trailing_empty_cells_are_ignored():
+    items, _, errors = _parse_grades_csv(b"submission_id,score\n1,90,,\n")
+
+    assert [item.submission_id for item in items] == [1]
+    assert errors == []
+
+
+def test_invalid_score_is_a_row_error():
+    items, _, errors = _parse_grades_csv(b"submission_id,score\nabc,90\n3,\n")
+
+    assert items == []
+    assert [(error.row, error.submission_id, error.status) for error in errors] == [(2, None, "error"), (3, 3, "error")]
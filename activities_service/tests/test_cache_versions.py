@@ -0,0 +1,53 @@
+"""Contadores de versión del cache y ETags derivados de ellos"""
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.services.cache_service import CacheService, local_cache
+from app.services.optimized_activity_service import OptimizedActivityService
+
+
+@pytest.fixture
+def cache():
+    local_cache.clear()
+    service = CacheService.__new__(CacheService)
+    service.redis_client = fakeredis.FakeRedis()
+    service._hits = service._misses = 0
+    yield service
+    local_cache.clear()
+
+
+@pytest.fixture
+def activities(cache):
+    service = OptimizedActivityService.__new__(OptimizedActivityService)
+    service.cache = cache
+    return service
+
+
+def test_bump_changes_version(cache):
+    before = cache.get_version("activity", 1)
+    cache.bump_versions(activity_id=1)
+    assert cache.get_version("activity", 1) == before + 1
+
+
+def test_lost_counter_never_repeats(cache, activities):
+    cache.bump_versions(activity_id=1, course_id=2)
+    etags = (activities.get_activity_etag(1), activities.get_course_activities_etag(2))
+
+    # Redis reiniciado o contador expirado: el cambio posterior no puede
+    # producir el mismo ETag que se emitió antes
+    cache.redis_client.flushall()
+    local_cache.clear()
+    cache.bump_versions(activity_id=1, course_id=2)
+
+    assert activities.get_activity_etag(1) != etags[0]
+    assert activities.get_course_activities_etag(2) != etags[1]
+
+
+def test_read_seeds_missing_counter(cache):
+    first = cache.get_versions("activity", [1, 2])
+    local_cache.clear()
+    assert cache.get_versions("activity", [1, 2]) == first
+    assert cache.peek_version("activity", 1) == first[1]
+    assert all(version > 0 for version in first.values())
@@ -0,0 +1,91 @@
+"""Verificación de subidas directas antes de registrar el contenido"""
+
+import asyncio
+from typing import Optional
+
+import pytest
+
+from app.services.file_storage_service import FileStorageService, FileTooLargeError, MAX_FILE_SIZE
+from app.services.storage_backends import DirectUploadBackend
+
+
+class StagingOnlyBackend(DirectUploadBackend):
+    """Backend en memoria que solo conoce los tamaños de staging"""
+
+    def __init__(self, sizes: dict):
+        self.sizes = sizes
+        self.deleted = []
+        self.hashed = []
+
+    def put_file(self, source_path, key, content_type=None):
+        raise AssertionError("no se esperaba put_file")
+
+    def exists(self, key):
+        return key in self.sizes
+
+    def delete(self, key):
+        self.deleted.append(key)
+        self.sizes.pop(key, None)
+
+    def presigned_upload(self, key, content_type, sha256, size):
+        return {"method": "PUT", "url": f"https://storage/{key}", "headers": {}}
+
+    def create_multipart_upload(self, content_type, part_count):
+        return {}
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        return key
+
+    def abort_multipart_upload(self, key, upload_id):
+        pass
+
+    def object_size(self, key) -> Optional[int]:
+        return self.sizes.get(key)
+
+    def hash_object(self, key):
+        self.hashed.append(key)
+        raise AssertionError("no se esperaba leer el objeto")
+
+    def copy(self, source_key, target_key):
+        pass
+
+    def abort_stale_multipart_uploads(self, older_than):
+        return 0
+
+    def delete_stale_staging_objects(self, older_than):
+        return 0
+
+
+def complete_multipart(backend, size):
+    service = FileStorageService(db=None, backend=backend)
+    return asyncio.run(service.complete_multipart_upload(
+        "staging/upload", "upload-id", [{"part_number": 1, "etag": "x"}], size, "a.pdf", "application/pdf"
+    ))
+
+
+def test_missing_multipart_object_is_a_client_error():
+    backend = StagingOnlyBackend({})
+    with pytest.raises(ValueError, match="no se encuentra"):
+        complete_multipart(backend, 10)
+    assert backend.deleted == ["staging/upload"]
+
+
+def test_oversized_multipart_object_is_discarded_without_reading_it():
+    backend = StagingOnlyBackend({"staging/upload": MAX_FILE_SIZE + 1})
+    with pytest.raises(FileTooLargeError):
+        complete_multipart(backend, 10)
+    assert backend.hashed == []
+    assert backend.deleted == ["staging/upload"]
+
+
+def test_multipart_size_must_match_declared_size():
+    backend = StagingOnlyBackend({"staging/upload": 20})
+    with pytest.raises(ValueError, match="se declararon 10"):
+        complete_multipart(backend, 10)
+    assert backend.hashed == []
+
+
+def test_direct_upload_hash_comes_from_the_staging_key():
+    service = FileStorageService(db=None, backend=StagingOnlyBackend({}))
+    with pytest.raises(ValueError, match="Clave de subida directa inválida"):
+        asyncio.run(service.complete_direct_upload("objects/ab/cd/" + "a" * 64, 10, "a.pdf", "application/pdf"))
@@ -0,0 +1,38 @@
+"""Cursores y proyección ``fields=`` de los listados paginados"""
+
+from datetime import datetime
+
+import pytest
+
+from app.services.pagination import (
+    ACTIVITY_LIST_OPTIONAL_FIELDS, ACTIVITY_LIST_REQUIRED_FIELDS,
+    SUBMISSION_LIST_OPTIONAL_FIELDS, SUBMISSION_LIST_REQUIRED_FIELDS,
+    decode_cursor, encode_cursor, parse_fields
+)
+
+
+def test_cursor_round_trip():
+    submitted_at = datetime(2026, 10, 19, 12, 30)
+    assert decode_cursor(encode_cursor(submitted_at, 42)) == (submitted_at, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_no_projection_loads_everything():
+    assert parse_fields(None, ACTIVITY_LIST_OPTIONAL_FIELDS, ACTIVITY_LIST_REQUIRED_FIELDS) is None
+
+
+def test_required_fields_are_accepted():
+    selected = parse_fields("title,file_url", ACTIVITY_LIST_OPTIONAL_FIELDS, ACTIVITY_LIST_REQUIRED_FIELDS)
+    assert selected == {"file_url"}
+
+
+def test_fields_of_another_listing_are_rejected():
+    with pytest.raises(ValueError, match="submitted_at"):
+        parse_fields("submitted_at", ACTIVITY_LIST_OPTIONAL_FIELDS, ACTIVITY_LIST_REQUIRED_FIELDS)
+    with pytest.raises(ValueError, match="title"):
+        parse_fields("content,title", SUBMISSION_LIST_OPTIONAL_FIELDS, SUBMISSION_LIST_REQUIRED_FIELDS)
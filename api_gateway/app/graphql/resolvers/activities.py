@@ -12,6 +12,8 @@ from enum import Enum
 import httpx
 import os
 
+from app.utils.conditional_cache import activities_etag_cache
+
 # Variables de entorno para microservicios
 ACTIVITIES_SERVICE_URL = os.getenv("ACTIVITIES_SERVICE_URL", "http://cc_activities_ms:8003")
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth_user_service:8000")
@@ -242,13 +244,20 @@ class Query:
             if user_id:
                 headers["User_id"] = str(user_id)
             
+            # GET condicional: si la actividad no cambió, el servicio responde 304 sin cuerpo
+            url = f"{ACTIVITIES_SERVICE_URL}/api/v2/activities/{id}"
+            cached = activities_etag_cache.get(url)
+            headers.update(activities_etag_cache.request_headers(cached))
+
             async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"{ACTIVITIES_SERVICE_URL}/api/v2/activities/{id}",
-                    headers=headers
-                )
+                response = await client.get(url, headers=headers)
+
+                if response.status_code == 304 and cached:
+                    activities_etag_cache.store(url, cached.etag, cached.value)
+                    return cached.value
 
                 if response.status_code != 200:
+                    activities_etag_cache.discard(url)
                     return None
                 
                 data = response.json()
@@ -277,6 +286,7 @@ class Query:
                     comments=comments
                 )
 
+                activities_etag_cache.store(url, response.headers.get("etag"), activity_obj)
                 return activity_obj
                 
 
@@ -294,18 +304,26 @@ class Query:
                 Optional[Activity]: De vuelve una lista de actividades asociadas a un curso
         """
         try:
+            # GET condicional: si el curso no cambió, el servicio responde 304 sin cuerpo
+            url = f"{ACTIVITIES_SERVICE_URL}/api/v2/activities/list/{id_course}"
+            cached = activities_etag_cache.get(url)
+
             async with httpx.AsyncClient(timeout=10.0) as client:
                 # Añadir log para debug
-                print(f"🔍 Calling v2 endpoint: {ACTIVITIES_SERVICE_URL}/api/v2/activities/list/{id_course}")
+                print(f"🔍 Calling v2 endpoint: {url}")
                 
-                response = await client.get(
-                    f"{ACTIVITIES_SERVICE_URL}/api/v2/activities/list/{id_course}"
-                )
+                response = await client.get(url, headers=activities_etag_cache.request_headers(cached))
                 
                 print(f"🔍 V2 Response status: {response.status_code}")
+
+                if response.status_code == 304 and cached:
+                    activities_etag_cache.store(url, cached.etag, cached.value)
+                    return cached.value
+
                 print(f"🔍 V2 Response content: {response.text[:500]}...")  # Primeros 500 chars
                 
                 if response.status_code != 200:
+                    activities_etag_cache.discard(url)
                     print(f"❌ V2 failed, using sample data")
                     return _get_sample_activities(id_course)
                 
@@ -335,7 +353,9 @@ class Query:
                     )
                     activities_list.append(activity_instance)
 
-                return ActivitiesSuccess(activities = activities_list)
+                result = ActivitiesSuccess(activities = activities_list)
+                activities_etag_cache.store(url, response.headers.get("etag"), result)
+                return result
 
         except Exception as e:
             print(f"❌ Error connecting to activities service: {str(e)}")
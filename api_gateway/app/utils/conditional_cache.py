@@ -0,0 +1,70 @@
+"""
+Cache local de respuestas con ETag para GET condicionales
+
+Los resolvers guardan el objeto GraphQL ya mapeado junto con el ETag de la
+respuesta del microservicio. En la siguiente llamada envían If-None-Match y,
+si el servicio responde 304, reutilizan el objeto: la respuesta viaja sin
+cuerpo y no se vuelve a mapear campo por campo.
+
+Las entradas se revalidan en cada uso; ``max_age`` solo descarta las que
+llevan tiempo sin usarse.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import threading
+import time
+
+ETAG_CACHE_MAX_ENTRIES = 1000
+ETAG_CACHE_MAX_AGE = 600  # segundos
+
+
+@dataclass
+class CachedResponse:
+    etag: str
+    value: Any
+    validated_at: float
+
+
+class ConditionalCache:
+    """LRU de (ETag, valor mapeado) por URL"""
+
+    def __init__(self, max_entries: int = ETAG_CACHE_MAX_ENTRIES, max_age: float = ETAG_CACHE_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.validated_at > self.max_age:
+                del self._entries[url]
+                return None
+            self._entries.move_to_end(url)
+            return entry
+
+    def request_headers(self, entry: Optional[CachedResponse]) -> Dict[str, str]:
+        return {"If-None-Match": entry.etag} if entry else {}
+
+    def store(self, url: str, etag: Optional[str], value: Any):
+        """Guardar (o revalidar tras un 304) el valor; sin ETag no se cachea"""
+        if not etag:
+            self.discard(url)
+            return
+        with self._lock:
+            self._entries[url] = CachedResponse(etag, value, time.monotonic())
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, url: str):
+        with self._lock:
+            self._entries.pop(url, None)
+
+
+# Compartida por los resolvers de actividades
+activities_etag_cache = ConditionalCache()
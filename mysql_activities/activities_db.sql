@@ -42,4 +42,47 @@ CREATE TABLE IF NOT EXISTS comments (
     content TEXT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (activity_id) REFERENCES activities(id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+-- Contenido de archivos direccionado por SHA-256 (deduplicado)
+CREATE TABLE IF NOT EXISTS file_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_file_blobs_gc (ref_count, updated_at)
+);
+
+-- Nombres públicos de archivos subidos (los de file_url)
+CREATE TABLE IF NOT EXISTS stored_files (
+    filename VARCHAR(64) PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    original_name VARCHAR(255),
+    content_type VARCHAR(100),
+    ref_count INT NOT NULL DEFAULT 0,
+    uploaded_by INT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_stored_files_sha256 (sha256),
+    INDEX idx_stored_files_gc (ref_count, created_at),
+    FOREIGN KEY (sha256) REFERENCES file_blobs(sha256)
+);
+
+-- Estadísticas materializadas por actividad (python -m app.tools.activity_stats reconcile)
+CREATE TABLE IF NOT EXISTS activity_stats (
+    activity_id INT PRIMARY KEY,
+    submissions_count INT NOT NULL DEFAULT 0,
+    graded_count INT NOT NULL DEFAULT 0,
+    score_sum DECIMAL(12,2) NOT NULL DEFAULT 0,
+    score_bucket_0 INT NOT NULL DEFAULT 0,
+    score_bucket_1 INT NOT NULL DEFAULT 0,
+    score_bucket_2 INT NOT NULL DEFAULT 0,
+    score_bucket_3 INT NOT NULL DEFAULT 0,
+    score_bucket_4 INT NOT NULL DEFAULT 0,
+    score_bucket_5 INT NOT NULL DEFAULT 0,
+    score_bucket_6 INT NOT NULL DEFAULT 0,
+    score_bucket_7 INT NOT NULL DEFAULT 0,
+    score_bucket_8 INT NOT NULL DEFAULT 0,
+    score_bucket_9 INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (activity_id) REFERENCES activities(id) ON DELETE CASCADE
+);
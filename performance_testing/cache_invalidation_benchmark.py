@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark de invalidación de cache para CourseClash
+
+Compara las tres formas de invalidar las claves de un curso en Redis:
+1. KEYS + DELETE (implementación anterior de delete_pattern)
+2. SCAN + UNLINK (delete_pattern actual, para patrones ad hoc)
+3. Tags (sets de Redis) con CacheService.invalidate_tags
+
+Mientras cada estrategia se ejecuta, un hilo sonda envía PING cada milisegundo
+para medir cuánto tiempo queda bloqueada la instancia compartida.
+
+Uso:
+    REDIS_URL=redis://:courseclash123@localhost:6379/15 \\
+        python cache_invalidation_benchmark.py --keys 1000000 --courses 10000
+
+ADVERTENCIA: el script hace FLUSHDB sobre la base indicada en REDIS_URL.
+
+Autor: CourseClash Team
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import random
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import redis
+
+# Permitir importar CacheService del servicio de actividades
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "activities_service"))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://:courseclash123@localhost:6379/15")
+os.environ["REDIS_URL"] = REDIS_URL
+
+from app.services.cache_service import CacheService  # noqa: E402
+
+
+@dataclass
+class InvalidationResult:
+    """Resultado de una estrategia de invalidación"""
+    strategy: str
+    keys_deleted: int
+    elapsed_ms: float
+    probe_max_ms: float
+    probe_p99_ms: float
+
+
+@dataclass
+class PingProbe:
+    """Hilo que mide la latencia de PING mientras corre una invalidación"""
+    client: redis.Redis
+    latencies_ms: List[float] = field(default_factory=list)
+    _stop: threading.Event = field(default_factory=threading.Event)
+    _thread: threading.Thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            self.client.ping()
+            self.latencies_ms.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.001)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def max_ms(self) -> float:
+        return max(self.latencies_ms) if self.latencies_ms else 0.0
+
+    @property
+    def p99_ms(self) -> float:
+        if len(self.latencies_ms) < 2:
+            return self.max_ms
+        return statistics.quantiles(self.latencies_ms, n=100)[98]
+
+
+def populate(cache: CacheService, total_keys: int, courses: int, batch_size: int = 10000):
+    """
+    Cargar ``total_keys`` claves repartidas entre ``courses`` cursos con el mismo
+    layout que produce CacheService (clave + registro en el set del tag).
+    Se usa un pipeline directo porque 1M llamadas a ``set`` serían 1M round trips.
+    """
+    client = cache.redis_client
+    payload = pickle.dumps({"title": "Actividad de benchmark", "description": "x" * 64})
+    pipe = client.pipeline(transaction=False)
+
+    for i in range(total_keys):
+        course_id = i % courses
+        key = cache._generate_key("course_activities", course_id, page=i // courses)
+        pipe.setex(key, 3600, payload)
+        pipe.sadd(cache._tag_key(cache.course_tag(course_id)), key)
+        if (i + 1) % batch_size == 0:
+            pipe.execute()
+            if (i + 1) % (batch_size * 10) == 0:
+                logger.info(f"   {i + 1:,} claves cargadas")
+
+    pipe.execute()
+    logger.info(f"✅ {total_keys:,} claves cargadas en {courses:,} cursos (dbsize={client.dbsize():,})")
+
+
+def run_strategy(cache: CacheService, strategy: str, course_id: int) -> InvalidationResult:
+    """Invalidar todas las claves de un curso con la estrategia indicada"""
+    probe = PingProbe(redis.from_url(REDIS_URL))
+    probe.start()
+    pattern = f"course_activities:{course_id}:*"
+
+    start = time.perf_counter()
+    if strategy == "keys":
+        keys = cache.redis_client.keys(pattern)
+        deleted = cache.redis_client.delete(*keys) if keys else 0
+    elif strategy == "scan":
+        deleted = cache.delete_pattern(pattern)
+    else:
+        deleted = cache.invalidate_tags(cache.course_tag(course_id))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    probe.stop()
+    return InvalidationResult(
+        strategy=strategy,
+        keys_deleted=deleted,
+        elapsed_ms=elapsed_ms,
+        probe_max_ms=probe.max_ms,
+        probe_p99_ms=probe.p99_ms,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de invalidación de cache (KEYS vs SCAN vs tags)")
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Número total de claves a cargar")
+    parser.add_argument("--courses", type=int, default=10_000, help="Número de cursos entre los que se reparten")
+    parser.add_argument("--rounds", type=int, default=5, help="Cursos invalidados por estrategia")
+    args = parser.parse_args()
+
+    cache = CacheService(REDIS_URL)
+    if not cache.redis_client:
+        logger.error(f"❌ No se pudo conectar a Redis en {REDIS_URL}")
+        sys.exit(1)
+
+    logger.info(f"🔧 Preparando {args.keys:,} claves en {REDIS_URL}")
+    cache.redis_client.flushdb()
+    populate(cache, args.keys, args.courses)
+
+    # Cada estrategia invalida cursos distintos para no medir sets ya vacíos
+    course_ids = random.sample(range(args.courses), args.rounds * 3)
+    results: List[InvalidationResult] = []
+    for index, strategy in enumerate(("keys", "scan", "tags")):
+        for course_id in course_ids[index * args.rounds:(index + 1) * args.rounds]:
+            results.append(run_strategy(cache, strategy, course_id))
+
+    print()
+    print(f"{'Estrategia':<10} {'Claves':>8} {'Media (ms)':>12} {'Máx (ms)':>10} {'PING máx (ms)':>14} {'PING p99 (ms)':>14}")
+    print("-" * 74)
+    for strategy in ("keys", "scan", "tags"):
+        rows = [r for r in results if r.strategy == strategy]
+        print(
+            f"{strategy:<10} "
+            f"{statistics.mean(r.keys_deleted for r in rows):>8.0f} "
+            f"{statistics.mean(r.elapsed_ms for r in rows):>12.2f} "
+            f"{max(r.elapsed_ms for r in rows):>10.2f} "
+            f"{max(r.probe_max_ms for r in rows):>14.2f} "
+            f"{max(r.probe_p99_ms for r in rows):>14.2f}"
+        )
+
+    cache.redis_client.flushdb()
+
+
+if __name__ == "__main__":
+    main()
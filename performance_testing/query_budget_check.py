@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Verificación de presupuesto de consultas SQL para CourseClash
+
+El servicio de actividades devuelve en cada respuesta la cabecera
+``X-SQL-Statements`` (QueryCounterMiddleware). Para cada tamaño de datos
+(por defecto 1 y 50) el script crea por la API un curso nuevo con N
+actividades comentadas y, en la primera, N entregas calificadas. Después llama
+una vez a cada listado sobre esos datos y falla si:
+
+- la respuesta no trae la cabecera o ejecutó 0 sentencias (cache hit: no se
+  midió nada; los cursos/actividades son nuevos, así que no debería ocurrir),
+- alguna llamada supera su presupuesto,
+- el número de sentencias cambia entre tamaños, es decir, crece con el número
+  de filas (N+1 por lazy loading).
+
+Uso:
+    ACTIVITIES_URL=http://localhost:8003 python query_budget_check.py --sizes 1,50
+
+Los datos creados se quedan en la base de datos: usar un entorno de pruebas.
+
+Autor: CourseClash Team
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+import requests
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ACTIVITIES_URL = os.getenv("ACTIVITIES_URL", "http://localhost:8003")
+
+# Límite de POST /api/v2/activities/batch
+MAX_BATCH = 50
+
+
+@dataclass
+class Dataset:
+    """Datos creados para un tamaño: N actividades en el curso, N entregas en la primera"""
+    size: int
+    course_id: int
+    teacher_id: int
+    activity_ids: List[int]
+
+
+@dataclass
+class BudgetCase:
+    """Endpoint de listado y número máximo de sentencias permitidas"""
+    name: str
+    budget: int
+    call: Callable[[requests.Session, Dataset], requests.Response]
+
+
+def _created(response: requests.Response, what: str) -> dict:
+    if response.status_code not in (200, 201):
+        raise RuntimeError(f"No se pudo crear {what}: HTTP {response.status_code} {response.text[:200]}")
+    return response.json()
+
+
+def seed(session: requests.Session, size: int) -> Dataset:
+    """Crear curso, actividades, comentarios, entregas y calificaciones de un tamaño"""
+    # Ids altos y aleatorios: ninguna versión ni clave de cache previa
+    course_id = random.randint(10**6, 10**9)
+    teacher_id = random.randint(10**6, 10**9)
+    headers = {"User_id": str(teacher_id)}
+
+    activity_ids = []
+    for i in range(size):
+        activity = _created(
+            session.post(
+                f"{ACTIVITIES_URL}/api/activities/",
+                headers=headers,
+                json={"course_id": course_id, "title": f"Presupuesto SQL {size}/{i}", "activity_type": "task"},
+            ),
+            "la actividad",
+        )
+        activity_ids.append(activity["id"])
+        _created(
+            session.post(
+                f"{ACTIVITIES_URL}/api/activities/{activity['id']}/comments",
+                headers=headers,
+                json={"content": "Comentario de prueba"},
+            ),
+            "el comentario",
+        )
+
+    submission_ids = []
+    for i in range(size):
+        submission = _created(
+            session.post(
+                f"{ACTIVITIES_URL}/api/submissions/",
+                headers={"User_id": str(teacher_id + 1 + i)},
+                json={"activity_id": activity_ids[0], "content": f"Entrega {i}"},
+            ),
+            "la entrega",
+        )
+        submission_ids.append(submission["id"])
+
+    graded = _created(
+        session.post(
+            f"{ACTIVITIES_URL}/api/submissions/grades/bulk",
+            headers=headers,
+            params={"user_role": "teacher"},
+            json={"grades": [{"submission_id": sid, "score": 80} for sid in submission_ids]},
+        ),
+        "las calificaciones",
+    )
+    if graded.get("failed"):
+        raise RuntimeError(f"Calificaciones rechazadas: {graded}")
+
+    logger.info(f"🌱 Tamaño {size}: curso {course_id}, {size} actividades, {size} entregas calificadas")
+    return Dataset(size, course_id, teacher_id, activity_ids)
+
+
+def _submissions_params(data: Dataset) -> Dict:
+    return {"activity_id": data.activity_ids[0], "user_id": data.teacher_id, "user_role": "teacher"}
+
+
+CASES = [
+    # submissions + grades (IN) + activity (IN)
+    BudgetCase(
+        "GET /api/submissions/",
+        3,
+        lambda s, d: s.get(f"{ACTIVITIES_URL}/api/submissions/", params=_submissions_params(d)),
+    ),
+    BudgetCase(
+        "GET /api/submissions/ (página)",
+        3,
+        lambda s, d: s.get(f"{ACTIVITIES_URL}/api/submissions/", params={**_submissions_params(d), "limit": 50}),
+    ),
+    # Una consulta en cache miss
+    BudgetCase(
+        "GET /api/v2/activities/list/{course_id}",
+        1,
+        lambda s, d: s.get(f"{ACTIVITIES_URL}/api/v2/activities/list/{d.course_id}"),
+    ),
+    BudgetCase(
+        "GET /api/v2/activities/list/{course_id} (página)",
+        1,
+        lambda s, d: s.get(
+            f"{ACTIVITIES_URL}/api/v2/activities/list/{d.course_id}",
+            params={"limit": 50, "fields": "file_url"},
+        ),
+    ),
+    # activities IN (...) + comments IN (...)
+    BudgetCase(
+        "POST /api/v2/activities/batch",
+        2,
+        lambda s, d: s.post(f"{ACTIVITIES_URL}/api/v2/activities/batch", json=d.activity_ids[:MAX_BATCH]),
+    ),
+]
+
+
+def measure(session: requests.Session, case: BudgetCase, data: Dataset) -> int:
+    """Sentencias SQL de una llamada; -1 si la respuesta no sirve para medir"""
+    response = case.call(session, data)
+    statements = response.headers.get("X-SQL-Statements")
+
+    if response.status_code != 200 or statements is None:
+        logger.error(f"❌ {case.name} [N={data.size}]: HTTP {response.status_code}, cabecera X-SQL-Statements={statements}")
+        return -1
+    if int(statements) == 0:
+        logger.error(f"❌ {case.name} [N={data.size}]: 0 sentencias, la respuesta salió del cache y no mide nada")
+        return -1
+    return int(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Falla si un listado ejecuta más sentencias SQL de las permitidas o si crecen con N")
+    parser.add_argument("--sizes", default="1,50", help="Tamaños de datos separados por comas (al menos dos)")
+    args = parser.parse_args()
+
+    sizes = sorted({int(size) for size in args.sizes.split(",")})
+    if len(sizes) < 2 or sizes[0] < 1 or sizes[-1] > MAX_BATCH:
+        parser.error(f"--sizes necesita al menos dos tamaños entre 1 y {MAX_BATCH}")
+
+    session = requests.Session()
+    datasets = [seed(session, size) for size in sizes]
+
+    failures = 0
+    for case in CASES:
+        counts = [measure(session, case, data) for data in datasets]
+        if -1 in counts:
+            failures += 1
+            continue
+
+        summary = ", ".join(f"N={data.size}: {count}" for data, count in zip(datasets, counts))
+        if len(set(counts)) > 1:
+            logger.error(f"❌ {case.name}: las sentencias crecen con N ({summary})")
+            failures += 1
+        elif counts[0] > case.budget:
+            logger.error(f"❌ {case.name}: {summary} sentencias (presupuesto {case.budget})")
+            failures += 1
+        else:
+            logger.info(f"✅ {case.name}: {summary} sentencias (presupuesto {case.budget})")
+
+    if failures:
+        logger.error(f"❌ {failures} endpoint(s) superan su presupuesto o escalan con N")
+        sys.exit(1)
+    logger.info("✅ Todos los listados dentro del presupuesto y constantes con N")
+
+
+if __name__ == "__main__":
+    main()
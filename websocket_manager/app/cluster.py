@@ -0,0 +1,210 @@
+"""
+Cluster mode for the WebSocket Manager
+
+Several replicas can run behind the proxy: every RabbitMQ message on
+``websocket.events`` is consumed by exactly one node, which may not hold the
+target socket. Each node therefore:
+
+- registers the users and duels it holds in Redis sets
+  (``ws:user:{user_id}`` / ``ws:duel:{duel_id}`` -> node ids)
+- keeps a heartbeat key ``ws:node:{node_id}``; registrations of nodes whose
+  heartbeat expired are ignored and pruned lazily
+- subscribes to its own pub/sub channel ``ws:deliver:{node_id}`` so the node
+  that consumed a message can forward it to the nodes holding the target
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Iterable, Optional, Set
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+NODE_ID = os.getenv("WS_NODE_ID") or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+NODE_HEARTBEAT_INTERVAL = int(os.getenv("WS_NODE_HEARTBEAT_INTERVAL", "10"))
+NODE_TTL = int(os.getenv("WS_NODE_TTL", "30"))
+# Registrations are refreshed on every heartbeat by the nodes that still hold them
+REGISTRATION_TTL = NODE_TTL * 2
+
+NODE_KEY = "ws:node:{}"
+USER_KEY = "ws:user:{}"
+DUEL_KEY = "ws:duel:{}"
+DELIVER_CHANNEL = "ws:deliver:{}"
+
+ForwardHandler = Callable[[str, dict], Awaitable[None]]
+
+
+class ClusterRegistry:
+    """Redis-backed registry of which node holds which user/duel"""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        on_forward: ForwardHandler,
+        node_id: str = NODE_ID,
+    ):
+        self.redis = redis_client
+        self.on_forward = on_forward
+        self.node_id = node_id
+        self.users: Set[str] = set()
+        self.duels: Set[str] = set()
+        self.forwarded = 0
+        self.received = 0
+        self._pubsub: Optional[redis.client.PubSub] = None
+        self._tasks = []
+
+    async def start(self):
+        """Announce the node, subscribe to its channel and start the heartbeat"""
+        await self.redis.setex(NODE_KEY.format(self.node_id), NODE_TTL, "1")
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(DELIVER_CHANNEL.format(self.node_id))
+        self._tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._listen_loop()),
+        ]
+        logger.info(f"Cluster node {self.node_id} started")
+
+    async def stop(self):
+        """Remove every registration of this node so no message is routed here"""
+        for task in self._tasks:
+            task.cancel()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id in self.users:
+                pipe.srem(USER_KEY.format(user_id), self.node_id)
+            for duel_id in self.duels:
+                pipe.srem(DUEL_KEY.format(duel_id), self.node_id)
+            pipe.delete(NODE_KEY.format(self.node_id))
+            await pipe.execute()
+            if self._pubsub:
+                await self._pubsub.unsubscribe()
+                await self._pubsub.close()
+        except Exception as e:
+            logger.error(f"Failed to unregister cluster node {self.node_id}: {e}")
+        logger.info(f"Cluster node {self.node_id} stopped")
+
+    # ------------------------------------------------------------------
+    # Registrations
+    # ------------------------------------------------------------------
+
+    async def _register(self, key: str):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sadd(key, self.node_id)
+        pipe.expire(key, REGISTRATION_TTL)
+        await pipe.execute()
+
+    async def register_user(self, user_id: str):
+        self.users.add(user_id)
+        await self._register(USER_KEY.format(user_id))
+
+    async def unregister_user(self, user_id: str):
+        """Call when the last local connection of the user closes"""
+        self.users.discard(user_id)
+        await self.redis.srem(USER_KEY.format(user_id), self.node_id)
+
+    async def register_duel(self, duel_id: str):
+        self.duels.add(duel_id)
+        await self._register(DUEL_KEY.format(duel_id))
+
+    async def unregister_duel(self, duel_id: str):
+        """Call when the last local participant of the duel leaves"""
+        self.duels.discard(duel_id)
+        await self.redis.srem(DUEL_KEY.format(duel_id), self.node_id)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    async def _live_nodes(self, key: str) -> Set[str]:
+        """Nodes registered under ``key`` whose heartbeat is still alive"""
+        nodes = list(await self.redis.smembers(key))
+        if not nodes:
+            return set()
+        alive = await self.redis.mget([NODE_KEY.format(node) for node in nodes])
+        dead = [node for node, flag in zip(nodes, alive) if not flag]
+        if dead:
+            await self.redis.srem(key, *dead)
+            logger.info(f"Pruned stale nodes {dead} from {key}")
+        return {node for node, flag in zip(nodes, alive) if flag}
+
+    async def nodes_for_user(self, user_id: str) -> Set[str]:
+        return await self._live_nodes(USER_KEY.format(user_id))
+
+    async def nodes_for_duel(self, duel_id: str) -> Set[str]:
+        return await self._live_nodes(DUEL_KEY.format(duel_id))
+
+    async def list_nodes(self) -> Set[str]:
+        nodes = set()
+        async for key in self.redis.scan_iter(match=NODE_KEY.format("*"), count=100):
+            nodes.add(key.split(":", 2)[2])
+        return nodes
+
+    # ------------------------------------------------------------------
+    # Delivery
+    # ------------------------------------------------------------------
+
+    async def forward(self, nodes: Iterable[str], routing_key: str, data: dict) -> int:
+        """Forward a message to other nodes; returns how many nodes received it"""
+        targets = [node for node in nodes if node != self.node_id]
+        if not targets:
+            return 0
+        payload = json.dumps(
+            {"routing_key": routing_key, "data": data, "origin": self.node_id}
+        )
+        pipe = self.redis.pipeline(transaction=False)
+        for node in targets:
+            pipe.publish(DELIVER_CHANNEL.format(node), payload)
+        receivers = await pipe.execute()
+        delivered = sum(1 for count in receivers if count)
+        self.forwarded += delivered
+        return delivered
+
+    async def _listen_loop(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message is None:
+                    continue
+                envelope = json.loads(message["data"])
+                self.received += 1
+                await self.on_forward(envelope["routing_key"], envelope["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error handling forwarded cluster message: {e}")
+                await asyncio.sleep(1)
+
+    async def _heartbeat_loop(self):
+        """Keep the node alive and refresh the TTL of everything it holds"""
+        while True:
+            await asyncio.sleep(NODE_HEARTBEAT_INTERVAL)
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.setex(NODE_KEY.format(self.node_id), NODE_TTL, "1")
+                for user_id in self.users:
+                    pipe.sadd(USER_KEY.format(user_id), self.node_id)
+                    pipe.expire(USER_KEY.format(user_id), REGISTRATION_TTL)
+                for duel_id in self.duels:
+                    pipe.sadd(DUEL_KEY.format(duel_id), self.node_id)
+                    pipe.expire(DUEL_KEY.format(duel_id), REGISTRATION_TTL)
+                await pipe.execute()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cluster heartbeat failed for node {self.node_id}: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "node_id": self.node_id,
+            "registered_users": len(self.users),
+            "registered_duels": len(self.duels),
+            "forwarded": self.forwarded,
+            "received": self.received,
+        }
@@ -0,0 +1,56 @@
+"""
+Wire encodings of the WebSocket Manager
+
+The encoding is negotiated per connection with the WebSocket subprotocol
+(``Sec-WebSocket-Protocol``):
+
+- ``courseclash.json``: JSON text frames. Also used when the client offers
+  no subprotocol, so existing clients keep working unchanged
+- ``courseclash.msgpack``: MessagePack binary frames, in both directions
+
+Compression is the ``permessage-deflate`` extension, negotiated by uvicorn
+when the client offers it (``WS_PER_MESSAGE_DEFLATE``, read by the Dockerfile
+CMD and the docker-compose.yml command); it applies on top of either encoding.
+"""
+
+import json
+from enum import Enum
+from typing import Any, Optional, Tuple, Union
+
+import msgpack
+from fastapi import WebSocket
+
+
+class Codec(str, Enum):
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+
+SUBPROTOCOLS = {
+    "courseclash.json": Codec.JSON,
+    "courseclash.msgpack": Codec.MSGPACK,
+}
+
+
+def negotiate(websocket: WebSocket) -> Tuple[Codec, Optional[str]]:
+    """Codec and subprotocol to accept, honouring the client's preference order"""
+    for subprotocol in websocket.scope.get("subprotocols", []):
+        if subprotocol in SUBPROTOCOLS:
+            return SUBPROTOCOLS[subprotocol], subprotocol
+    return Codec.JSON, None
+
+
+def dumps(codec: Codec, data: Any) -> Union[str, bytes]:
+    if codec is Codec.MSGPACK:
+        return msgpack.packb(data)
+    if isinstance(data, str):
+        return data
+    # Same encoding as WebSocket.send_json
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+async def receive_message(websocket: WebSocket, codec: Codec) -> Any:
+    """Next client message decoded with the connection's codec"""
+    if codec is Codec.MSGPACK:
+        return msgpack.unpackb(await websocket.receive_bytes())
+    return await websocket.receive_json()
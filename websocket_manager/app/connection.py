@@ -0,0 +1,225 @@
+"""
+Outbound side of a WebSocket connection
+
+Every connection owns a bounded queue drained by its own writer task, so a
+slow client only delays itself: broadcasts enqueue without awaiting the
+network. A message is encoded at most once per wire format
+(``OutboundMessage.frame``) and the same frame is shared by every recipient
+using that format (see ``app.codec``).
+
+When the queue is full the connection applies its overflow policy:
+
+- ``drop_oldest``: discard the oldest pending message
+- ``coalesce``: messages with a ``coalesce_key`` replace the pending message
+  with the same key (e.g. duel status); otherwise behaves like drop_oldest
+- ``disconnect``: close the socket (1013) so the client reconnects and resyncs
+
+Duel messages carry the sequence number of the duel event (``seq``). Plain
+text messages cannot, so they may also have a structured form that is sent
+to resumable clients (those that connected with ``resume_from``) and to
+binary (MessagePack) clients.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from app.codec import Codec, dumps
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+
+# Close code for slow consumers ("Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+DUEL_OVERFLOW_POLICY = OverflowPolicy(os.getenv("WS_DUEL_OVERFLOW_POLICY", "coalesce"))
+NOTIFICATION_OVERFLOW_POLICY = OverflowPolicy(
+    os.getenv("WS_NOTIFICATION_OVERFLOW_POLICY", "drop_oldest")
+)
+
+
+@dataclass
+class OutboundMessage:
+    """Message shared by every recipient, encoded at most once per format"""
+
+    data: Any
+    coalesce_key: Optional[str] = None
+    seq: Optional[int] = None
+    # Structured form (with seq) of a plain text message
+    sequenced: Any = None
+    created_at: float = field(default_factory=time.monotonic)
+    _frames: Dict[Tuple[Codec, bool], Union[str, bytes]] = field(
+        default_factory=dict, repr=False
+    )
+
+    def frame(self, codec: Codec, resumable: bool = False) -> Union[str, bytes]:
+        # Binary clients are new clients: they always get the structured form
+        structured = self.sequenced is not None and (
+            resumable or codec is Codec.MSGPACK
+        )
+        key = (codec, structured)
+        if key not in self._frames:
+            self._frames[key] = dumps(
+                codec, self.sequenced if structured else self.data
+            )
+        return self._frames[key]
+
+
+class Connection:
+    """WebSocket with a bounded outbound queue and its own writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        max_queue: int = SEND_QUEUE_SIZE,
+        duel_id: Optional[str] = None,
+        resumable: bool = False,
+        codec: Codec = Codec.JSON,
+        heartbeat: bool = False,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.duel_id = duel_id
+        self.resumable = resumable
+        self.codec = codec
+        # Whether the client must answer application heartbeats
+        self.heartbeat = heartbeat
+        self.last_received = time.monotonic()
+        self.overflow_policy = overflow_policy
+        self.max_queue = max_queue
+        self.closed = False
+        # Set once the client was asked to reconnect elsewhere (drain)
+        self.handing_off = False
+        self._queue: Deque[OutboundMessage] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, message: OutboundMessage) -> bool:
+        """Enqueue without waiting for the network; False if the message was not queued"""
+        if self.closed:
+            return False
+
+        if len(self._queue) >= self.max_queue:
+            if message.coalesce_key and self.overflow_policy == OverflowPolicy.COALESCE:
+                for index, pending in enumerate(self._queue):
+                    if pending.coalesce_key == message.coalesce_key:
+                        self._queue[index] = message
+                        self.coalesced += 1
+                        return True
+            if self.overflow_policy == OverflowPolicy.DISCONNECT:
+                logger.warning(
+                    f"Disconnecting slow consumer {self.user_id}: {len(self._queue)} messages pending"
+                )
+                asyncio.create_task(
+                    self.close(SLOW_CONSUMER_CLOSE_CODE, "Slow consumer")
+                )
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+
+        self._queue.append(message)
+        self._ready.set()
+        return True
+
+    def send_data(self, data, coalesce_key: Optional[str] = None) -> bool:
+        return self.send(OutboundMessage(data, coalesce_key))
+
+    def touch(self):
+        """Record a message from the client"""
+        self.last_received = time.monotonic()
+
+    def resume(self, replay: List[OutboundMessage]):
+        """
+        Queue replayed messages ahead of the live ones received meanwhile and
+        start writing (the connection must not have been started yet)
+        """
+        replayed = {message.seq for message in replay if message.seq is not None}
+        live = [
+            message
+            for message in self._queue
+            if message.seq is None or message.seq not in replayed
+        ]
+        self._queue = deque(replay + live)
+        if self._queue:
+            self._ready.set()
+        self.start()
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    message = self._queue.popleft()
+                    frame = message.frame(self.codec, self.resumable)
+                    if isinstance(frame, bytes):
+                        await self.websocket.send_bytes(frame)
+                    else:
+                        await self.websocket.send_text(frame)
+                    self.sent += 1
+                    self.last_lag = time.monotonic() - message.created_at
+                    self.max_lag = max(self.max_lag, self.last_lag)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # The receive loop sees the disconnect and runs the cleanup
+            logger.warning(f"Failed to send message to user {self.user_id}: {e}")
+            self.closed = True
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def stop(self):
+        """Stop the writer (the socket is already closed or being closed)"""
+        self.closed = True
+        if self._writer:
+            self._writer.cancel()
+
+    def get_stats(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "duel_id": self.duel_id,
+            "overflow_policy": self.overflow_policy.value,
+            "codec": self.codec.value,
+            "idle_s": round(time.monotonic() - self.last_received, 1),
+            "queue_depth": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+        }
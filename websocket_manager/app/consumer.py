@@ -0,0 +1,160 @@
+"""
+RabbitMQ consumption of ``websocket.events``
+
+Messages are consumed with manual acks and handled by a fixed pool of
+workers. Each worker owns a queue and every message goes to the worker
+picked by hashing its duel (or user) id, so events of the same duel are
+delivered in the order they were published while different duels progress
+in parallel. A message is acked once it was delivered; the number of
+messages in flight is bounded by the channel prefetch.
+
+A failed delivery is retried inside its worker, with backoff, before the
+worker moves on to the next message of that key: requeueing through the
+broker would put it behind later events of the same duel. After
+``WS_CONSUMER_RETRIES`` attempts the message is rejected without requeue
+and dead-lettered (``websocket.dlx`` policy in broker_service).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import zlib
+from typing import Awaitable, Callable, List, Optional
+
+import aio_pika
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_PREFETCH = int(os.getenv("WS_CONSUMER_PREFETCH", "100"))
+CONSUMER_WORKERS = int(os.getenv("WS_CONSUMER_WORKERS", "8"))
+CONSUMER_RETRIES = int(os.getenv("WS_CONSUMER_RETRIES", "3"))
+CONSUMER_RETRY_DELAY = float(os.getenv("WS_CONSUMER_RETRY_DELAY", "0.1"))
+
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+
+
+class EventConsumer:
+    """Acked consumer with a bounded pool of ordered-per-duel workers"""
+
+    def __init__(self, handler: MessageHandler, workers: int = CONSUMER_WORKERS):
+        self.handler = handler
+        self._queues: List[asyncio.Queue] = [asyncio.Queue() for _ in range(workers)]
+        self._tasks: List[asyncio.Task] = []
+        self._consumer_tag: Optional[str] = None
+        self._queue: Optional[aio_pika.abc.AbstractQueue] = None
+
+        # Metrics
+        self.received = 0
+        self.acked = 0
+        self.rejected = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        self.total_latency = 0.0
+
+    async def start(self, queue: aio_pika.abc.AbstractQueue):
+        self._queue = queue
+        self._tasks = [
+            asyncio.create_task(self._work(worker_queue))
+            for worker_queue in self._queues
+        ]
+        self._consumer_tag = await queue.consume(self.on_message)
+
+    async def stop(self):
+        """Stop consuming; unacked messages are redelivered by the broker"""
+        if self._queue and self._consumer_tag:
+            try:
+                await self._queue.cancel(self._consumer_tag)
+            except Exception as e:
+                logger.error(f"Failed to cancel RabbitMQ consumer: {e}")
+        for task in self._tasks:
+            task.cancel()
+
+    @staticmethod
+    def ordering_key(routing_key: str, data: dict) -> str:
+        return str(
+            data.get("duelId")
+            or data.get("userId")
+            or data.get("userID")
+            or routing_key
+        )
+
+    async def on_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        # aio-pika starts one task per delivery in arrival order: the message
+        # must reach its worker queue before the first await to keep that order
+        self.received += 1
+        try:
+            data = json.loads(message.body)
+        except ValueError as e:
+            logger.error(f"Discarding malformed message {message.routing_key}: {e}")
+            self.rejected += 1
+            await message.reject()
+            return
+
+        key = self.ordering_key(message.routing_key, data)
+        worker = zlib.crc32(key.encode()) % len(self._queues)
+        self._queues[worker].put_nowait((message, data, time.monotonic()))
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            message, data, received_at = await queue.get()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"Received RabbitMQ message: {message.routing_key} -> {data}"
+                )
+            if await self._handle(message, data):
+                await self._settle(message.ack())
+                self.acked += 1
+                self.total_latency += time.monotonic() - received_at
+            else:
+                # Dead-lettered: later events of the duel must not wait for it
+                await self._settle(message.reject(requeue=False))
+                self.dead_lettered += 1
+
+    async def _handle(
+        self, message: aio_pika.abc.AbstractIncomingMessage, data: dict
+    ) -> bool:
+        """Deliver a message, retrying with backoff; False once retries run out"""
+        for attempt in range(CONSUMER_RETRIES + 1):
+            try:
+                await self.handler(message.routing_key, data)
+                return True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt == CONSUMER_RETRIES:
+                    logger.error(
+                        f"Dead-lettering websocket message {message.routing_key} "
+                        f"after {attempt + 1} attempts: {e}"
+                    )
+                    return False
+                self.retries += 1
+                logger.warning(
+                    f"Error handling websocket message {message.routing_key} "
+                    f"(attempt {attempt + 1}): {e}"
+                )
+                await asyncio.sleep(CONSUMER_RETRY_DELAY * 2**attempt)
+        return False
+
+    @staticmethod
+    async def _settle(settlement: Awaitable[None]):
+        try:
+            await settlement
+        except Exception as e:
+            logger.error(f"Failed to settle RabbitMQ message: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": len(self._queues),
+            "prefetch": CONSUMER_PREFETCH,
+            "received": self.received,
+            "acked": self.acked,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "dead_lettered": self.dead_lettered,
+            "queued": sum(queue.qsize() for queue in self._queues),
+            "avg_handling_ms": (
+                round(self.total_latency / self.acked * 1000, 2) if self.acked else 0
+            ),
+        }
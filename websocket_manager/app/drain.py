@@ -0,0 +1,116 @@
+"""
+Graceful drain of a WebSocket Manager node
+
+uvicorn closes every socket as soon as it receives SIGTERM, so a deploy
+first calls ``POST /drain`` and waits for ``GET /drain`` to report
+``finished`` before stopping the container. While draining the node:
+
+- rejects new sockets (1013), so the proxy's retries land on other nodes
+- tells each notification socket ``{"type": "reconnect", "afterMs": n}``
+  with a random delay up to ``WS_DRAIN_RECONNECT_JITTER`` and closes it
+  (1012) once the delay is over, spreading the reconnects over time
+- keeps serving duel sockets: each one is handed off the same way when its
+  duel ends, or when ``WS_DRAIN_TIMEOUT`` expires. Clients resume on the
+  new node with the duel replay buffer (``resume_from``)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Callable, Iterable, Optional, Set
+
+from app.connection import Connection
+
+logger = logging.getLogger(__name__)
+
+DRAIN_TIMEOUT = float(os.getenv("WS_DRAIN_TIMEOUT", "300"))
+DRAIN_RECONNECT_JITTER = float(os.getenv("WS_DRAIN_RECONNECT_JITTER", "10"))
+# Lets the reconnect message (and anything queued before it) reach the client
+DRAIN_CLOSE_GRACE = 1.0
+
+DRAIN_CLOSE_CODE = 1012  # Service restart
+DRAIN_REJECT_CLOSE_CODE = 1013  # Try again later
+
+
+class Drainer:
+    """Hands the sockets of this node off to the rest of the cluster"""
+
+    def __init__(
+        self,
+        notification_connections: Callable[[], Iterable[Connection]],
+        duel_connections: Callable[[], Iterable[Connection]],
+    ):
+        self.notification_connections = notification_connections
+        self.duel_connections = duel_connections
+        self.draining = False
+        self.finished = False
+        self.started_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.handed_off = 0
+        self._closing: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, timeout: float = DRAIN_TIMEOUT):
+        if self.draining:
+            return
+        self.draining = True
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + timeout
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Draining node (duel deadline in {timeout:.0f}s)")
+
+    async def _run(self):
+        for connection in list(self.notification_connections()):
+            self.hand_off(connection)
+
+        # Duels finish on their own (hand_off on results) until the deadline
+        while any(True for _ in self.duel_connections()):
+            if time.monotonic() >= self.deadline:
+                remaining = list(self.duel_connections())
+                logger.info(f"Drain deadline reached, handing off {len(remaining)}")
+                for connection in remaining:
+                    self.hand_off(connection)
+                break
+            await asyncio.sleep(1)
+
+        # Sockets accepted before the drain started may still be open
+        for connection in list(self.notification_connections()):
+            self.hand_off(connection)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+        self.finished = True
+        logger.info(f"Drain finished: {self.handed_off} sockets handed off")
+
+    def hand_off(self, connection: Connection):
+        """Ask the client to reconnect after a jittered delay, then close"""
+        if connection.closed or connection.handing_off:
+            return
+        connection.handing_off = True
+        delay = random.uniform(0, DRAIN_RECONNECT_JITTER)
+        connection.send_data(
+            {"type": "reconnect", "afterMs": int(delay * 1000), "reason": "draining"}
+        )
+        task = asyncio.create_task(self._close_later(connection, delay))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+        self.handed_off += 1
+
+    async def _close_later(self, connection: Connection, delay: float):
+        await asyncio.sleep(delay + DRAIN_CLOSE_GRACE)
+        await connection.close(DRAIN_CLOSE_CODE, "Server draining")
+
+    def get_stats(self) -> dict:
+        return {
+            "draining": self.draining,
+            "finished": self.finished,
+            "handed_off": self.handed_off,
+            "closing": len(self._closing),
+            "remaining_duel_sockets": sum(1 for _ in self.duel_connections()),
+            "deadline_in_s": (
+                max(0, round(self.deadline - time.monotonic(), 1))
+                if self.deadline
+                else None
+            ),
+        }
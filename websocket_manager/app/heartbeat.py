@@ -0,0 +1,104 @@
+"""
+Server-side heartbeat and connection limits of the WebSocket Manager
+
+Liveness is checked at two levels:
+
+- Transport: uvicorn sends WebSocket ping frames every ``WS_PING_INTERVAL``
+  and closes sockets that do not answer within ``WS_PING_TIMEOUT`` (flags of
+  the Dockerfile CMD and of the ``cc_websocket_manager`` command in
+  docker-compose.yml, which overrides it). Every client answers them
+  automatically, so half-open TCP connections end in a disconnect and the
+  endpoint runs the usual cleanup
+- Application: clients that negotiated a subprotocol (``app.codec``) must
+  answer ``{"type": "ping"}`` with any message. A connection that received
+  nothing for ``WS_HEARTBEAT_INTERVAL`` gets a ping; after
+  ``WS_HEARTBEAT_MISSES`` missed intervals it is closed and reaped
+
+The monitor also reaps connections whose writer already failed, so their
+presence and duel entries do not wait for the next broadcast.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Iterable, Optional
+
+from app.connection import Connection
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+HEARTBEAT_MISSES = int(os.getenv("WS_HEARTBEAT_MISSES", "3"))
+MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "20000"))
+MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "5"))
+
+# Close codes
+HEARTBEAT_TIMEOUT_CLOSE_CODE = 1001  # Going away
+SERVER_FULL_CLOSE_CODE = 1013  # Try again later
+USER_LIMIT_CLOSE_CODE = 1008  # Policy violation
+
+HEARTBEAT_PING = {"type": "ping"}
+
+
+class HeartbeatMonitor:
+    """Periodically pings idle connections and reaps dead ones"""
+
+    def __init__(
+        self,
+        connections: Iterable[Connection],
+        reap: Callable[[Connection], Awaitable[None]],
+    ):
+        self.connections = connections
+        self.reap = reap
+        self._task: Optional[asyncio.Task] = None
+        self.pings = 0
+        self.timeouts = 0
+        self.reaped = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Heartbeat check failed: {e}")
+
+    async def check(self):
+        now = time.monotonic()
+        for connection in list(self.connections):
+            if not connection.closed and connection.heartbeat:
+                missed = int((now - connection.last_received) // HEARTBEAT_INTERVAL)
+                if missed > HEARTBEAT_MISSES:
+                    logger.info(
+                        f"Closing connection of user {connection.user_id}: "
+                        f"{missed} heartbeats missed"
+                    )
+                    self.timeouts += 1
+                    await connection.close(
+                        HEARTBEAT_TIMEOUT_CLOSE_CODE, "Heartbeat timeout"
+                    )
+                elif missed:
+                    connection.send_data(HEARTBEAT_PING)
+                    self.pings += 1
+            if connection.closed:
+                await self.reap(connection)
+                self.reaped += 1
+
+    def get_stats(self) -> dict:
+        return {
+            "interval": HEARTBEAT_INTERVAL,
+            "max_missed": HEARTBEAT_MISSES,
+            "pings": self.pings,
+            "timeouts": self.timeouts,
+            "reaped": self.reaped,
+        }
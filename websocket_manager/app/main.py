@@ -10,14 +10,35 @@ import json
 import logging
 import os
 import time
-from typing import Dict, Set, Optional
+from typing import Dict, Iterator, List, Set, Optional
 
 import aio_pika
 import httpx
 import redis.asyncio as redis
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.cluster import ClusterRegistry
+from app.codec import negotiate, receive_message
+from app.connection import (
+    DUEL_OVERFLOW_POLICY,
+    NOTIFICATION_OVERFLOW_POLICY,
+    Connection,
+    OutboundMessage,
+)
+from app.consumer import CONSUMER_PREFETCH, EventConsumer
+from app.drain import DRAIN_REJECT_CLOSE_CODE, Drainer
+from app.heartbeat import (
+    MAX_CONNECTIONS,
+    MAX_CONNECTIONS_PER_USER,
+    SERVER_FULL_CLOSE_CODE,
+    USER_LIMIT_CLOSE_CODE,
+    HeartbeatMonitor,
+)
+from app.presence import PresenceTracker
+from app.publisher import RabbitPublisher
+from app.replay import REPLAYED_EVENTS, DuelReplayBuffer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +52,14 @@ AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://cc_auth_ms:8000")
 DUEL_SERVICE_URL = os.getenv("DUEL_SERVICE_URL", "http://cc_duels_ms:8002")
 REDIS_URL = os.getenv("REDIS_URL", "redis://:courseclash123@cc_redis_cache:6379/0")
 
+MAX_PRESENCE_LOOKUP = 1000
+
+# Outbound message type of the JSON duel events
+DUEL_MESSAGE_TYPES = {
+    "duel.websocket.question": "question",
+    "duel.websocket.results": "duel_end",
+}
+
 app = FastAPI(
     title="CourseClash WebSocket Manager",
     description="WebSocket service for real-time communication in CourseClash",
@@ -56,24 +85,45 @@ class WebSocketManager:
     """Manages WebSocket connections, RabbitMQ integration, and Redis caching"""
 
     def __init__(self):
-        self.user_connections: Dict[str, Set[WebSocket]] = {}
-        self.duel_connections: Dict[str, Dict[str, WebSocket]] = (
+        self.user_connections: Dict[str, Set[Connection]] = {}
+        self.duel_connections: Dict[str, Dict[str, Connection]] = (
             {}
-        )  # duel_id -> {user_id: websocket}
+        )  # duel_id -> {user_id: connection}
+        # Every open socket of this node, and how many each user holds
+        self.connections: Set[Connection] = set()
+        self.sockets_per_user: Dict[str, int] = {}
+        self.heartbeat: Optional[HeartbeatMonitor] = None
+        self.drainer = Drainer(self.notification_sockets, self.duel_sockets)
         self.rabbitmq_connection: Optional[aio_pika.Connection] = None
         self.rabbitmq_channel: Optional[aio_pika.Channel] = None
+        self.publisher: Optional[RabbitPublisher] = None
+        self.consumer: Optional[EventConsumer] = None
         self.redis_client: Optional[redis.Redis] = None
+        self.cluster: Optional[ClusterRegistry] = None
+        self.presence: Optional[PresenceTracker] = None
+        self.replay: Optional[DuelReplayBuffer] = None
+        # routing key -> handler(data, remote_nodes) for websocket.events
+        self.local_handlers = {
+            "duel.websocket.question": self.send_question_to_duel,
+            "duel.websocket.status": self.send_status_to_duel,
+            "duel.websocket.results": self.send_results_to_duel,
+            "duel.websocket.notification": self.send_notification_to_user,
+        }
 
     async def connect_rabbitmq(self):
         """Initialize RabbitMQ connection"""
         try:
             self.rabbitmq_connection = await aio_pika.connect_robust(RABBITMQ_URL)
             self.rabbitmq_channel = await self.rabbitmq_connection.channel()
-            await self.rabbitmq_channel.set_qos(prefetch_count=10)
+            await self.rabbitmq_channel.set_qos(prefetch_count=CONSUMER_PREFETCH)
 
             # Setup consumers
             await self.setup_consumers()
 
+            # Publishes use their own channel with confirms
+            self.publisher = RabbitPublisher(self.rabbitmq_connection)
+            await self.publisher.start(["duels.topic"])
+
             logger.info("RabbitMQ connection established successfully")
         except Exception as e:
             logger.error(f"Failed to connect to RabbitMQ: {e}")
@@ -85,26 +135,99 @@ class WebSocketManager:
             self.redis_client = redis.from_url(REDIS_URL, decode_responses=True)
             # Test connection
             await self.redis_client.ping()
+            self.replay = DuelReplayBuffer(self.redis_client)
             logger.info("Redis connection established successfully")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
 
+    async def start_cluster(self):
+        """Join the cluster registry (requires Redis)"""
+        self.cluster = ClusterRegistry(self.redis_client, self.deliver_locally)
+        await self.cluster.start()
+
+    async def _cluster_update(self, operation: str, entity_id: str):
+        """Run a registry operation without failing the WebSocket on Redis errors"""
+        if not self.cluster:
+            return
+        try:
+            await getattr(self.cluster, operation)(entity_id)
+        except Exception as e:
+            logger.error(f"Cluster {operation} failed for {entity_id}: {e}")
+
+    async def start_presence(self):
+        """Start the batched presence writer (requires Redis)"""
+        self.presence = PresenceTracker(self.redis_client)
+        await self.presence.start()
+
+    async def start_heartbeat(self):
+        """Start pinging idle connections and reaping dead ones"""
+        self.heartbeat = HeartbeatMonitor(self.connections, self.reap_connection)
+        await self.heartbeat.start()
+
+    async def reap_connection(self, connection: Connection):
+        await self.disconnect_user(connection, connection.user_id, connection.duel_id)
+
+    def notification_sockets(self) -> Iterator[Connection]:
+        for connections in self.user_connections.values():
+            yield from connections
+
+    def duel_sockets(self) -> Iterator[Connection]:
+        for connections in self.duel_connections.values():
+            yield from connections.values()
+
+    async def admit_connection(self, websocket: WebSocket, user_id: str) -> bool:
+        """Enforce drain mode and the socket limits before accepting"""
+        if self.drainer.draining:
+            await websocket.close(
+                code=DRAIN_REJECT_CLOSE_CODE, reason="Server draining"
+            )
+            return False
+        if len(self.connections) >= MAX_CONNECTIONS:
+            logger.warning(f"Rejecting user {user_id}: {MAX_CONNECTIONS} sockets open")
+            await websocket.close(
+                code=SERVER_FULL_CLOSE_CODE, reason="Server at capacity"
+            )
+            return False
+        if self.sockets_per_user.get(user_id, 0) >= MAX_CONNECTIONS_PER_USER:
+            logger.warning(f"Rejecting user {user_id}: too many sockets")
+            await websocket.close(
+                code=USER_LIMIT_CLOSE_CODE, reason="Too many connections"
+            )
+            return False
+        return True
+
+    def _track(self, connection: Connection):
+        self.connections.add(connection)
+        user_id = connection.user_id
+        self.sockets_per_user[user_id] = self.sockets_per_user.get(user_id, 0) + 1
+
+    def _untrack(self, connection: Connection):
+        if connection not in self.connections:
+            return
+        self.connections.discard(connection)
+        user_id = connection.user_id
+        self.sockets_per_user[user_id] -= 1
+        if not self.sockets_per_user[user_id]:
+            del self.sockets_per_user[user_id]
+
+    def has_local_connections(self, user_id: str) -> bool:
+        return user_id in self.user_connections or any(
+            user_id in participants for participants in self.duel_connections.values()
+        )
+
     async def cache_user_session(
         self, user_id: str, session_data: dict, ttl: int = 3600
     ):
-        """Cache user session data in Redis"""
-        if self.redis_client:
-            try:
-                await self.redis_client.setex(
-                    f"user_session:{user_id}", ttl, json.dumps(session_data)
-                )
-                logger.debug(f"Cached session for user {user_id}")
-            except Exception as e:
-                logger.error(f"Failed to cache user session: {e}")
+        """Cache user session data in Redis (written in the next presence batch)"""
+        if self.presence:
+            self.presence.cache_session(user_id, session_data, ttl)
+            logger.debug(f"Cached session for user {user_id}")
 
     async def get_cached_user_session(self, user_id: str) -> Optional[dict]:
         """Get cached user session from Redis"""
+        if self.presence and self.presence.pending_session(user_id):
+            return self.presence.pending_session(user_id)
         if self.redis_client:
             try:
                 session_data = await self.redis_client.get(f"user_session:{user_id}")
@@ -115,18 +238,15 @@ class WebSocketManager:
         return None
 
     async def cache_duel_state(self, duel_id: str, state_data: dict, ttl: int = 1800):
-        """Cache duel state in Redis"""
-        if self.redis_client:
-            try:
-                await self.redis_client.setex(
-                    f"duel_state:{duel_id}", ttl, json.dumps(state_data)
-                )
-                logger.debug(f"Cached state for duel {duel_id}")
-            except Exception as e:
-                logger.error(f"Failed to cache duel state: {e}")
+        """Cache duel state in Redis (written in the next presence batch)"""
+        if self.presence:
+            self.presence.cache_duel_state(duel_id, state_data, ttl)
+            logger.debug(f"Cached state for duel {duel_id}")
 
     async def get_cached_duel_state(self, duel_id: str) -> Optional[dict]:
         """Get cached duel state from Redis"""
+        if self.presence and self.presence.pending_duel_state(duel_id):
+            return self.presence.pending_duel_state(duel_id)
         if self.redis_client:
             try:
                 state_data = await self.redis_client.get(f"duel_state:{duel_id}")
@@ -137,15 +257,13 @@ class WebSocketManager:
         return None
 
     async def track_user_presence(self, user_id: str, status: str = "online"):
-        """Track user presence in Redis"""
-        if self.redis_client:
-            try:
-                await self.redis_client.setex(
-                    f"user_presence:{user_id}", 300, status
-                )  # 5 min TTL
-                logger.debug(f"Updated presence for user {user_id}: {status}")
-            except Exception as e:
-                logger.error(f"Failed to track user presence: {e}")
+        """Track user presence in Redis (written in the next presence batch)"""
+        if self.presence:
+            if status == "offline":
+                self.presence.offline(user_id)
+            else:
+                self.presence.online(user_id, status)
+            logger.debug(f"Updated presence for user {user_id}: {status}")
 
     async def setup_consumers(self):
         """Setup RabbitMQ consumers for WebSocket events"""
@@ -165,64 +283,122 @@ class WebSocketManager:
 
         # Bind to receive duel events that should go to WebSocket
         await websocket_queue.bind(duels_exchange, "duel.websocket.*")
-        await websocket_queue.consume(self.handle_websocket_message, no_ack=True)
+        self.consumer = EventConsumer(self.handle_websocket_message)
+        await self.consumer.start(websocket_queue)
 
         logger.info("RabbitMQ consumers setup completed")
 
-    async def handle_websocket_message(
-        self, message: aio_pika.abc.AbstractIncomingMessage
-    ):
-        """Handle messages from RabbitMQ that should be sent to WebSocket clients"""
-        try:
-            data = json.loads(message.body.decode())
-            routing_key = message.routing_key
+    async def handle_websocket_message(self, routing_key: str, data: dict):
+        """Handle messages from RabbitMQ that should be sent to WebSocket clients
 
-            logger.info(f"Received RabbitMQ message: {routing_key} -> {data}")
+        Errors propagate so the consumer can nack the message.
+        """
+        await self.record_duel_event(routing_key, data)
+        remote_nodes = await self.forward_to_cluster(routing_key, data)
+        await self.deliver_locally(routing_key, data, remote_nodes)
 
-            if routing_key == "duel.websocket.question":
-                await self.send_question_to_duel(data)
-            elif routing_key == "duel.websocket.status":
-                await self.send_status_to_duel(data)
-            elif routing_key == "duel.websocket.results":
-                await self.send_results_to_duel(data)
-            elif routing_key == "duel.websocket.notification":
-                await self.send_notification_to_user(data)
+    async def record_duel_event(self, routing_key: str, data: dict):
+        """Append a duel event to its replay buffer and tag it with its sequence"""
+        duel_id = data.get("duelId")
+        if not (self.replay and duel_id and routing_key in REPLAYED_EVENTS):
+            return
+        try:
+            data["seq"] = await self.replay.append(duel_id, routing_key, data)
+        except Exception as e:
+            logger.error(f"Failed to record {routing_key} for duel {duel_id}: {e}")
 
+    async def forward_to_cluster(self, routing_key: str, data: dict) -> int:
+        """Forward the message to the other nodes holding its target socket"""
+        if not self.cluster:
+            return 0
+        try:
+            if routing_key == "duel.websocket.notification":
+                user_id = self.notification_user_id(data)
+                nodes = await self.cluster.nodes_for_user(user_id) if user_id else set()
+            else:
+                duel_id = data.get("duelId")
+                nodes = await self.cluster.nodes_for_duel(duel_id) if duel_id else set()
+            return await self.cluster.forward(nodes, routing_key, data)
         except Exception as e:
-            logger.error(f"Error handling websocket message: {e}")
+            logger.error(f"Failed to forward {routing_key} to cluster: {e}")
+            return 0
 
-    async def send_question_to_duel(self, data: dict):
+    async def deliver_locally(
+        self, routing_key: str, data: dict, remote_nodes: int = 0
+    ):
+        """Deliver a message to the sockets held by this node"""
+        handler = self.local_handlers.get(routing_key)
+        if handler is None:
+            logger.warning(f"No handler for routing key {routing_key}")
+            return
+        await handler(data, remote_nodes)
+
+    @staticmethod
+    def duel_message(routing_key: str, data: dict) -> OutboundMessage:
+        """Outbound form of a duel event, tagged with its sequence number"""
+        seq = data.get("seq")
+        if routing_key == "duel.websocket.status":
+            # Send text message (compatible with existing frontend; resumable
+            # clients get it as JSON with the seq); a newer status replaces a
+            # pending one for slow clients
+            message_text = data.get("message", "")
+            return OutboundMessage(
+                str(message_text),
+                "status",
+                seq,
+                {
+                    "type": "status",
+                    "status": data.get("status"),
+                    "message": message_text,
+                    "seq": seq,
+                },
+            )
+
+        message = {
+            "type": DUEL_MESSAGE_TYPES[routing_key],
+            "data": data.get("data"),  # Changed from "question"/"results" to "data"
+        }
+        if seq is not None:
+            message["seq"] = seq
+        return OutboundMessage(message, seq=seq)
+
+    async def send_question_to_duel(self, data: dict, remote_nodes: int = 0):
         """Send question to duel participants"""
         duel_id = data.get("duelId")
-        question_data = data.get("data")  # Changed from "question" to "data"
 
         if duel_id in self.duel_connections:
-            message = {"type": "question", "data": question_data}
+            message = self.duel_message("duel.websocket.question", data)
             await self.broadcast_to_duel(duel_id, message)
 
-    async def send_status_to_duel(self, data: dict):
+    async def send_status_to_duel(self, data: dict, remote_nodes: int = 0):
         """Send status messages to duel participants"""
         duel_id = data.get("duelId")
-        status = data.get("status")
-        message_text = data.get("message", "")
 
         if duel_id in self.duel_connections:
-            # Send text message (compatible with existing frontend)
-            await self.broadcast_to_duel(duel_id, message_text, is_text=True)
+            message = self.duel_message("duel.websocket.status", data)
+            await self.broadcast_to_duel(duel_id, message)
 
-    async def send_results_to_duel(self, data: dict):
+    async def send_results_to_duel(self, data: dict, remote_nodes: int = 0):
         """Send duel results to participants"""
         duel_id = data.get("duelId")
-        results = data.get("data")  # Changed from "results" to "data"
 
         if duel_id in self.duel_connections:
-            message = {"type": "duel_end", "data": results}
+            message = self.duel_message("duel.websocket.results", data)
             await self.broadcast_to_duel(duel_id, message)
 
-    async def send_notification_to_user(self, data: dict):
-        """Send notification to a specific user"""
+            # The duel is over: its sockets can move to another node now
+            if self.drainer.draining:
+                for connection in list(self.duel_connections[duel_id].values()):
+                    self.drainer.hand_off(connection)
+
+    @staticmethod
+    def notification_user_id(data: dict) -> Optional[str]:
         # Handle both direct and RabbitMQ event formats
-        user_id = data.get("userId") or data.get("userID")  # RabbitMQ events use userID
+        return data.get("userId") or data.get("userID")  # RabbitMQ events use userID
+
+    async def send_notification_to_user(self, data: dict, remote_nodes: int = 0):
+        """Send notification to a specific user"""
+        user_id = self.notification_user_id(data)
         notification_data = data.get("notification") or data.get("data", {}).get(
             "notification"
         )
@@ -230,16 +406,35 @@ class WebSocketManager:
         if user_id and user_id in self.user_connections:
             await self.send_to_user(user_id, notification_data)
             logger.info(f"Notification sent to user {user_id}")
+        elif remote_nodes:
+            logger.debug(f"User {user_id} is connected to another node")
         else:
             logger.warning(f"User {user_id} not connected for notification: {data}")
 
-    async def connect_user_notification(self, websocket: WebSocket, user_id: str):
+    async def connect_user_notification(
+        self, websocket: WebSocket, user_id: str
+    ) -> Optional[Connection]:
         """Connect user to notification channel"""
-        await websocket.accept()
+        if not await self.admit_connection(websocket, user_id):
+            return None
+
+        codec, subprotocol = negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+
+        connection = Connection(
+            websocket,
+            user_id,
+            NOTIFICATION_OVERFLOW_POLICY,
+            codec=codec,
+            heartbeat=subprotocol is not None,
+        )
+        connection.start()
+        self._track(connection)
 
         if user_id not in self.user_connections:
             self.user_connections[user_id] = set()
-        self.user_connections[user_id].add(websocket)
+            await self._cluster_update("register_user", user_id)
+        self.user_connections[user_id].add(connection)
 
         # Track user presence in Redis
         await self.track_user_presence(user_id, "online")
@@ -259,21 +454,56 @@ class WebSocketManager:
             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         }
 
-        await websocket.send_json(welcome_msg)
+        connection.send_data(welcome_msg)
         logger.info(f"User {user_id} connected to notifications")
-
-    async def connect_user_duel(self, websocket: WebSocket, duel_id: str, user_id: str):
-        """Connect user to a duel"""
+        return connection
+
+    async def connect_user_duel(
+        self,
+        websocket: WebSocket,
+        duel_id: str,
+        user_id: str,
+        resume_from: Optional[int] = None,
+    ) -> Optional[Connection]:
+        """
+        Connect user to a duel
+
+        ``resume_from`` is the last sequence the client saw (0 on its first
+        connect); passing it makes the connection resumable and replays the
+        events missed since then.
+        """
         # Validate duel access
         if not await self.validate_duel_access(duel_id, user_id):
             await websocket.close(code=4003, reason="Unauthorized access to duel")
-            return False
-
-        await websocket.accept()
+            return None
+
+        if not await self.admit_connection(websocket, user_id):
+            return None
+
+        codec, subprotocol = negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+
+        connection = Connection(
+            websocket,
+            user_id,
+            DUEL_OVERFLOW_POLICY,
+            duel_id=duel_id,
+            resumable=resume_from is not None,
+            codec=codec,
+            heartbeat=subprotocol is not None,
+        )
+        if not resume_from:
+            connection.start()
+        self._track(connection)
 
         if duel_id not in self.duel_connections:
             self.duel_connections[duel_id] = {}
-        self.duel_connections[duel_id][user_id] = websocket
+            await self._cluster_update("register_duel", duel_id)
+        self.duel_connections[duel_id][user_id] = connection
+
+        # Live events queue up meanwhile and are sent after the replay
+        if resume_from:
+            await self.replay_duel_events(connection, duel_id, resume_from)
 
         # Track user presence and cache duel state
         await self.track_user_presence(user_id, f"in_duel:{duel_id}")
@@ -293,9 +523,43 @@ class WebSocketManager:
             "duels.topic",
             "duel.player.connected",
             {"duelId": duel_id, "userId": user_id, "timestamp": time.time()},
+            persistent=False,
         )
 
-        return True
+        return connection
+
+    async def replay_duel_events(
+        self, connection: Connection, duel_id: str, last_seq: int
+    ):
+        """Send a reconnecting client the duel events after ``last_seq``"""
+        events = None
+        if self.replay:
+            try:
+                events = await self.replay.read_after(duel_id, last_seq)
+            except Exception as e:
+                logger.error(f"Failed to read replay buffer of duel {duel_id}: {e}")
+
+        if events is None:
+            # Too far behind: the client has to refetch the duel state
+            connection.resume(
+                [OutboundMessage({"type": "resync_required", "lastSeq": last_seq})]
+            )
+            logger.info(f"User {connection.user_id} must resync duel {duel_id}")
+            return
+
+        replay = [
+            OutboundMessage(
+                {"type": "resumed", "lastSeq": last_seq, "replayed": len(events)}
+            )
+        ]
+        replay += [
+            self.duel_message(routing_key, {**data, "seq": seq})
+            for seq, routing_key, data in events
+        ]
+        connection.resume(replay)
+        logger.info(
+            f"Replayed {len(events)} events of duel {duel_id} to user {connection.user_id}"
+        )
 
     async def validate_duel_access(self, duel_id: str, user_id: str) -> bool:
         """Validate if user can access the duel"""
@@ -315,18 +579,22 @@ class WebSocketManager:
             return True
 
     async def disconnect_user(
-        self, websocket: WebSocket, user_id: str, duel_id: str = None
+        self, connection: Connection, user_id: str, duel_id: str = None
     ):
-        """Disconnect user from WebSocket"""
+        """Disconnect user from WebSocket (safe to call more than once)"""
+        await connection.stop()
+        self._untrack(connection)
+
         # Remove from user connections
         if user_id in self.user_connections:
-            self.user_connections[user_id].discard(websocket)
+            self.user_connections[user_id].discard(connection)
             if not self.user_connections[user_id]:
                 del self.user_connections[user_id]
+                await self._cluster_update("unregister_user", user_id)
 
-        # Remove from duel connections
+        # Remove from duel connections (unless the user already reconnected)
         if duel_id and duel_id in self.duel_connections:
-            if user_id in self.duel_connections[duel_id]:
+            if self.duel_connections[duel_id].get(user_id) is connection:
                 del self.duel_connections[duel_id][user_id]
 
                 # Notify duel service about disconnection
@@ -334,53 +602,43 @@ class WebSocketManager:
                     "duels.topic",
                     "duel.player.disconnected",
                     {"duelId": duel_id, "userId": user_id, "timestamp": time.time()},
+                    persistent=False,
                 )
 
             if not self.duel_connections[duel_id]:
                 del self.duel_connections[duel_id]
+                await self._cluster_update("unregister_duel", duel_id)
+
+        if not self.has_local_connections(user_id):
+            await self.track_user_presence(user_id, "offline")
+        elif duel_id and user_id in self.user_connections:
+            await self.track_user_presence(user_id, "online")
 
         logger.info(f"User {user_id} disconnected")
 
     async def send_to_user(self, user_id: str, data):
-        """Send message to a specific user"""
+        """Send message to a specific user (encoded once for all their sockets)"""
         if user_id in self.user_connections:
-            dead_connections = set()
-
+            message = OutboundMessage(data)
             for connection in self.user_connections[user_id]:
-                try:
-                    if isinstance(data, str):
-                        await connection.send_text(data)
-                    else:
-                        await connection.send_json(data)
-                except Exception as e:
-                    logger.warning(f"Failed to send message to user {user_id}: {e}")
-                    dead_connections.add(connection)
-
-            # Clean up dead connections
-            for dead_conn in dead_connections:
-                self.user_connections[user_id].discard(dead_conn)
-
-    async def broadcast_to_duel(self, duel_id: str, data, is_text: bool = False):
-        """Broadcast message to all participants in a duel"""
+                connection.send(message)
+
+    async def broadcast_to_duel(
+        self, duel_id: str, data, is_text: bool = False, coalesce_key: str = None
+    ):
+        """
+        Broadcast message to all participants in a duel
+
+        The payload is encoded once and only enqueued: each connection's
+        writer task sends it, so a slow client does not delay the others.
+        """
         if duel_id in self.duel_connections:
-            dead_connections = []
-
-            for user_id, connection in self.duel_connections[duel_id].items():
-                try:
-                    if is_text:
-                        await connection.send_text(str(data))
-                    else:
-                        await connection.send_json(data)
-                except Exception as e:
-                    logger.warning(
-                        f"Failed to send message to user {user_id} in duel {duel_id}: {e}"
-                    )
-                    dead_connections.append(user_id)
-
-            # Clean up dead connections
-            for user_id in dead_connections:
-                if user_id in self.duel_connections[duel_id]:
-                    del self.duel_connections[duel_id][user_id]
+            if isinstance(data, OutboundMessage):
+                message = data
+            else:
+                message = OutboundMessage(str(data) if is_text else data, coalesce_key)
+            for connection in self.duel_connections[duel_id].values():
+                connection.send(message)
 
     async def handle_duel_message(self, duel_id: str, user_id: str, data: dict):
         """Handle messages from duel participants"""
@@ -410,36 +668,26 @@ class WebSocketManager:
             and user_id in self.duel_connections[duel_id]
         ):
 
-            connection = self.duel_connections[duel_id][user_id]
-            try:
-                if isinstance(data, str):
-                    await connection.send_text(data)
-                else:
-                    await connection.send_json(data)
-            except Exception as e:
-                logger.warning(
-                    f"Failed to send message to user {user_id} in duel {duel_id}: {e}"
-                )
+            self.duel_connections[duel_id][user_id].send_data(data)
 
-    async def publish_to_rabbitmq(self, exchange: str, routing_key: str, data: dict):
-        """Publish message to RabbitMQ"""
-        try:
-            if not self.rabbitmq_channel:
-                logger.error("RabbitMQ channel not available")
-                return
+    def get_connection_stats(self) -> List[dict]:
+        """Outbound queue metrics of every local connection, most lagged first"""
+        stats = [connection.get_stats() for connection in self.connections]
+        return sorted(stats, key=lambda item: item["last_lag_ms"], reverse=True)
 
-            message = aio_pika.Message(
-                json.dumps(data).encode(),
-                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-            )
+    async def publish_to_rabbitmq(
+        self, exchange: str, routing_key: str, data: dict, persistent: bool = True
+    ):
+        """Queue a message for RabbitMQ (confirmed in batches by the publisher)
 
-            exchange_obj = await self.rabbitmq_channel.get_exchange(exchange)
-            await exchange_obj.publish(message, routing_key)
+        Ephemeral events (player connected/disconnected) can skip persistence.
+        """
+        if not self.publisher:
+            logger.error("RabbitMQ publisher not available")
+            return
 
-            logger.info(f"Published to RabbitMQ: {exchange}/{routing_key}")
-
-        except Exception as e:
-            logger.error(f"Failed to publish to RabbitMQ: {e}")
+        if self.publisher.publish(exchange, routing_key, data, persistent):
+            logger.debug(f"Queued for RabbitMQ: {exchange}/{routing_key}")
 
 
 # Global WebSocket manager instance
@@ -449,16 +697,30 @@ manager = WebSocketManager()
 @app.on_event("startup")
 async def startup():
     """Initialize the WebSocket manager on startup"""
-    await manager.connect_rabbitmq()
+    # Redis and the cluster registry first: consumed messages may need forwarding
     await manager.connect_redis()
+    await manager.start_presence()
+    await manager.start_heartbeat()
+    await manager.start_cluster()
+    await manager.connect_rabbitmq()
     logger.info("WebSocket Manager service started successfully")
 
 
 @app.on_event("shutdown")
 async def shutdown():
     """Cleanup on shutdown"""
+    if manager.heartbeat:
+        await manager.heartbeat.stop()
+    if manager.consumer:
+        await manager.consumer.stop()
+    if manager.publisher:
+        await manager.publisher.stop()
     if manager.rabbitmq_connection:
         await manager.rabbitmq_connection.close()
+    if manager.cluster:
+        await manager.cluster.stop()
+    if manager.presence:
+        await manager.presence.stop()
     if manager.redis_client:
         await manager.redis_client.close()
     logger.info("WebSocket Manager service stopped")
@@ -467,42 +729,60 @@ async def shutdown():
 @app.websocket("/ws/notifications/{user_id}")
 async def websocket_notifications(websocket: WebSocket, user_id: str):
     """WebSocket endpoint for user notifications"""
-    await manager.connect_user_notification(websocket, user_id)
+    connection = await manager.connect_user_notification(websocket, user_id)
+    if not connection:
+        return
     logger.info(f"User {user_id} connected to notifications")
 
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket, connection.codec)
+            connection.touch()
 
             # Handle ping-pong for keepalive
             if data.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
+                connection.send_data({"type": "pong"})
 
     except WebSocketDisconnect:
-        await manager.disconnect_user(websocket, user_id)
+        await manager.disconnect_user(connection, user_id)
     except Exception as e:
         logger.error(f"Error in notifications websocket for user {user_id}: {e}")
-        await manager.disconnect_user(websocket, user_id)
+        await manager.disconnect_user(connection, user_id)
 
 
 @app.websocket("/ws/duels/{duel_id}/{user_id}")
-async def websocket_duel(websocket: WebSocket, duel_id: str, user_id: str):
-    """WebSocket endpoint for duel participation"""
-    if not await manager.connect_user_duel(websocket, duel_id, user_id):
+async def websocket_duel(
+    websocket: WebSocket,
+    duel_id: str,
+    user_id: str,
+    resume_from: Optional[int] = Query(None, ge=0),
+):
+    """
+    WebSocket endpoint for duel participation
+
+    Clients that track duel sequence numbers connect with ``?resume_from=0``
+    and reconnect with the last ``seq`` they received to get what they missed.
+    The wire format is negotiated with the subprotocol (see ``app.codec``).
+    """
+    connection = await manager.connect_user_duel(
+        websocket, duel_id, user_id, resume_from
+    )
+    if not connection:
         return
 
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket, connection.codec)
+            connection.touch()
             await manager.handle_duel_message(duel_id, user_id, data)
 
     except WebSocketDisconnect:
-        await manager.disconnect_user(websocket, user_id, duel_id)
+        await manager.disconnect_user(connection, user_id, duel_id)
     except Exception as e:
         logger.error(
             f"Error in duel websocket for user {user_id} in duel {duel_id}: {e}"
         )
-        await manager.disconnect_user(websocket, user_id, duel_id)
+        await manager.disconnect_user(connection, user_id, duel_id)
 
 
 @app.get("/")
@@ -523,10 +803,95 @@ async def health():
             redis_connected = False
 
     return {
-        "status": "healthy",
+        "status": "draining" if manager.drainer.draining else "healthy",
+        "sockets": len(manager.connections),
+        "max_sockets": MAX_CONNECTIONS,
+        "notification_sockets": sum(1 for _ in manager.notification_sockets()),
+        "duel_sockets": sum(1 for _ in manager.duel_sockets()),
         "user_connections": len(manager.user_connections),
         "duel_connections": len(manager.duel_connections),
         "rabbitmq_connected": manager.rabbitmq_connection is not None
         and not manager.rabbitmq_connection.is_closed,
         "redis_connected": redis_connected,
+        "cluster": manager.cluster.get_stats() if manager.cluster else None,
+        "presence": manager.presence.get_stats() if manager.presence else None,
+        "consumer": manager.consumer.get_stats() if manager.consumer else None,
+        "replay": manager.replay.get_stats() if manager.replay else None,
+        "heartbeat": manager.heartbeat.get_stats() if manager.heartbeat else None,
+    }
+
+
+class PresenceLookupRequest(BaseModel):
+    user_ids: List[str] = Field(..., max_length=MAX_PRESENCE_LOOKUP)
+
+
+@app.post("/presence/lookup")
+async def presence_lookup(request: PresenceLookupRequest):
+    """Presence of several users in a single Redis round trip"""
+    if not manager.presence:
+        raise HTTPException(status_code=503, detail="Presence not available")
+    return {"presence": await manager.presence.lookup(request.user_ids)}
+
+
+@app.get("/presence/online")
+async def presence_online(
+    offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)
+):
+    """Online users across all nodes, most recently seen first"""
+    if not manager.presence:
+        raise HTTPException(status_code=503, detail="Presence not available")
+    total, users = await manager.presence.online_users(offset, limit)
+    return {"total": total, "users": users}
+
+
+@app.get("/metrics/connections")
+async def connection_metrics(limit: int = 100):
+    """Per-connection outbound queue depth, drops and send lag"""
+    stats = manager.get_connection_stats()
+    return {
+        "connections": len(stats),
+        "queued": sum(item["queue_depth"] for item in stats),
+        "dropped": sum(item["dropped"] for item in stats),
+        "max_lag_ms": max((item["max_lag_ms"] for item in stats), default=0),
+        "most_lagged": stats[:limit],
+    }
+
+
+@app.get("/metrics/publisher")
+async def publisher_metrics():
+    """RabbitMQ publish throughput, batching and confirm latency"""
+    if not manager.publisher:
+        raise HTTPException(status_code=503, detail="RabbitMQ publisher not available")
+    return manager.publisher.get_stats()
+
+
+@app.post("/drain")
+async def start_drain(timeout: Optional[float] = Query(None, gt=0)):
+    """
+    Stop accepting sockets and hand the current ones off to other nodes
+
+    Call before stopping the container and wait until ``GET /drain`` reports
+    ``finished``; duels in progress get up to ``timeout`` seconds to end.
+    """
+    if timeout is None:
+        manager.drainer.start()
+    else:
+        manager.drainer.start(timeout)
+    return manager.drainer.get_stats()
+
+
+@app.get("/drain")
+async def drain_status():
+    """Progress of the drain started with ``POST /drain``"""
+    return manager.drainer.get_stats()
+
+
+@app.get("/cluster/nodes")
+async def cluster_nodes():
+    """Live WebSocket Manager nodes (heartbeat not expired)"""
+    if not manager.cluster:
+        raise HTTPException(status_code=503, detail="Cluster registry not available")
+    return {
+        "node_id": manager.cluster.node_id,
+        "nodes": sorted(await manager.cluster.list_nodes()),
     }
@@ -0,0 +1,226 @@
+"""
+Presence and session tracking for the WebSocket Manager
+
+Connects and disconnects only record the change in memory; a background
+task writes everything accumulated during a short tick in one pipelined
+round trip, so repeated updates of the same user/duel collapse into one
+command. Storage:
+
+- ``ws:presence`` sorted set: user_id -> last seen (epoch seconds). Users
+  seen within ``PRESENCE_TTL`` are online; counting and paging them is
+  O(log n) with ZCOUNT / ZREVRANGEBYSCORE
+- ``ws:presence:status`` hash: user_id -> status (``online``,
+  ``in_duel:<duel_id>``)
+- ``user_session:{user_id}`` / ``duel_state:{duel_id}`` JSON strings with TTL
+
+Every ``PRESENCE_REFRESH_INTERVAL`` the node bumps the last-seen score and
+the session TTL of all its live sockets in bulk and prunes entries nobody
+refreshed (e.g. users of a node that crashed).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_KEY = "ws:presence"
+PRESENCE_STATUS_KEY = "ws:presence:status"
+SESSION_KEY = "user_session:{}"
+DUEL_STATE_KEY = "duel_state:{}"
+
+PRESENCE_TTL = int(os.getenv("WS_PRESENCE_TTL", "300"))
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("WS_PRESENCE_FLUSH_INTERVAL", "0.5"))
+PRESENCE_REFRESH_INTERVAL = int(os.getenv("WS_PRESENCE_REFRESH_INTERVAL", "60"))
+SESSION_TTL = 3600
+DUEL_STATE_TTL = 1800
+
+# Marker for "remove from presence" in the pending status map
+OFFLINE = None
+
+
+class PresenceTracker:
+    """Batches presence, session and duel state writes into pipelined flushes"""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+        # Live sockets of this node: user_id -> status (refreshed in bulk)
+        self.live: Dict[str, str] = {}
+        self._pending_status: Dict[str, Optional[str]] = {}
+        self._pending_sessions: Dict[str, Tuple[str, int]] = {}
+        self._pending_duels: Dict[str, Tuple[str, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.commands = 0
+
+    # ------------------------------------------------------------------
+    # Recording (no I/O)
+    # ------------------------------------------------------------------
+
+    def online(self, user_id: str, status: str = "online"):
+        self.live[user_id] = status
+        self._pending_status[user_id] = status
+
+    def offline(self, user_id: str):
+        """Call when the user has no sockets left on this node"""
+        self.live.pop(user_id, None)
+        self._pending_status[user_id] = OFFLINE
+        self._pending_sessions.pop(user_id, None)
+
+    def cache_session(self, user_id: str, session_data: dict, ttl: int = SESSION_TTL):
+        self._pending_sessions[user_id] = (json.dumps(session_data), ttl)
+
+    def cache_duel_state(
+        self, duel_id: str, state_data: dict, ttl: int = DUEL_STATE_TTL
+    ):
+        self._pending_duels[duel_id] = (json.dumps(state_data), ttl)
+
+    def pending_session(self, user_id: str) -> Optional[dict]:
+        pending = self._pending_sessions.get(user_id)
+        return json.loads(pending[0]) if pending else None
+
+    def pending_duel_state(self, duel_id: str) -> Optional[dict]:
+        pending = self._pending_duels.get(duel_id)
+        return json.loads(pending[0]) if pending else None
+
+    # ------------------------------------------------------------------
+    # Background writes
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush what is pending and remove this node's users from presence"""
+        if self._task:
+            self._task.cancel()
+        for user_id in list(self.live):
+            self.offline(user_id)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush presence on shutdown: {e}")
+
+    async def _run(self):
+        last_refresh = time.monotonic()
+        while True:
+            await asyncio.sleep(PRESENCE_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+                if time.monotonic() - last_refresh >= PRESENCE_REFRESH_INTERVAL:
+                    await self.refresh()
+                    last_refresh = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to write presence batch: {e}")
+
+    async def flush(self):
+        """Write every pending change in a single pipeline"""
+        if not (self._pending_status or self._pending_sessions or self._pending_duels):
+            return
+
+        statuses, self._pending_status = self._pending_status, {}
+        sessions, self._pending_sessions = self._pending_sessions, {}
+        duels, self._pending_duels = self._pending_duels, {}
+
+        now = time.time()
+        online = {user_id: status for user_id, status in statuses.items() if status}
+        offline = [user_id for user_id, status in statuses.items() if status is OFFLINE]
+
+        pipe = self.redis.pipeline(transaction=False)
+        if online:
+            # GT: another node may have seen the user more recently
+            pipe.zadd(PRESENCE_KEY, {user_id: now for user_id in online}, gt=True)
+            pipe.hset(PRESENCE_STATUS_KEY, mapping=online)
+        if offline:
+            pipe.zrem(PRESENCE_KEY, *offline)
+            pipe.hdel(PRESENCE_STATUS_KEY, *offline)
+        for user_id, (session, ttl) in sessions.items():
+            pipe.setex(SESSION_KEY.format(user_id), ttl, session)
+        for duel_id, (state, ttl) in duels.items():
+            pipe.setex(DUEL_STATE_KEY.format(duel_id), ttl, state)
+
+        self.commands += len(pipe.command_stack)
+        self.flushes += 1
+        await pipe.execute()
+
+    async def refresh(self):
+        """Bump last-seen and session TTL of every live socket; prune stale users"""
+        now = time.time()
+        stale = await self.redis.zrangebyscore(PRESENCE_KEY, "-inf", now - PRESENCE_TTL)
+        stale = [user_id for user_id in stale if user_id not in self.live]
+
+        pipe = self.redis.pipeline(transaction=False)
+        if self.live:
+            pipe.zadd(PRESENCE_KEY, {user_id: now for user_id in self.live}, gt=True)
+            pipe.hset(PRESENCE_STATUS_KEY, mapping=self.live)
+            for user_id in self.live:
+                pipe.expire(SESSION_KEY.format(user_id), SESSION_TTL)
+        if stale:
+            pipe.zremrangebyscore(PRESENCE_KEY, "-inf", now - PRESENCE_TTL)
+            pipe.hdel(PRESENCE_STATUS_KEY, *stale)
+        if pipe.command_stack:
+            self.commands += len(pipe.command_stack)
+            await pipe.execute()
+        if stale:
+            logger.info(f"Pruned {len(stale)} stale presence entries")
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    async def lookup(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """Presence of several users in one round trip"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zmscore(PRESENCE_KEY, user_ids)
+        pipe.hmget(PRESENCE_STATUS_KEY, user_ids)
+        last_seen, statuses = await pipe.execute()
+
+        threshold = time.time() - PRESENCE_TTL
+        return {
+            user_id: {
+                "online": seen is not None and seen >= threshold,
+                # The status may be missing briefly if another node pruned it
+                "status": (
+                    (status or "online")
+                    if seen is not None and seen >= threshold
+                    else "offline"
+                ),
+                "last_seen": seen,
+            }
+            for user_id, seen, status in zip(user_ids, last_seen, statuses)
+        }
+
+    async def online_users(
+        self, offset: int = 0, limit: int = 100
+    ) -> Tuple[int, List[dict]]:
+        """Online users, most recently seen first, and their total count"""
+        threshold = time.time() - PRESENCE_TTL
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcount(PRESENCE_KEY, threshold, "+inf")
+        pipe.zrevrangebyscore(
+            PRESENCE_KEY, "+inf", threshold, start=offset, num=limit, withscores=True
+        )
+        total, members = await pipe.execute()
+        return total, [
+            {"user_id": user_id, "last_seen": seen} for user_id, seen in members
+        ]
+
+    def get_stats(self) -> dict:
+        return {
+            "live_users": len(self.live),
+            "pending": len(self._pending_status)
+            + len(self._pending_sessions)
+            + len(self._pending_duels),
+            "flushes": self.flushes,
+            "commands": self.commands,
+        }
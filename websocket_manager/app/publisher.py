@@ -0,0 +1,159 @@
+"""
+RabbitMQ publish path of the WebSocket Manager
+
+Publishes go through a dedicated channel with publisher confirms. Callers
+only enqueue (answer submissions must not wait for the broker); a single
+task takes whatever accumulated, writes the whole batch back to back and
+awaits the confirms together, so one round trip covers many messages while
+the order on the channel is preserved. Exchange handles are resolved once.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+import aio_pika
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_BATCH_SIZE = int(os.getenv("WS_PUBLISH_BATCH_SIZE", "100"))
+PUBLISH_QUEUE_SIZE = int(os.getenv("WS_PUBLISH_QUEUE_SIZE", "10000"))
+
+
+@dataclass
+class PendingPublish:
+    exchange: str
+    routing_key: str
+    body: bytes
+    persistent: bool
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class RabbitPublisher:
+    """Batched publisher with confirms and cached exchange handles"""
+
+    def __init__(self, connection: aio_pika.abc.AbstractRobustConnection):
+        self.connection = connection
+        self.channel: Optional[aio_pika.abc.AbstractChannel] = None
+        self.exchanges: Dict[str, aio_pika.abc.AbstractExchange] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.published = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.started_at = time.monotonic()
+
+    async def start(self, exchanges: Iterable[str]):
+        self.channel = await self.connection.channel(publisher_confirms=True)
+        for name in exchanges:
+            self.exchanges[name] = await self.channel.get_exchange(name)
+        self.started_at = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Publish what is still queued, then stop"""
+        if self._task:
+            self._task.cancel()
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            await self._publish_batch(batch)
+
+    def publish(
+        self, exchange: str, routing_key: str, data: dict, persistent: bool = True
+    ) -> bool:
+        """Enqueue a message; False if the publish queue is full"""
+        try:
+            self._queue.put_nowait(
+                PendingPublish(
+                    exchange, routing_key, json.dumps(data).encode(), persistent
+                )
+            )
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(
+                f"Publish queue full, dropping {exchange}/{routing_key} "
+                f"({self.dropped} dropped)"
+            )
+            return False
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < PUBLISH_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._publish_batch(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Failed to publish batch of {len(batch)} messages: {e}")
+
+    async def _exchange(self, name: str) -> aio_pika.abc.AbstractExchange:
+        if name not in self.exchanges:
+            self.exchanges[name] = await self.channel.get_exchange(name)
+        return self.exchanges[name]
+
+    async def _publish_batch(self, batch):
+        publishes = []
+        for item in batch:
+            message = aio_pika.Message(
+                item.body,
+                content_type="application/json",
+                delivery_mode=(
+                    aio_pika.DeliveryMode.PERSISTENT
+                    if item.persistent
+                    else aio_pika.DeliveryMode.NOT_PERSISTENT
+                ),
+            )
+            exchange = await self._exchange(item.exchange)
+            publishes.append(exchange.publish(message, item.routing_key))
+
+        # Frames go out in order; the confirms are awaited together
+        results = await asyncio.gather(*publishes, return_exceptions=True)
+        now = time.monotonic()
+        self.batches += 1
+        for item, result in zip(batch, results):
+            if isinstance(result, BaseException):
+                self.failed += 1
+                logger.error(
+                    f"Failed to publish to RabbitMQ {item.exchange}/{item.routing_key}: {result}"
+                )
+                continue
+            latency = now - item.enqueued_at
+            self.published += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        logger.debug(f"Published batch of {len(batch)} messages")
+
+    def get_stats(self) -> dict:
+        uptime = time.monotonic() - self.started_at
+        return {
+            "published": self.published,
+            "published_per_second": round(self.published / uptime, 2) if uptime else 0,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "queued": self._queue.qsize(),
+            "avg_batch_size": (
+                round((self.published + self.failed) / self.batches, 2)
+                if self.batches
+                else 0
+            ),
+            "avg_confirm_latency_ms": (
+                round(self.total_latency / self.published * 1000, 2)
+                if self.published
+                else 0
+            ),
+            "max_confirm_latency_ms": round(self.max_latency * 1000, 2),
+        }
@@ -0,0 +1,99 @@
+"""
+Per-duel replay buffer for the WebSocket Manager
+
+Every duel event consumed from RabbitMQ is appended to a capped Redis
+Stream ``ws:duel_events:{duel_id}`` before it is delivered. Entries use the
+ids ``0-1``, ``0-2``, ... (``XADD ... 0-*``), so the stream itself hands out
+the duel's sequence numbers atomically, whichever node consumed the event.
+The sequence travels with the event (``seq``) to every node and client; a
+client that reconnects sends the last sequence it saw and gets the missing
+events replayed instead of refetching the whole duel state.
+"""
+
+import json
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+REPLAY_STREAM_KEY = "ws:duel_events:{}"
+REPLAY_MAXLEN = int(os.getenv("WS_REPLAY_MAXLEN", "200"))
+REPLAY_TTL = int(os.getenv("WS_REPLAY_TTL", "1800"))
+
+# Duel events worth replaying (notifications are per user, not per duel)
+REPLAYED_EVENTS = {
+    "duel.websocket.question",
+    "duel.websocket.status",
+    "duel.websocket.results",
+}
+
+ReplayedEvent = Tuple[int, str, dict]
+
+
+def _seq(entry_id: str) -> int:
+    return int(entry_id.split("-", 1)[1])
+
+
+class DuelReplayBuffer:
+    """Capped event log per duel backed by Redis Streams"""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+        self.appended = 0
+        self.replayed = 0
+        self.resyncs = 0
+
+    async def append(self, duel_id: str, routing_key: str, data: dict) -> int:
+        """Record a duel event and return its sequence number"""
+        key = REPLAY_STREAM_KEY.format(duel_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.xadd(
+            key,
+            {"k": routing_key, "d": json.dumps(data)},
+            id="0-*",
+            maxlen=REPLAY_MAXLEN,
+            approximate=True,
+        )
+        pipe.expire(key, REPLAY_TTL)
+        entry_id, _ = await pipe.execute()
+        self.appended += 1
+        return _seq(entry_id)
+
+    async def read_after(
+        self, duel_id: str, last_seq: int
+    ) -> Optional[List[ReplayedEvent]]:
+        """
+        Events after ``last_seq`` as (seq, routing_key, data)
+
+        Returns None when they cannot be replayed: the oldest missing events
+        were trimmed, or the stream restarted after expiring.
+        """
+        key = REPLAY_STREAM_KEY.format(duel_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xrange(key, min=f"0-{last_seq + 1}", max="+")
+        pipe.xrevrange(key, count=1)
+        entries, newest = await pipe.execute()
+
+        if newest and _seq(newest[0][0]) < last_seq:
+            self.resyncs += 1
+            return None
+        if entries and _seq(entries[0][0]) != last_seq + 1:
+            self.resyncs += 1
+            return None
+
+        self.replayed += len(entries)
+        return [
+            (_seq(entry_id), fields["k"], json.loads(fields["d"]))
+            for entry_id, fields in entries
+        ]
+
+    def get_stats(self) -> dict:
+        return {
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "resyncs": self.resyncs,
+            "maxlen": REPLAY_MAXLEN,
+        }